@@ -0,0 +1,381 @@
+import math
+import numpy as np
+from models import Route, Truck
+from metrics import timed, count
+from records import FeasibilityRecord, RouteLegs, LegTable, leg_array
+from simulation import (
+    WEIGHT_FACTOR, ENERGY_COST_PER_KWH, MIN_BUFFER_SOC, CHARGE_TARGET_SOC, DEPOT_CHARGER_KW, TRUCK_TARE_LBS, CompiledRoute,
+)
+from charge_curves import charge_table, curve_text, curve_groups
+
+STATUS_GREEN, STATUS_YELLOW, STATUS_RED = 0, 1, 2
+STATUS_NAMES = ("green", "yellow", "red")
+
+# Batch engine: simulates one route for many trucks at once.
+# Arrays are laid out one row per truck and one column per node (or per leg, len(nodes) - 1).
+# Every arithmetic step mirrors simulation.simulate_route in the same order, so the
+# float64 results are bit-for-bit identical to the scalar reference.
+
+
+@timed("simulate")
+def simulate_fleet(route: Route, plan: CompiledRoute, loads, socs, capacities, curves=None) -> dict:
+    # curves: each truck's charge curve text ('' for none), see charge_curves.py; without them
+    # every truck charges at the full rate
+    loads = np.asarray(loads, dtype=np.float64)
+    socs = np.asarray(socs, dtype=np.float64)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    n_trucks = len(socs)
+    # One pass simulates every truck, i.e. does the work of n_trucks simulate_route calls
+    count("simulate_passes")
+    count("simulate_route", n_trucks)
+    n_nodes = len(plan.nodes)
+    n_legs = n_nodes - 1
+    leg_distance = plan.leg_distance
+    has_charger = plan.has_charger
+
+    # Trucks with no usable capacity are reported as infeasible with empty details (see simulate_route)
+    valid = capacities > 0
+    caps = np.where(valid, capacities, 1.0)
+
+    depot_payload = plan.depot_payload
+
+    # Payload carried on every leg only depends on the starting load, so resolve it up front
+    load = np.empty((n_trucks, n_nodes))
+    load[:, 0] = np.maximum(loads, depot_payload)
+    for i in range(n_legs):
+        if plan.is_stop[i + 1]:
+            load[:, i + 1] = np.maximum(0, load[:, i] - plan.unload_lbs[i + 1] + plan.pickup_lbs[i + 1])
+        else:
+            load[:, i + 1] = load[:, i]
+
+    if plan.leg_grade is None:
+        leg_kwh = np.empty((n_trucks, n_legs))
+        for i in range(n_legs):
+            leg_kwh[:, i] = (route.base_consumption + WEIGHT_FACTOR * load[:, i]) * leg_distance[i] * route.terrain_multiplier
+    else:
+        # Elementwise the same steps as simulate_route, for all legs at once
+        leg_load = load[:, :n_legs]
+        leg_kwh = (route.base_consumption + WEIGHT_FACTOR * leg_load) * np.array(leg_distance)
+        leg_kwh += (TRUCK_TARE_LBS + leg_load) * np.array(plan.leg_grade)
+        np.maximum(leg_kwh, 0.0, out=leg_kwh)
+    leg_soc = leg_kwh / caps[:, None]
+
+    # Charge target at every charger node (NaN elsewhere). Like the leg energies it does not
+    # depend on the SoC the truck arrives with, which is what departure_profile relies on.
+    target_soc = np.full((n_trucks, n_nodes), np.nan)
+    for i in range(n_legs):
+        if has_charger[i]:
+            # Energy to the next charger/destination
+            energy_to_next_charger_soc = np.zeros(n_trucks)
+            for j in range(i, plan.scan_end[i]):
+                energy_to_next_charger_soc += leg_soc[:, j]
+            target_soc[:, i] = np.minimum(energy_to_next_charger_soc + MIN_BUFFER_SOC, CHARGE_TARGET_SOC)
+
+    soc = socs.copy()
+    start_soc = np.empty((n_trucks, n_legs))
+    end_soc = np.empty((n_trucks, n_legs))
+    charge_added = np.zeros((n_trucks, n_legs))
+    charge_time = np.zeros((n_trucks, n_legs), dtype=np.int64)
+    used_charger = np.zeros((n_trucks, n_legs), dtype=bool)
+    feasible = np.ones(n_trucks, dtype=bool)
+    total_energy = np.zeros(n_trucks)
+    groups = curve_groups(curves)
+
+    for i in range(n_legs):
+        total_energy += leg_kwh[:, i]
+
+        # --- STEP 1: Charge at the DEPARTURE node ---
+        if has_charger[i]:
+            deficit_soc = np.maximum(0, target_soc[:, i] - soc)
+            charging = deficit_soc > 0.001
+            if charging.any():
+                added = deficit_soc * caps
+                charge_added[:, i] = np.where(charging, added, 0.0)
+                charge_time[:, i] = np.where(charging, np.ceil(added / plan.charge_rate_kw[i] * 60), 0)
+                for curve, rows in groups:
+                    rows = rows[charging[rows]]
+                    table = charge_table(curve, plan.charge_rate_kw[i])
+                    charge_time[rows, i] = np.ceil(
+                        caps[rows] * (table.at_array(soc[rows] + deficit_soc[rows]) - table.at_array(soc[rows]))
+                    )
+                used_charger[:, i] = charging
+                soc = np.where(charging, soc + deficit_soc, soc)
+
+        # --- STEP 2: Drive ---
+        start_soc[:, i] = soc
+        feasible &= ~(soc - leg_soc[:, i] < MIN_BUFFER_SOC - 1e-9)
+        soc = np.maximum(soc - leg_soc[:, i], 0.0)
+        end_soc[:, i] = soc
+
+    # Dwell at each node is max(unload, charge); stops and depot loading take 30 minutes
+    unload_time = np.array([30 if stop else 0 for stop in plan.is_stop], dtype=np.int64)
+    if depot_payload > 0:
+        unload_time[0] = 30
+    node_charge_time = np.zeros((n_trucks, n_nodes), dtype=np.int64)
+    node_charge_time[:, :n_legs] = charge_time
+    total_stop_time = np.maximum(unload_time, node_charge_time).sum(axis=1)
+    drive_time_mins = math.ceil((route.distance_miles / 55.0) * 60.0)
+
+    return {
+        "valid": valid,
+        "feasible": feasible & valid,
+        "soc": soc,
+        "total_energy_kwh": total_energy,
+        "total_charge_time_mins": charge_time.sum(axis=1),
+        "total_stop_time_mins": total_stop_time,
+        "estimated_trip_time_mins": drive_time_mins + total_stop_time,
+        "stops_required": plan.stops_required,
+        "no_charge_needed": ~used_charger.any(axis=1),
+        "used_charger": used_charger,
+        "load": load,
+        "leg_soc": leg_soc,
+        "target_soc": target_soc,
+        "start_soc": start_soc,
+        "end_soc": end_soc,
+        "charge_added_kwh": charge_added,
+        "charge_time_mins": charge_time,
+    }
+
+
+def unavailable_record(truck: Truck) -> FeasibilityRecord:
+    # Same as simulation.unavailable_result
+    return FeasibilityRecord(truck_id=truck.id, status="red", arrival_soc=0.0, energy_required_kwh=0.0,
+                             no_charge_needed=False, not_available=True)
+
+
+def _take(sim: dict, rows) -> dict:
+    # Row subset of a batch result (per-route values such as leg_distance are shared by every row)
+    return {k: v[rows] if isinstance(v, np.ndarray) else v for k, v in sim.items()}
+
+
+def _merge(sim: dict, rows, update: dict):
+    # Overwrite the given rows of a batch result with a re-simulation of just those rows
+    for k, v in update.items():
+        if isinstance(v, np.ndarray):
+            sim[k][rows] = v
+
+
+@timed("precharge")
+def departure_profile(plan: CompiledRoute, sim: dict, rows) -> dict:
+    # Closed-form view of which depot SoCs make the route feasible, from one backward pass.
+    #
+    # Leg energies and charge targets don't depend on SoC, so with cum[k] = SoC burned before
+    # node k, a truck leaving the depot with SoC v reaches charger c with v - cum[c] until the
+    # first charger where it actually tops up, i.e. the first c with v < cum[c] + target[c] - 0.001.
+    # From there on its trajectory is fixed, so feasibility only depends on that first charge
+    # point: the legs before it must hold the buffer, and the route from it must be feasible
+    # when charged to its target. The latter is resolved per charger walking back from the end.
+    leg_soc = sim['leg_soc'][rows]
+    target_soc = sim['target_soc'][rows]
+    n = len(leg_soc)
+    n_nodes = len(plan.nodes)
+    chargers = plan.chargers
+    n_chargers = len(chargers)
+
+    cum = np.zeros((n, n_nodes))
+    np.cumsum(leg_soc, axis=1, out=cum[:, 1:])
+    reach = cum[:, chargers + [n_nodes - 1]]  # chargers, then the destination
+    charge_below = reach[:, :n_chargers] + target_soc[:, chargers] - 0.001
+    arrival_floor = reach + MIN_BUFFER_SOC - 1e-9
+    arrival_floor[:, 0] = -np.inf  # nothing to drive before topping up at the depot
+
+    feasible_after = np.ones((n, n_chargers + 1), dtype=bool)
+    at = np.arange(n)
+    for m in reversed(range(n_chargers)):
+        leave = reach[:, m] + target_soc[:, chargers[m]]
+        nxt = np.full(n, m + 1)
+        passing = np.ones(n, dtype=bool)
+        while True:
+            passing &= nxt < n_chargers
+            passing[passing] = charge_below[at[passing], nxt[passing]] <= leave[passing]
+            if not passing.any():
+                break
+            nxt[passing] += 1
+        feasible_after[:, m] = (leave >= arrival_floor[at, nxt]) & feasible_after[at, nxt]
+
+    return {
+        "charge_below": np.maximum.accumulate(charge_below, axis=1),
+        "arrival_floor": arrival_floor,
+        "feasible_after": feasible_after,
+    }
+
+
+def feasible_from(profile: dict, socs) -> np.ndarray:
+    # Same answer as simulate_fleet(...)['feasible'] at these depot SoCs, without simulating
+    above = profile['charge_below'] > socs[:, None]
+    first = np.where(above.any(axis=1), above.argmax(axis=1), above.shape[1])
+    at = np.arange(len(socs))
+    return (socs >= profile['arrival_floor'][at, first]) & profile['feasible_after'][at, first]
+
+
+@timed("precharge")
+def min_departure_soc(profile: dict, socs):
+    # Minimum depot SoC on the same 0.001 grid the bisection search lands on, so precharge_kwh
+    # and precharge_mins are unchanged. Returns the rows that are feasible at 100% and their SoC.
+    fixable = feasible_from(profile, np.ones(len(socs)))
+    low = np.array(socs, dtype=np.float64)
+    high = np.ones(len(low))
+    best = np.ones(len(low))
+    active = fixable & (high - low > 0.001)
+    while active.any():
+        mid = (low + high) / 2
+        ok = feasible_from(profile, mid)
+        best = np.where(active & ok, mid, best)
+        high = np.where(active & ok, mid, high)
+        low = np.where(active & ~ok, mid, low)
+        active &= high - low > 0.001
+    return fixable, best
+
+
+@timed("bisect")
+def bisect_min_soc(route: Route, plan: CompiledRoute, loads, socs, caps):
+    # Fallback: the original search, with every truck's bisection run as one batch per step.
+    # Returns the rows that are feasible at 100% SoC and their minimum departure SoC.
+    # Charge curves only change charge times, not feasibility, so they are left out here.
+    sim_100 = simulate_fleet(route, plan, loads, np.ones(len(socs)), caps)
+    rows = np.flatnonzero(sim_100['feasible'])
+    low = socs[rows].copy()
+    high = np.ones(len(rows))
+    best = np.ones(len(rows))
+    active = high - low > 0.001
+    while active.any():
+        mid = (low + high) / 2
+        ok = np.zeros(len(rows), dtype=bool)
+        ok[active] = simulate_fleet(route, plan, loads[rows[active]], mid[active], caps[rows[active]])['feasible']
+        best = np.where(active & ok, mid, best)
+        high = np.where(active & ok, mid, high)
+        low = np.where(active & ~ok, mid, low)
+        active = high - low > 0.001
+    return rows, best
+
+
+def fleet_columns(trucks: list[Truck]) -> dict:
+    # Column view of the truck fields the engine reads
+    return {
+        "loads": np.array([t.load_lbs for t in trucks], dtype=np.float64),
+        "socs": np.array([t.soc / 100 for t in trucks], dtype=np.float64),
+        "caps": np.array([t.capacity_kwh * (t.soh / 100) for t in trucks], dtype=np.float64),
+        "charge_eta_mins": np.array([t.charge_eta_mins or 0 for t in trucks], dtype=np.float64),
+        "curves": np.array([curve_text(t.charge_curve) for t in trucks], dtype=str),
+    }
+
+
+@timed("simulate")
+def solve_fleet(route: Route, plan: CompiledRoute, fleet: dict) -> dict:
+    # Full feasibility for trucks that are available for dispatch: the initial pass, pre-charge
+    # resolution for the ones that need it, and the resulting status per row.
+    loads, socs, caps = fleet['loads'], fleet['socs'], fleet['caps']
+    curves = fleet.get('curves')
+    n_trucks = len(socs)
+
+    def curves_of(rows):
+        return curves[rows] if curves is not None else None
+
+    # Initial Pass
+    sim = simulate_fleet(route, plan, loads, socs, caps, curves)
+
+    # Trucks that only become feasible after a depot pre-charge. The direct solver replaces
+    # the 100% check and the bisection; the final pass doubles as its verification.
+    min_required_soc = np.full(n_trucks, np.nan)
+    retry = np.flatnonzero(~sim['feasible'] & sim['valid'])
+    if len(retry):
+        fixable, best = min_departure_soc(departure_profile(plan, sim, retry), socs[retry])
+        rows = retry[fixable]
+        best = best[fixable]
+
+        # Final pass to get accurate details
+        final = simulate_fleet(route, plan, loads[rows], best, caps[rows], curves_of(rows))
+        verified = final['feasible']
+        _merge(sim, rows[verified], _take(final, verified))
+        min_required_soc[rows[verified]] = best[verified]
+
+        # Should the solver and the simulation ever disagree (rounding right at a boundary),
+        # the final pass catches it and those rows go through the full search instead
+        fallback = rows[~verified]
+        if len(fallback):
+            found, best = bisect_min_soc(route, plan, loads[fallback], socs[fallback], caps[fallback])
+            rows = fallback[found]
+            if len(rows):
+                _merge(sim, rows, simulate_fleet(route, plan, loads[rows], best, caps[rows], curves_of(rows)))
+                min_required_soc[rows] = best
+
+    # Same as simulation.precharge_plan: credit any charge already in progress, then top up
+    # the rest on the depot charger, following the truck's charge curve if it has one
+    precharged = ~np.isnan(min_required_soc)
+    eta = fleet['charge_eta_mins']
+    soc_after_current_charge = np.minimum(1.0, socs + eta / 60 * DEPOT_CHARGER_KW / caps)
+    groups = [(charge_table(curve, DEPOT_CHARGER_KW), rows) for curve, rows in curve_groups(curves)]
+    for table, rows in groups:
+        rows = rows[eta[rows] > 0]
+        soc_after_current_charge[rows] = table.soc_after(socs[rows], eta[rows] / caps[rows])
+    feasible_after_precharge = precharged & (soc_after_current_charge < min_required_soc)
+    precharge_kwh = np.where(feasible_after_precharge, (min_required_soc - soc_after_current_charge) * caps, 0.0)
+    precharge_kwh[~precharged] = np.nan
+    precharge_mins = np.ceil(precharge_kwh / DEPOT_CHARGER_KW * 60)
+    for table, rows in groups:
+        rows = rows[feasible_after_precharge[rows]]
+        precharge_mins[rows] = np.ceil(
+            caps[rows] * (table.at_array(min_required_soc[rows]) - table.at_array(soc_after_current_charge[rows]))
+        )
+
+    valid = sim['valid']
+    sim['no_charge_needed'] &= valid
+    sim['feasible_after_precharge'] = feasible_after_precharge
+    sim['precharge_kwh'] = precharge_kwh
+    sim['precharge_mins'] = precharge_mins
+    sim['departure_soc'] = np.where(precharged, min_required_soc, socs)
+    sim['status'] = np.select(
+        [~sim['feasible'] & ~feasible_after_precharge, feasible_after_precharge | ~sim['no_charge_needed']],
+        [STATUS_RED, STATUS_YELLOW],
+        STATUS_GREEN,
+    )
+    sim['arrival_soc'] = np.where(valid, sim['soc'] * 100, 0.0)
+
+    # Same as simulation.charge_overlap_mins: charging on departure from a stop with un/loading
+    n_legs = len(plan.leg_distance)
+    stop_activity = np.array(
+        [i > 0 and (plan.unload_lbs[i] > 0 or plan.pickup_lbs[i] > 0) for i in range(n_legs)], dtype=bool
+    )
+    overlap = np.where(sim['used_charger'] & stop_activity, np.minimum(30, sim['charge_time_mins']), 0)
+    sim['charge_overlap_mins'] = np.where(valid, overlap.sum(axis=1), 0)
+    return sim
+
+
+@timed("results")
+def evaluate_fleet(route: Route, plan: CompiledRoute, trucks: list[Truck], detail: str = "full") -> list[FeasibilityRecord]:
+    # detail="summary" leaves leg_details empty; at "full" each valid truck gets a LegTable
+    # (its row of one structured array) instead of a LegDetail per leg
+    available = [t for t in trucks if t.status in ("ready", "charging")]
+    sim = solve_fleet(route, plan, fleet_columns(available))
+    route_legs, legs = (RouteLegs(plan), leg_array(sim)) if detail == "full" else (None, None)
+
+    results = []
+    row_of = {id(t): r for r, t in enumerate(available)}
+    for truck in trucks:
+        r = row_of.get(id(truck))
+        if r is None:
+            results.append(unavailable_record(truck))
+            continue
+
+        valid = bool(sim['valid'][r])
+        total_energy_kwh = float(sim['total_energy_kwh'][r]) if valid else 0.0
+        precharge_kwh = float(sim['precharge_kwh'][r])
+        precharged = not math.isnan(precharge_kwh)
+        results.append(FeasibilityRecord(
+            truck_id=truck.id,
+            status=STATUS_NAMES[sim['status'][r]],
+            arrival_soc=round(float(sim['arrival_soc'][r]), 2),
+            energy_required_kwh=round(total_energy_kwh, 2),
+            charge_time_mins=int(sim['total_charge_time_mins'][r]) if valid else 0,
+            total_stop_time_mins=int(sim['total_stop_time_mins'][r]) if valid else 0,
+            estimated_trip_time_mins=int(sim['estimated_trip_time_mins'][r]) if valid else 0,
+            energy_cost_estimate=round(total_energy_kwh * ENERGY_COST_PER_KWH, 2),
+            stops_required=sim['stops_required'] if valid else 0,
+            no_charge_needed=bool(sim['no_charge_needed'][r]),
+            feasible_after_precharge=bool(sim['feasible_after_precharge'][r]),
+            precharge_mins=int(sim['precharge_mins'][r]) if precharged else None,
+            precharge_kwh=round(precharge_kwh, 2) if precharged else None,
+            charge_overlap_mins=int(sim['charge_overlap_mins'][r]),
+            leg_details=LegTable(route_legs, legs[r].copy()) if legs is not None and valid else []
+        ))
+    return results
@@ -0,0 +1,71 @@
+# Greedy vs. optimal (strategy=optimal) charging plans on synthetic long-haul corridors.
+#
+#   cd backend && python -m benchmarks.charging_strategy
+#
+# For a sample of trucks per route, compares the trip time each plan gives and what the
+# optimal plan costs to compute. Trucks that need no charge or a precharge are skipped, as
+# the endpoint does. Two fleets: empty long-haul trucks with 900-1500 kWh packs, and loaded
+# regional trucks with 450-600 kWh packs, which stop to charge far more often and so give
+# the DP more states to carry.
+#
+# The last column is the work an optimal request is budgeted in (OPTIMAL_MAX_TRUCK_NODES in
+# main.py): microseconds per truck per compiled node.
+import time
+import numpy as np
+from models import Truck
+from simulation import CompiledRoute
+from batch_simulation import evaluate_fleet
+from charging_plan import optimal_result
+from benchmarks.synthetic import synthetic_route
+
+CHARGER_COUNTS = [10, 50, 100, 200, 500]
+SAMPLE_TRUCKS = 20
+
+
+def sample_trucks(n: int, seed: int = 0) -> list[Truck]:
+    rng = np.random.default_rng(seed)
+    return [
+        Truck(id=f"S-{k:03d}", name="Sample", soc=round(float(rng.uniform(60.0, 100.0)), 1),
+              soh=round(float(rng.uniform(85.0, 100.0)), 1), capacity_kwh=float(rng.choice([900.0, 1200.0, 1500.0])),
+              load_lbs=0.0, status="ready")
+        for k in range(n)
+    ]
+
+
+def loaded_trucks(n: int, seed: int = 0) -> list[Truck]:
+    rng = np.random.default_rng(seed)
+    return [
+        Truck(id=f"L-{k:03d}", name="Loaded", soc=round(float(rng.uniform(60.0, 100.0)), 1),
+              soh=round(float(rng.uniform(85.0, 100.0)), 1), capacity_kwh=float(rng.choice([450.0, 500.0, 550.0, 600.0])),
+              load_lbs=float(rng.choice([15000.0, 25000.0, 40000.0])), status="ready")
+        for k in range(n)
+    ]
+
+
+def main():
+    fleets = {"long-haul": sample_trucks(SAMPLE_TRUCKS), "loaded": loaded_trucks(SAMPLE_TRUCKS)}
+    print(f"{'fleet':>9} {'chargers':>8} {'nodes':>6} {'trucks':>7} {'greedy min':>11} {'optimal min':>12} {'saved':>7} "
+          f"{'ms/truck':>9} {'us/node':>8}")
+    for name, trucks in fleets.items():
+        for n_chargers in CHARGER_COUNTS:
+            route = synthetic_route(n_chargers)
+            plan = CompiledRoute(route)
+            greedy = evaluate_fleet(route, plan, trucks, "summary")
+            pairs = [(t, g) for t, g in zip(trucks, greedy)
+                     if g.status != "red" and not g.feasible_after_precharge and not g.no_charge_needed]
+            if not pairs:
+                print(f"{name:>9} {n_chargers:>8} {len(plan.nodes):>6} {0:>7}")
+                continue
+
+            start = time.perf_counter()
+            optimal = [optimal_result(route, plan, t, g, "summary") for t, g in pairs]
+            elapsed = (time.perf_counter() - start) / len(pairs)
+
+            greedy_mins = np.mean([g.estimated_trip_time_mins for _, g in pairs])
+            optimal_mins = np.mean([o.estimated_trip_time_mins for o in optimal])
+            print(f"{name:>9} {n_chargers:>8} {len(plan.nodes):>6} {len(pairs):>7} {greedy_mins:>11.0f} "
+                  f"{optimal_mins:>12.0f} {1 - optimal_mins / greedy_mins:>7.1%} {elapsed * 1e3:>9.1f} "
+                  f"{elapsed / len(plan.nodes) * 1e6:>8.0f}")
+
+if __name__ == "__main__":
+    main()
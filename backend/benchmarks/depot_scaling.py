@@ -0,0 +1,52 @@
+# Depot charger contention on synthetic fleets, up to 5,000 departures over a 24h horizon.
+#
+#   cd backend && python -m benchmarks.depot_scaling
+#
+# Times plan_depot end to end (minimum departure SoC per route, then the plug schedule), and
+# the scheduler on its own with every departure needing 20-400 kWh, the worst case for
+# contention: how many of those finish late and how many don't get a plug within the horizon.
+import random
+import time
+from depot import plan_depot, schedule_sessions
+from models import DepotConfig, DepotJob
+from simulation import CompiledRoute
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes
+
+SIZES = [(100, 10), (1000, 50), (5000, 200)]   # departures, routes
+DEPOT = DepotConfig(chargers=120, charger_kw=150.0, site_limit_kw=12_000.0, horizon_mins=1440)
+
+
+def main():
+    print(f"{'jobs':>6} {'routes':>7} {'plan_depot s':>13} {'charged':>8} {'schedule s':>11} "
+          f"{'late':>6} {'mean late min':>14} {'unscheduled':>12} {'peak kW':>9}")
+    for n_jobs, n_routes in SIZES:
+        rng = random.Random(n_jobs)
+        trucks = [t for t in synthetic_trucks(n_jobs * 2, seed=n_jobs) if t.status != "maintenance"][:n_jobs]
+        routes = synthetic_routes(n_routes, seed=n_routes)
+        jobs = [DepotJob(truck_id=t.id, route_id=rng.choice(routes).id, departure_mins=rng.randint(0, 1440))
+                for t in trucks]
+        by_id = {t.id: t for t in trucks}
+        route_by_id = {r.id: r for r in routes}
+        plans = {r.id: CompiledRoute(r) for r in routes}
+        charging = [t for t in trucks if t.status == "charging"]
+
+        start = time.perf_counter()
+        schedule = plan_depot(jobs, by_id, route_by_id, plans, charging, DEPOT)
+        plan_s = time.perf_counter() - start
+
+        charged = sum(slot.plug is not None for slot in schedule.slots)
+
+        needs = [rng.uniform(20.0, 400.0) for _ in jobs]
+        keys = [(rng.randint(0, 1), job.departure_mins, job.truck_id) for job in jobs]
+        start = time.perf_counter()
+        _, ready, _, peak_kw, _ = schedule_sessions(needs, keys, DEPOT)
+        schedule_s = time.perf_counter() - start
+
+        late = [r - job.departure_mins for r, job in zip(ready, jobs) if r is not None and r > job.departure_mins]
+        unscheduled = sum(r is None for r in ready)
+        print(f"{n_jobs:>6} {n_routes:>7} {plan_s:>13.3f} {charged:>8} {schedule_s:>11.3f} {len(late):>6} "
+              f"{sum(late) / max(len(late), 1):>14.1f} {unscheduled:>12} {peak_kw:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Fleet-to-route assignment on synthetic fleets, up to 2,000 trucks x 2,000 routes.
+#
+#   cd backend && python -m benchmarks.dispatch_scaling
+#
+# Times the candidate simulation (one pool task per route, as /dispatch/optimize does) and
+# the sparse assignment separately, with how many pairs pruning and red status removed.
+import time
+from batch_simulation import fleet_columns
+from dispatch import dispatch_candidates, assign
+from matrix import get_pool, shutdown_pool
+from simulation import CompiledRoute
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes
+
+SIZES = [(200, 200), (500, 500), (1000, 1000), (2000, 2000)]
+
+
+def main():
+    pool = get_pool()
+    print(f"{'trucks x routes':>16} {'pairs':>10} {'pruned':>8} {'candidates':>11} {'simulate s':>11} "
+          f"{'assign s':>9} {'assigned':>9}")
+    try:
+        for n_trucks, n_routes in SIZES:
+            trucks = [t for t in synthetic_trucks(n_trucks * 2, seed=n_trucks) if t.status != "maintenance"][:n_trucks]
+            routes = synthetic_routes(n_routes, seed=n_routes)
+            plans = [CompiledRoute(route) for route in routes]
+            fleet = fleet_columns(trucks)
+
+            start = time.perf_counter()
+            candidates = list(pool.map(dispatch_candidates, routes, plans, [fleet] * n_routes, chunksize=16))
+            simulate_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            plan = assign(trucks, routes, candidates, fleet)
+            assign_s = time.perf_counter() - start
+
+            print(f"{n_trucks:>7} x {n_routes:<6} {n_trucks * n_routes:>10} {plan.pruned_pairs / (n_trucks * n_routes):>8.1%} "
+                  f"{plan.candidate_pairs:>11} {simulate_s:>11.2f} {assign_s:>9.2f} {len(plan.assignments):>9}")
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
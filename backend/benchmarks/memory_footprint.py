@@ -0,0 +1,46 @@
+# Memory held per truck by what the API keeps around, measured with tracemalloc.
+#
+#   cd backend && python -m benchmarks.memory_footprint
+#
+# Trucks as read from the store (every /trucks and feasibility request reads the whole fleet),
+# and feasibility results as the cache holds them, at summary and full detail on 10- and
+# 100-node routes. Only what is still allocated once the objects are built counts, not the
+# temporaries used to build them.
+import gc
+import tracemalloc
+from batch_simulation import evaluate_fleet
+from simulation import CompiledRoute
+from store import SQLiteFleetStore
+from benchmarks.synthetic import synthetic_trucks, synthetic_delivery_route
+
+N_TRUCKS = 10_000
+ROUTE_NODES = [10, 100]
+
+
+def held_bytes(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    built = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del built
+    return held
+
+
+def main():
+    store = SQLiteFleetStore(":memory:")
+    store.put_trucks(synthetic_trucks(N_TRUCKS))
+    trucks = store.trucks()
+
+    print(f"{'what':<32} {'bytes/truck':>12}")
+    print(f"{'store read':<32} {held_bytes(store.trucks) / N_TRUCKS:>12.0f}")
+    for n_nodes in ROUTE_NODES:
+        route = synthetic_delivery_route(n_nodes)
+        plan = CompiledRoute(route)
+        for detail in ("summary", "full"):
+            held = held_bytes(lambda: evaluate_fleet(route, plan, trucks, detail))
+            print(f"{f'result[{n_nodes} nodes, {detail}]':<32} {held / N_TRUCKS:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
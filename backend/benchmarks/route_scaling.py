@@ -0,0 +1,46 @@
+# Simulation cost vs. route length on synthetic long-haul corridors.
+#
+#   cd backend && python -m benchmarks.route_scaling
+#
+# A linear engine shows a flat time-per-node column as the charger count grows.
+import time
+import numpy as np
+from simulation import CompiledRoute, simulate_route
+from batch_simulation import simulate_fleet
+from benchmarks.synthetic import synthetic_route
+
+CHARGER_COUNTS = [50, 100, 200, 500, 1000]
+FLEET_SIZE = 1000
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    loads = rng.choice([0.0, 20000.0, 40000.0], FLEET_SIZE)
+    socs = rng.uniform(0.3, 1.0, FLEET_SIZE)
+    caps = rng.uniform(400.0, 650.0, FLEET_SIZE)
+
+    print(f"{'chargers':>8} {'nodes':>6} {'compile ms':>11} {'scalar ms':>10} {'us/node':>8} "
+          f"{'batch x' + str(FLEET_SIZE) + ' ms':>16} {'ns/truck-node':>14}")
+    for n_chargers in CHARGER_COUNTS:
+        route = synthetic_route(n_chargers)
+        plan = CompiledRoute(route)
+        n_nodes = len(plan.nodes)
+        compile_s = best_of(lambda: CompiledRoute(route))
+        scalar_s = best_of(lambda: simulate_route(route, plan, 20000.0, 0.8, 500.0))
+        batch_s = best_of(lambda: simulate_fleet(route, plan, loads, socs, caps), repeat=3)
+        print(f"{n_chargers:>8} {n_nodes:>6} {compile_s * 1e3:>11.2f} {scalar_s * 1e3:>10.2f} "
+              f"{scalar_s / n_nodes * 1e6:>8.2f} {batch_s * 1e3:>16.1f} "
+              f"{batch_s / (n_nodes * FLEET_SIZE) * 1e9:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
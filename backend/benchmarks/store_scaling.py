@@ -0,0 +1,78 @@
+# Fleet store: bulk load and lookup cost at 50k trucks / 5k routes.
+#
+#   cd backend && python -m benchmarks.store_scaling
+#
+# Id lookups should stay flat (indexed) where the old list scan grows with the fleet.
+import csv
+import os
+import random
+import tempfile
+import time
+from store import SQLiteFleetStore, TRUCK_COLUMNS
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes
+
+N_TRUCKS = 50_000
+N_ROUTES = 5_000
+N_LOOKUPS = 2_000
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    trucks = synthetic_trucks(N_TRUCKS)
+    routes = synthetic_routes(N_ROUTES)
+    rng = random.Random(1)
+    truck_ids = [rng.choice(trucks).id for _ in range(N_LOOKUPS)]
+    route_ids = [rng.choice(routes).id for _ in range(N_LOOKUPS)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteFleetStore(os.path.join(tmp, "fleet.db"))
+        rows = [
+            (f"load {N_TRUCKS} trucks", timed(lambda: store.put_trucks(trucks))),
+            (f"load {N_ROUTES} routes", timed(lambda: store.put_routes(routes))),
+            (f"re-put {N_TRUCKS} unchanged trucks", timed(lambda: store.put_trucks(trucks))),
+        ]
+
+        csv_path = os.path.join(tmp, "trucks.csv")
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(TRUCK_COLUMNS)
+            for truck in trucks:
+                writer.writerow(["" if v is None else v for v in (getattr(truck, c) for c in TRUCK_COLUMNS)])
+        csv_store = SQLiteFleetStore(os.path.join(tmp, "import.db"))
+        rows.append((f"import {N_TRUCKS} trucks from CSV", timed(lambda: csv_store.import_trucks(csv_path))))
+
+        print(f"{'operation':<40} {'total ms':>10}")
+        for name, seconds in rows:
+            print(f"{name:<40} {seconds * 1e3:>10.1f}")
+
+        lookups = [
+            ("get_truck by id", lambda: [store.get_truck(i) for i in truck_ids]),
+            ("truck_version by id", lambda: [store.truck_version(i) for i in truck_ids]),
+            ("list scan by truck id (before)", lambda: [next(t for t in trucks if t.id == i) for i in truck_ids]),
+            ("get_route by id", lambda: [store.get_route(i) for i in route_ids]),
+            ("route_version by id", lambda: [store.route_version(i) for i in route_ids]),
+            ("list scan by route id (before)", lambda: [next(r for r in routes if r.id == i) for i in route_ids]),
+        ]
+        print(f"\n{'lookup x' + str(N_LOOKUPS):<40} {'us/op':>10}")
+        for name, fn in lookups:
+            print(f"{name:<40} {timed(fn) / N_LOOKUPS * 1e6:>10.1f}")
+
+        filters = [
+            ("trucks(status='charging')", lambda: store.trucks(status="charging")),
+            ("routes(priority='urgent')", lambda: store.routes(priority="urgent")),
+            ("trucks() all", lambda: store.trucks()),
+        ]
+        print(f"\n{'filter':<40} {'ms':>10} {'rows':>8}")
+        for name, fn in filters:
+            start = time.perf_counter()
+            result = fn()
+            print(f"{name:<40} {(time.perf_counter() - start) * 1e3:>10.1f} {len(result):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Benchmark suite for the backend hot paths at production scale, with results saved as JSON.
+#
+#   cd backend && python -m benchmarks.suite [--out results.json] [--baseline old.json] [--quick] [-k feasibility]
+#
+# Covers GET /trucks, GET /routes/{id}/feasibility (cold cache at summary and full detail, and
+# warm), reachability threshold queries, the pre-charge search (direct solver and bisection
+# fallback), Monte Carlo samples and JSON serialization, over 10 / 1k / 10k-truck fleets and
+# 10 / 100 / 1000-node delivery routes from the seeded generator in benchmarks/synthetic.py.
+# Endpoints go through the ASGI app, so routing, validation and serialization are included.
+#
+# With --baseline, each case's median is compared against the earlier run and the exit status
+# is 1 if any case got slower by more than --max-regression (default 10%).
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+import numpy as np
+import pydantic
+from simulation import CompiledRoute
+from batch_simulation import (
+    simulate_fleet, evaluate_fleet, fleet_columns, departure_profile, min_departure_soc, bisect_min_soc,
+)
+from feasibility_cache import FeasibilityCache
+from records import encode_json
+from store import SQLiteFleetStore
+from uncertainty import arrival_distributions
+from benchmarks.synthetic import synthetic_trucks, synthetic_delivery_route
+
+FLEET_SIZES = [10, 1_000, 10_000]
+ROUTE_NODES = [10, 100, 1_000]
+QUICK_FLEET_SIZES = [10, 1_000]
+QUICK_ROUTE_NODES = [10, 100]
+# Full leg details for every truck on every leg; above this the response is mostly LegDetails
+MAX_FULL_DETAIL_LEGS = 100_000
+MONTE_CARLO_SAMPLES = [1_000, 10_000]
+
+
+def measure(fn, repeat: int, budget_s: float) -> dict:
+    # One warm-up call, then up to `repeat` timed calls or until the time budget is spent
+    fn()
+    times = []
+    while len(times) < repeat and (not times or sum(times) < budget_s):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "median_ms": round(statistics.median(times) * 1e3, 3),
+        "min_ms": round(min(times) * 1e3, 3),
+        "runs": len(times),
+    }
+
+
+def api_cases(fleet_sizes: list[int], route_nodes: list[int]):
+    # The app reads its module-level store, snapshots, registry and cache; each fleet size gets
+    # its own in-memory store (and snapshots of it) swapped in, and cold cases swap in a
+    # zero-size cache so every truck misses
+    os.environ.setdefault("FLEET_DB_PATH", ":memory:")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from fastapi.testclient import TestClient
+    import main
+    from route_registry import RouteRegistry
+    from snapshot import FleetSnapshots
+
+    client = TestClient(main.app)
+    routes = [synthetic_delivery_route(n) for n in route_nodes]
+
+    def get(url: str, cold: bool = True):
+        def call():
+            if cold:
+                main.FEASIBILITY_CACHE = FeasibilityCache(0)
+            client.get(url).raise_for_status()
+        return call
+
+    for n_trucks in fleet_sizes:
+        store = SQLiteFleetStore(":memory:")
+        store.put_trucks(synthetic_trucks(n_trucks))
+        store.put_routes(routes)
+        main.STORE = store
+        main.FLEET = FleetSnapshots(store)
+        main.ROUTES = RouteRegistry(main.FLEET)
+
+        yield f"get_trucks[{n_trucks}]", get("/trucks")
+        for route, n_nodes in zip(routes, route_nodes):
+            url = f"/routes/{route.id}/feasibility"
+            yield f"feasibility_summary[{n_trucks}x{n_nodes}]", get(url + "?detail=summary")
+            if n_trucks * n_nodes <= MAX_FULL_DETAIL_LEGS:
+                yield f"feasibility_full[{n_trucks}x{n_nodes}]", get(url)
+
+        # Every truck answered from the cache (the warm-up call fills it): what an unchanged
+        # fleet costs per request
+        k = min(1, len(routes) - 1)
+        main.FEASIBILITY_CACHE = FeasibilityCache(n_trucks)
+        yield f"feasibility_cached[{n_trucks}x{route_nodes[k]}]", get(f"/routes/{routes[k].id}/feasibility?detail=summary", cold=False)
+        # A threshold query answered from the reachability index (the warm-up call builds it)
+        yield (f"reachable_query[{n_trucks}x{route_nodes[k]}]",
+               get(f"/routes/{routes[k].id}/reachable?min_arrival_soc=25&status=green&limit=10", cold=False))
+
+
+def precharge_cases(fleet_sizes: list[int], route_nodes: list[int]):
+    # The minimum departure SoC search for every available truck, whether or not it would
+    # need it, so the work scales with the fleet rather than with how many happen to be short
+    for n_trucks in fleet_sizes:
+        trucks = [t for t in synthetic_trucks(n_trucks) if t.status in ("ready", "charging")]
+        fleet = fleet_columns(trucks)
+        loads, socs, caps = fleet['loads'], fleet['socs'], fleet['caps']
+        for n_nodes in route_nodes:
+            route = synthetic_delivery_route(n_nodes)
+            plan = CompiledRoute(route)
+            sim = simulate_fleet(route, plan, loads, socs, caps)
+            rows = np.flatnonzero(sim['valid'])
+            yield (f"precharge_solver[{n_trucks}x{n_nodes}]",
+                   lambda: min_departure_soc(departure_profile(plan, sim, rows), socs[rows]))
+            yield (f"precharge_bisect[{n_trucks}x{n_nodes}]",
+                   lambda: bisect_min_soc(route, plan, loads[rows], socs[rows], caps[rows]))
+
+
+def monte_carlo_cases(fleet_sizes: list[int], route_nodes: list[int]):
+    # ?samples=N on a 100-truck fleet (the target is 10k samples in under a second)
+    trucks = [t for t in synthetic_trucks(130) if t.status != "maintenance"][:100]
+    for n_nodes in route_nodes:
+        route = synthetic_delivery_route(n_nodes)
+        plan = CompiledRoute(route)
+        for samples in MONTE_CARLO_SAMPLES:
+            yield (f"monte_carlo[100x{n_nodes}x{samples}]",
+                   lambda: arrival_distributions(route, plan, trucks, samples))
+
+
+def serialization_cases(fleet_sizes: list[int], route_nodes: list[int]):
+    # Response bodies on their own, encoded from the store's truck records and the batch
+    # engine's results the way the endpoints do
+    n_nodes = route_nodes[min(1, len(route_nodes) - 1)]
+    route = synthetic_delivery_route(n_nodes)
+    plan = CompiledRoute(route)
+    for n_trucks in fleet_sizes:
+        store = SQLiteFleetStore(":memory:")
+        store.put_trucks(synthetic_trucks(n_trucks))
+        trucks = store.trucks()
+        results = evaluate_fleet(route, plan, trucks)
+        yield f"serialize_trucks[{n_trucks}]", lambda: encode_json(trucks)
+        yield f"serialize_feasibility_full[{n_trucks}x{n_nodes}]", lambda: encode_json(results)
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    # Prints the change per case; True if every case stayed within max_regression
+    print(f"\n{'case':<40} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    ok = True
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<40} {'-':>12} {now['median_ms']:>10.2f} {'new':>8}")
+            continue
+        change = now['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        flag = ""
+        if change > max_regression:
+            flag = "  SLOWER"
+            ok = False
+        print(f"{name:<40} {before['median_ms']:>12.2f} {now['median_ms']:>10.2f} {change:>+8.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    parser.add_argument("--quick", action="store_true", help="skip the 10k-truck and 1000-node sizes")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=3.0, help="seconds of timed runs per case")
+    args = parser.parse_args()
+
+    fleet_sizes = QUICK_FLEET_SIZES if args.quick else FLEET_SIZES
+    route_nodes = QUICK_ROUTE_NODES if args.quick else ROUTE_NODES
+
+    results = {}
+    print(f"{'case':<40} {'median ms':>10} {'min ms':>10} {'runs':>5}")
+    for cases in (api_cases, precharge_cases, monte_carlo_cases, serialization_cases):
+        for name, fn in cases(fleet_sizes, route_nodes):
+            if args.pattern and args.pattern not in name:
+                continue
+            results[name] = measure(fn, args.repeat, args.budget)
+            r = results[name]
+            print(f"{name:<40} {r['median_ms']:>10.2f} {r['min_ms']:>10.2f} {r['runs']:>5}", flush=True)
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "meta": {
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pydantic": pydantic.VERSION,
+                "machine": platform.platform(),
+                "cpus": os.cpu_count(),
+                "quick": args.quick,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
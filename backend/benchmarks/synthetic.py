@@ -0,0 +1,86 @@
+# Seeded synthetic fleets and routes for the benchmarks. The same seed always gives the
+# same trucks and routes, so runs on different commits measure the same workload.
+import random
+from models import Truck, Route, Stop, ChargingStation
+
+CHARGE_RATES_KW = [150.0, 250.0, 350.0]
+MAX_PAYLOAD_LBS = 40_000.0
+
+
+def synthetic_trucks(n: int, seed: int = 0) -> list[Truck]:
+    rng = random.Random(seed)
+    trucks = []
+    for k in range(n):
+        status = rng.choices(["ready", "charging", "maintenance"], [0.7, 0.2, 0.1])[0]
+        trucks.append(Truck(
+            id=f"T-{k:06d}", name=f"Truck {k}", soc=round(rng.uniform(10.0, 100.0), 1),
+            soh=round(rng.uniform(80.0, 100.0), 1), capacity_kwh=rng.choice([450.0, 500.0, 550.0, 600.0]),
+            load_lbs=rng.choice([0.0, 15000.0, 30000.0]), status=status,
+            charge_eta_mins=rng.randint(5, 90) if status == "charging" else None,
+        ))
+    return trucks
+
+
+def synthetic_routes(n: int, seed: int = 0) -> list[Route]:
+    # Regional routes with a handful of stations and stops, at random
+    rng = random.Random(seed)
+    routes = []
+    for k in range(n):
+        distance = rng.uniform(150.0, 1500.0)
+        stations = sorted(rng.uniform(0.0, distance) for _ in range(rng.randint(2, 8)))
+        stops = sorted(rng.uniform(0.0, distance) for _ in range(rng.randint(1, 4)))
+        routes.append(Route(
+            id=f"R-{k:05d}", name=f"Route {k}", distance_miles=distance, elevation_gain_ft=rng.uniform(0.0, 6000.0),
+            priority=rng.choice(["urgent", "standard"]), terrain_multiplier=rng.uniform(1.0, 1.4), base_consumption=1.8,
+            charging_stations=[ChargingStation(mile_marker=m, charge_rate_kw=rng.choice(CHARGE_RATES_KW))
+                               for m in stations],
+            stops=[Stop(mile_marker=m, unload_lbs=rng.choice([0.0, 10000.0]), pickup_lbs=rng.choice([0.0, 10000.0]),
+                        has_charger=rng.random() < 0.3) for m in stops],
+        ))
+    return routes
+
+
+def synthetic_route(n_chargers: int, seed: int = 0) -> Route:
+    # Long-haul corridor: chargers every ~40 miles with a delivery stop after every fifth one
+    rng = random.Random(seed)
+    mile = 0.0
+    stops, stations = [], []
+    for k in range(n_chargers):
+        mile += rng.uniform(25.0, 55.0)
+        stations.append(ChargingStation(mile_marker=mile, charge_rate_kw=rng.choice(CHARGE_RATES_KW)))
+        if k % 5 == 4:
+            mile += rng.uniform(5.0, 15.0)
+            stops.append(Stop(mile_marker=mile, unload_lbs=rng.choice([0.0, 10000.0]),
+                              pickup_lbs=rng.choice([0.0, 10000.0]), has_charger=False))
+    return Route(
+        id=f"SYN-{n_chargers}", name="Synthetic Corridor", distance_miles=mile + 40.0, elevation_gain_ft=0.0,
+        priority="standard", terrain_multiplier=1.2, base_consumption=1.8,
+        stops=stops, charging_stations=stations,
+    )
+
+
+def synthetic_delivery_route(n_nodes: int, seed: int = 0) -> Route:
+    # Multi-drop route with exactly n_nodes compiled nodes (depot and destination included).
+    # Every third waypoint is a stop. Stops drop part of what's on board and pick up new
+    # freight, so the payload swings between empty and MAX_PAYLOAD_LBS along the way.
+    rng = random.Random(seed)
+    mile = 0.0
+    load = rng.uniform(0.25, 1.0) * MAX_PAYLOAD_LBS
+    stops, stations = [], []
+    for k in range(max(n_nodes - 2, 0)):
+        mile += rng.uniform(10.0, 35.0)
+        if k % 3 == 2:
+            unload = round(load * rng.choice([0.25, 0.5, 1.0]), -2)
+            pickup = round(rng.uniform(0.0, MAX_PAYLOAD_LBS - (load - unload)), -2) if rng.random() < 0.6 else 0.0
+            load = load - unload + pickup
+            has_charger = rng.random() < 0.3
+            stops.append(Stop(mile_marker=mile, unload_lbs=unload, pickup_lbs=pickup, has_charger=has_charger,
+                              charge_rate_kw=rng.choice(CHARGE_RATES_KW) if has_charger else None))
+        else:
+            stations.append(ChargingStation(mile_marker=mile, charge_rate_kw=rng.choice(CHARGE_RATES_KW)))
+    return Route(
+        id=f"SYN-D{n_nodes}-{seed}", name="Synthetic Delivery Route", distance_miles=mile + rng.uniform(10.0, 35.0),
+        elevation_gain_ft=rng.uniform(0.0, 3000.0), priority=rng.choice(["urgent", "standard"]),
+        terrain_multiplier=rng.uniform(1.0, 1.3), base_consumption=1.8,
+        stops=stops, charging_stations=stations,
+    )
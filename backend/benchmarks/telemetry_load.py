@@ -0,0 +1,94 @@
+# Sustained telemetry ingestion against a local server.
+#
+#   cd backend && python -m benchmarks.telemetry_load [--seconds 10] [--clients 8] [--batch 2000]
+#
+# Starts uvicorn on a temporary store seeded with 50k trucks, then several clients post
+# batches of random SoC/load updates back to back. Reports the accepted rate (what the
+# endpoint takes in) and the written rate (rows the flushes commit after coalescing).
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.synthetic import synthetic_trucks
+from store import SQLiteFleetStore
+
+N_TRUCKS = 50_000
+PORT = 8765
+
+
+async def client(http: httpx.AsyncClient, truck_ids: list[str], batch: int, deadline: float, seed: int) -> int:
+    rng = random.Random(seed)
+    sent = 0
+    while time.perf_counter() < deadline:
+        updates = [
+            {"id": rng.choice(truck_ids), "soc": round(rng.uniform(10.0, 100.0), 1),
+             "load_lbs": rng.choice([0.0, 15000.0, 30000.0])}
+            for _ in range(batch)
+        ]
+        response = await http.post("/telemetry", json=updates)
+        response.raise_for_status()
+        sent += batch
+    return sent
+
+
+async def run_load(seconds: float, clients: int, batch: int, truck_ids: list[str]):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=30.0) as http:
+        before = (await http.get("/telemetry/stats")).json()
+        start = time.perf_counter()
+        sent = await asyncio.gather(*(
+            client(http, truck_ids, batch, start + seconds, seed) for seed in range(clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+        # Let the buffer drain before reading the write side
+        while (stats := (await http.get("/telemetry/stats")).json())["pending"]:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+        stats = (await http.get("/telemetry/stats")).json()
+
+    total = sum(sent)
+    written = stats["written"] - before["written"]
+    print(f"{'clients x batch':<28} {clients} x {batch}")
+    print(f"{'accepted updates/s':<28} {total / elapsed:,.0f}")
+    print(f"{'written rows/s':<28} {written / elapsed:,.0f}")
+    print(f"{'coalesced in buffer':<28} {(stats['coalesced'] - before['coalesced']) / max(total, 1):.1%}")
+    print(f"{'flushes':<28} {stats['flushes'] - before['flushes']}")
+    print(f"{'last flush ms':<28} {stats['last_flush_ms']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+
+    trucks = synthetic_trucks(N_TRUCKS)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "fleet.db")
+        SQLiteFleetStore(db_path).put_trucks(trucks)
+
+        env = {**os.environ, "FLEET_DB_PATH": db_path}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"], env=env
+        )
+        try:
+            for _ in range(100):
+                try:
+                    httpx.get(f"http://127.0.0.1:{PORT}/")
+                    break
+                except httpx.ConnectError:
+                    time.sleep(0.1)
+            asyncio.run(run_load(args.seconds, args.clients, args.batch, [t.id for t in trucks]))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
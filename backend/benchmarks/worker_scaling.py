@@ -0,0 +1,148 @@
+# Feasibility throughput against `uvicorn --workers N` sharing one fleet snapshot.
+#
+#   cd backend && python -m benchmarks.worker_scaling [--workers 1,2,4,8] [--seconds 10] [--trucks 2000]
+#
+# Starts uvicorn on a temporary store seeded with a synthetic fleet and a few 100-node routes,
+# once per worker count, and load generator processes request summary feasibility for random
+# routes for a fixed time. Reports requests/s, latency percentiles and the speedup over one
+# worker. With --telemetry, trucks also report at that many updates/s throughout, so the
+# writer keeps publishing snapshots and the workers switch versions under load.
+#
+# Without telemetry every worker must answer a route with the same ETag (same snapshot
+# version, same route version); the "etags" column counts distinct ones per route and should
+# be 1. Throughput can only scale with the cores left over by the load generators.
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.synthetic import synthetic_trucks, synthetic_delivery_route
+from store import SQLiteFleetStore
+
+PORT = 8766
+N_ROUTES = 4
+
+
+async def _generate(concurrency: int, seconds: float, route_ids: list[str], seed: int):
+    rng = random.Random(seed)
+    latencies, etags = [], {}
+
+    async def worker(http: httpx.AsyncClient, deadline: float):
+        while time.perf_counter() < deadline:
+            route_id = rng.choice(route_ids)
+            start = time.perf_counter()
+            response = await http.get(f"/routes/{route_id}/feasibility?detail=summary")
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            etags.setdefault(route_id, set()).add(response.headers["etag"])
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60.0) as http:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(worker(http, deadline) for _ in range(concurrency)))
+    return latencies, etags
+
+
+def generate(args: tuple):
+    # One load generator process
+    return asyncio.run(_generate(*args))
+
+
+async def _report_telemetry(rate: float, seconds: float, truck_ids: list[str]):
+    # Batches every 100 ms at the requested rate
+    rng = random.Random(1)
+    batch = max(1, int(rate / 10))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60.0) as http:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            updates = [{"id": rng.choice(truck_ids), "soc": round(rng.uniform(10.0, 100.0), 1)} for _ in range(batch)]
+            (await http.post("/telemetry", json=updates)).raise_for_status()
+            await asyncio.sleep(0.1)
+
+
+def report_telemetry(args: tuple):
+    asyncio.run(_report_telemetry(*args))
+
+
+def wait_ready(server: subprocess.Popen):
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited")
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/fleet/snapshot").raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--trucks", type=int, default=2000)
+    parser.add_argument("--generators", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight per generator")
+    parser.add_argument("--telemetry", type=float, default=0.0, help="truck updates/s during the run")
+    args = parser.parse_args()
+
+    trucks = synthetic_trucks(args.trucks)
+    routes = [synthetic_delivery_route(100, seed=k) for k in range(N_ROUTES)]
+    routes = [route.model_copy(update={"id": f"SYN-{k}"}) for k, route in enumerate(routes)]
+    route_ids = [route.id for route in routes]
+    ctx = multiprocessing.get_context("spawn")
+
+    print(f"{args.trucks} trucks, {N_ROUTES} routes x 100 nodes, {args.generators} generators x {args.concurrency} "
+          f"in flight, {args.telemetry:.0f} telemetry updates/s, {os.cpu_count()} cpus")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'etags':>6}")
+    baseline = None
+    for n_workers in [int(w) for w in args.workers.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "fleet.db")
+            store = SQLiteFleetStore(db_path)
+            store.put_trucks(trucks)
+            store.put_routes(routes)
+
+            env = {**os.environ, "FLEET_DB_PATH": db_path, "METRICS_ENABLED": "0"}
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--workers", str(n_workers),
+                 "--log-level", "warning"], env=env,
+            )
+            try:
+                wait_ready(server)
+                # Warm-up: every worker maps the snapshot and fills its feasibility cache
+                with ctx.Pool(args.generators) as pool:
+                    pool.map(generate, [(args.concurrency, 2.0, route_ids, k) for k in range(args.generators)])
+
+                with ctx.Pool(args.generators + 1) as pool:
+                    if args.telemetry:
+                        telemetry = pool.apply_async(report_telemetry, ((args.telemetry, args.seconds, [t.id for t in trucks]),))
+                    start = time.perf_counter()
+                    runs = pool.map(generate, [(args.concurrency, args.seconds, route_ids, 100 + k)
+                                               for k in range(args.generators)])
+                    elapsed = time.perf_counter() - start
+                    if args.telemetry:
+                        telemetry.get()
+            finally:
+                server.terminate()
+                server.wait()
+
+        latencies = sorted(latency for run, _ in runs for latency in run)
+        etags = {}
+        for _, run_etags in runs:
+            for route_id, tags in run_etags.items():
+                etags.setdefault(route_id, set()).update(tags)
+        rps = len(latencies) / elapsed
+        baseline = baseline or rps
+        q = statistics.quantiles(latencies, n=100)
+        print(f"{n_workers:>7} {rps:>9.1f} {rps / baseline:>7.2f}x {q[49] * 1e3:>8.1f} {q[94] * 1e3:>8.1f} "
+              f"{q[98] * 1e3:>8.1f} {max(len(tags) for tags in etags.values()):>6}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
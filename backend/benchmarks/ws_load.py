@@ -0,0 +1,223 @@
+# Many dashboards on /ws/fleet at once, with telemetry flowing.
+#
+#   cd backend && python -m benchmarks.ws_load [--clients 2000] [--seconds 20] [--trucks 500] [--telemetry 200]
+#
+# Starts uvicorn on a temporary store seeded with a synthetic fleet and a few routes, then
+# client processes open --clients connections, each subscribing to one random route, while
+# trucks report --telemetry updates/s. Reports how long it took to get everyone connected, the
+# snapshot and diff sizes, diff latency (server tick to client receipt) and what the feed sent.
+#
+# --slow of the clients read one message every few seconds; once their socket buffers fill, the
+# server merges the diffs piling up for them, so they receive fewer, larger ones and the others
+# are unaffected. One client applies every diff it gets to its snapshot; once the feed goes quiet
+# after the run, its fleet and feasibility rows are compared with GET /trucks and
+# GET /routes/{id}/feasibility and must match.
+#
+# Clients don't negotiate permessage-deflate, so the numbers are for the feed itself.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from websockets.asyncio.client import connect
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes
+from store import SQLiteFleetStore
+
+PORT = 8767
+URL = f"ws://127.0.0.1:{PORT}/ws/fleet"
+N_ROUTES = 10
+CONNECTS_IN_FLIGHT = 64
+SLOW_READ_S = 3.0
+QUIET_S = 3.0
+
+
+def diff_time(message: str) -> float:
+    # The server's "time" near the start of a diff, without parsing all of it
+    start = message.index('"time":') + 7
+    return float(message[start:message.index(",", start)])
+
+
+async def _clients(n: int, first: int, route_ids: list[str], slow: float, connected, stop, seed: int) -> dict:
+    rng = random.Random(seed)
+    out = {"snapshot_bytes": [], "diff_bytes": [], "latencies": [], "slow_diffs": 0, "fast_diffs": 0,
+           "mismatches": None, "errors": 0}
+    gate = asyncio.Semaphore(CONNECTS_IN_FLIGHT)
+    done = asyncio.Event()
+
+    async def dashboard(k: int):
+        route_id = rng.choice(route_ids)
+        is_slow = rng.random() < slow
+        checker = k == 0
+        trucks, rows = {}, {}
+        try:
+            async with gate:
+                ws = await connect(URL, max_size=None, compression=None, open_timeout=60)
+        except Exception:
+            out["errors"] += 1
+            connected.put(0)
+            return
+        try:
+            snapshot = await ws.recv()
+            out["snapshot_bytes"].append(len(snapshot))
+            if checker:
+                trucks = {t["id"]: t for t in json.loads(snapshot)["trucks"]}
+            await ws.send(json.dumps({"subscribe": [route_id]}))
+            feasibility = json.loads(await ws.recv())
+            if checker:
+                rows = {r["truck_id"]: r for r in feasibility["results"]}
+            connected.put(1)
+            idle = 0.0
+            while not done.is_set() or (checker and idle < QUIET_S):
+                try:
+                    message = await asyncio.wait_for(ws.recv(), 0.5)
+                    idle = 0.0
+                except asyncio.TimeoutError:
+                    idle += 0.5
+                    continue
+                if is_slow:
+                    out["slow_diffs"] += 1
+                    await asyncio.sleep(SLOW_READ_S)
+                    continue
+                out["fast_diffs"] += 1
+                out["diff_bytes"].append(len(message))
+                out["latencies"].append(time.time() - diff_time(message))
+                if checker:
+                    diff = json.loads(message)
+                    for truck_id, fields in diff["trucks"].items():
+                        trucks.setdefault(truck_id, {}).update(fields)
+                    rows.update(diff["feasibility"].get(route_id, {}))
+            if checker:
+                # The run is over and the feed has been quiet for QUIET_S: this is what the API says now
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60.0) as http:
+                    expected_trucks = {t["id"]: t for t in (await http.get("/trucks")).json()}
+                    expected_rows = {r["truck_id"]: r for r in
+                                     (await http.get(f"/routes/{route_id}/feasibility?detail=summary")).json()}
+                out["mismatches"] = (sum(trucks.get(i) != t for i, t in expected_trucks.items())
+                                     + sum(rows.get(i) != r for i, r in expected_rows.items()))
+        except Exception:
+            out["errors"] += 1
+            connected.put(0)
+        finally:
+            await ws.close()
+
+    async def watch_stop():
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        done.set()
+
+    await asyncio.gather(watch_stop(), *(dashboard(first + k) for k in range(n)))
+    return out
+
+
+def clients(args: tuple) -> dict:
+    # One client process
+    return asyncio.run(_clients(*args))
+
+
+async def report_telemetry(rate: float, seconds: float, truck_ids: list[str]):
+    # Batches every 100 ms at the requested rate
+    rng = random.Random(1)
+    batch = max(1, int(rate / 10))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60.0) as http:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            updates = [{"id": rng.choice(truck_ids), "soc": round(rng.uniform(10.0, 100.0), 1)} for _ in range(batch)]
+            (await http.post("/telemetry", json=updates)).raise_for_status()
+            await asyncio.sleep(0.1)
+
+
+def wait_ready(server: subprocess.Popen):
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited")
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/fleet/feed").raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn did not start")
+
+
+def percentile_ms(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] * 1e3 if len(values) > 1 else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--trucks", type=int, default=500)
+    parser.add_argument("--telemetry", type=float, default=200.0, help="truck updates/s during the run")
+    parser.add_argument("--slow", type=float, default=0.02, help="fraction of slow clients")
+    parser.add_argument("--processes", type=int, default=2, help="client processes")
+    parser.add_argument("--tick-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    trucks = synthetic_trucks(args.trucks)
+    routes = synthetic_routes(N_ROUTES)
+    route_ids = [route.id for route in routes]
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.clients} clients over {args.processes} processes, {args.trucks} trucks, {N_ROUTES} routes, "
+          f"{args.telemetry:.0f} telemetry updates/s, {args.tick_ms} ms tick, {os.cpu_count()} cpus")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "fleet.db")
+        store = SQLiteFleetStore(db_path)
+        store.put_trucks(trucks)
+        store.put_routes(routes)
+        env = {**os.environ, "FLEET_DB_PATH": db_path, "METRICS_ENABLED": "0", "WS_TICK_MS": str(args.tick_ms)}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--ws", "websockets-sansio",
+             "--backlog", "4096", "--log-level", "warning"], env=env,
+        )
+        try:
+            wait_ready(server)
+            manager = ctx.Manager()
+            connected, stop = manager.Queue(), manager.Event()
+            share = [args.clients // args.processes + (k < args.clients % args.processes) for k in range(args.processes)]
+            firsts = [sum(share[:k]) for k in range(args.processes)]
+            with ctx.Pool(args.processes) as pool:
+                start = time.perf_counter()
+                runs = pool.map_async(clients, [(share[k], firsts[k], route_ids, args.slow, connected, stop, k)
+                                                for k in range(args.processes)])
+                ok = sum(connected.get(timeout=300) for _ in range(args.clients))
+                ramp = time.perf_counter() - start
+                print(f"connected {ok}/{args.clients} in {ramp:.1f} s", flush=True)
+
+                before = httpx.get(f"http://127.0.0.1:{PORT}/fleet/feed").json()
+                start = time.perf_counter()
+                asyncio.run(report_telemetry(args.telemetry, args.seconds, [t.id for t in trucks]))
+                elapsed = time.perf_counter() - start
+                time.sleep(1.0)
+                after = httpx.get(f"http://127.0.0.1:{PORT}/fleet/feed").json()
+                stop.set()
+                runs = runs.get()
+        finally:
+            server.terminate()
+            server.wait()
+
+    merged = {key: [v for run in runs for v in run[key]] for key in ("snapshot_bytes", "diff_bytes", "latencies")}
+    sent = after["messages_sent"] - before["messages_sent"]
+    sent_bytes = after["bytes_sent"] - before["bytes_sent"]
+    fast = sum(run["fast_diffs"] for run in runs)
+    slow = sum(run["slow_diffs"] for run in runs)
+    print(f"snapshot {statistics.mean(merged['snapshot_bytes']) / 1e3:.1f} KB, "
+          f"diff mean {statistics.mean(merged['diff_bytes'] or [0]):.0f} B")
+    print(f"feed: {after['diffs'] - before['diffs']} diffs, {sent / elapsed:.0f} messages/s, "
+          f"{sent_bytes / elapsed / 1e6:.2f} MB/s, {after['merged_diffs']} merged for slow clients, "
+          f"{after['timed_out']} timed out")
+    print(f"diff latency p50 {percentile_ms(merged['latencies'], 50):.1f} ms, "
+          f"p99 {percentile_ms(merged['latencies'], 99):.1f} ms; "
+          f"received {fast} diffs (fast clients), {slow} (slow clients)")
+    print(f"checker mismatches {runs[0]['mismatches']}, client errors {sum(run['errors'] for run in runs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import json
+from functools import lru_cache
+import numpy as np
+
+# Nonlinear charging. A truck's charge curve is the power its battery accepts by SoC,
+# ((soc %, kW), ...) interpolated linearly and flat past the first and last points; on a
+# charger it draws min(charger kW, curve). Trucks without a curve draw the charger's rated
+# power all the way, as before.
+#
+# Charge time from one SoC to another is a lookup, not an integration: a ChargeTable holds
+# the cumulative minutes per kWh of effective capacity from 0% to every point of a 0.1% SoC
+# grid, so the minutes between two SoCs are cap * (at(s2) - at(s1)), linear within a cell.
+# Tables are built once per (curve, charger kW) and cached per process.
+#
+# The batch engine carries curves as text (curve_text, '' for none), the form the store and
+# the fleet snapshots keep them in; TruckRecords and models hold the tuple.
+
+CHARGE_TABLE_STEPS = 1000
+
+
+def curve_text(curve) -> str:
+    return json.dumps([[float(soc), float(kw)] for soc, kw in curve], separators=(",", ":")) if curve else ""
+
+
+def parse_curve(text: str | None) -> tuple | None:
+    return tuple((soc, kw) for soc, kw in json.loads(text)) if text else None
+
+
+class ChargeTable:
+    __slots__ = ('minutes', '_minutes', '_grid')
+
+    def __init__(self, curve: tuple, charger_kw: float):
+        socs = np.array([point[0] for point in curve], dtype=np.float64) / 100
+        kws = np.array([point[1] for point in curve], dtype=np.float64)
+        # Power at each cell's midpoint, held across the cell
+        midpoints = (np.arange(CHARGE_TABLE_STEPS) + 0.5) / CHARGE_TABLE_STEPS
+        power = np.minimum(charger_kw, np.interp(midpoints, socs, kws))
+        self.minutes = np.concatenate([[0.0], np.cumsum(60 / CHARGE_TABLE_STEPS / power)])
+        self._minutes = self.minutes.tolist()
+        self._grid = np.linspace(0.0, 1.0, CHARGE_TABLE_STEPS + 1)
+
+    def at(self, soc: float) -> float:
+        # Minutes per kWh of capacity from 0% to soc (a fraction), for the scalar engine. The
+        # same arithmetic as at_array, so both engines get the same minutes.
+        x = min(max(soc, 0.0), 1.0) * CHARGE_TABLE_STEPS
+        k = min(int(x), CHARGE_TABLE_STEPS - 1)
+        low = self._minutes[k]
+        return low + (self._minutes[k + 1] - low) * (x - k)
+
+    def at_array(self, socs: np.ndarray) -> np.ndarray:
+        x = np.clip(socs, 0.0, 1.0) * CHARGE_TABLE_STEPS
+        k = np.minimum(x.astype(np.int64), CHARGE_TABLE_STEPS - 1)
+        low = self.minutes[k]
+        return low + (self.minutes[k + 1] - low) * (x - k)
+
+    def soc_after(self, socs, minutes_per_kwh):
+        # SoC reached charging from socs for the given minutes per kWh of capacity (1.0 at most)
+        return np.interp(self.at_array(np.asarray(socs, dtype=np.float64)) + minutes_per_kwh, self.minutes, self._grid)
+
+
+@lru_cache(maxsize=1024)
+def charge_table(curve: tuple, charger_kw: float) -> ChargeTable:
+    return ChargeTable(curve, charger_kw)
+
+
+def curve_groups(curves: np.ndarray | None) -> list[tuple[tuple, np.ndarray]]:
+    # The rows of a batch per distinct curve, leaving out the trucks without one
+    if curves is None or not len(curves):
+        return []
+    has_curve = curves != ""
+    if not has_curve.any():
+        return []
+    rows = np.flatnonzero(has_curve)
+    keys, inverse = np.unique(curves[rows], return_inverse=True)
+    return [(parse_curve(key), rows[inverse == k]) for k, key in enumerate(keys.tolist())]
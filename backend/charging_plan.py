@@ -0,0 +1,215 @@
+import math
+import numpy as np
+from models import Route, Truck
+from records import FeasibilityRecord
+from metrics import timed
+from charge_curves import charge_table
+from matrix import get_pool
+from simulation import (
+    WEIGHT_FACTOR, ENERGY_COST_PER_KWH, MIN_BUFFER_SOC, CHARGE_TARGET_SOC, TRUCK_TARE_LBS,
+    CompiledRoute, simulate_route, feasibility_status, charge_overlap_mins,
+)
+
+# strategy=optimal: choose how long to charge at every charger so the trip is as short as
+# possible, instead of the greedy "just enough to reach the next charger" rule.
+#
+# The drive time is fixed, so the trip time only moves with the dwell at each node,
+# max(unload, charge). A dynamic program walks the nodes keeping, for every reachable SoC,
+# the least dwell so far. At a charger every whole number of charging minutes is an option
+# (ceil is what gets billed, so fractional minutes are never better), up to the 90% target
+# and no higher than what the rest of the route needs; with a charge curve each minute adds
+# whatever the curve allows from that SoC. That is where the overlap shows: up to
+# 30 minutes of charging at a stop costs nothing extra.
+#
+# The states kept per node are the Pareto front of (higher SoC, lower dwell). Dwell is in
+# whole minutes, so the front never holds more states than there are distinct dwell values,
+# and it is capped at OPTIMAL_MAX_STATES by thinning on a SoC grid, which keeps the DP linear
+# in route length (well under a millisecond per node). Below the cap the plan is exact; long routes that hit it
+# land within a fraction of a percent (see benchmarks/charging_strategy.py). SoCs are carried
+# exactly, never rounded, so any plan found is really feasible. The plan is replayed through
+# simulate_route, and a result only replaces the greedy one when its trip is shorter.
+#
+# A plan is scalar Python, at worst about 0.7 ms per truck per route node
+# (benchmarks/charging_strategy.py), so a fleet's plans run in chunks on the matrix process
+# pool and the API caps the work per request (OPTIMAL_MAX_TRUCK_NODES in main.py).
+
+OPTIMAL_MAX_STATES = 64
+SOC_GRID = 1 / OPTIMAL_MAX_STATES
+OPTIMAL_CHUNK_TRUCKS = 16
+
+
+def _pareto(socs: np.ndarray, dwell: np.ndarray) -> np.ndarray:
+    # Indices of the states not beaten by another with at least the SoC and at most the dwell
+    # Dwell is whole minutes and SoC is within (0, 2), so one key sorts by dwell, then SoC descending
+    order = np.argsort(dwell * 2 - socs)
+    best_soc = np.maximum.accumulate(socs[order])
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = socs[order][1:] > best_soc[:-1]
+    front = order[keep]
+    if len(front) > OPTIMAL_MAX_STATES:
+        # Thin to one state per SoC cell; the front is in dwell order, so the first is the quickest
+        _, first = np.unique(np.floor(socs[front] / SOC_GRID), return_index=True)
+        front = front[np.sort(first)]
+    return front
+
+
+@timed("optimal")
+def optimal_charge_targets(route: Route, plan: CompiledRoute, truck_initial_load, truck_initial_soc,
+                           effective_capacity, charge_curve: tuple | None = None) -> list[float | None] | None:
+    # Per-node charge targets for simulate_route that minimize the total dwell, or None if the
+    # truck can't finish the route from this SoC
+    if effective_capacity <= 0:
+        return None
+
+    n_legs = len(plan.leg_distance)
+
+    # Same leg energies as simulate_route, in the same order
+    load = max(truck_initial_load, plan.depot_payload)
+    leg_soc = []
+    for i in range(n_legs):
+        if plan.leg_grade is None:
+            energy_needed_kwh = (route.base_consumption + WEIGHT_FACTOR * load) * plan.leg_distance[i] * route.terrain_multiplier
+        else:
+            energy_needed_kwh = max(0.0, (route.base_consumption + WEIGHT_FACTOR * load) * plan.leg_distance[i]
+                                    + (TRUCK_TARE_LBS + load) * plan.leg_grade[i])
+        leg_soc.append(energy_needed_kwh / effective_capacity)
+        if plan.is_stop[i + 1]:
+            load = max(0, load - plan.unload_lbs[i + 1] + plan.pickup_lbs[i + 1])
+    remaining_soc = np.cumsum(leg_soc[::-1])[::-1]
+
+    unload_time = [30 if stop else 0 for stop in plan.is_stop]
+    if plan.depot_payload > 0:
+        unload_time[0] = 30
+
+    socs = np.array([float(truck_initial_soc)])
+    dwell = np.zeros(1)
+    steps = []   # per node: (index of the previous state, charge target or NaN) for every state kept
+    for i in range(n_legs):
+        parent = np.arange(len(socs))
+        target = np.full(len(socs), np.nan)
+        depart_socs = socs
+        depart_dwell = dwell + unload_time[i]
+
+        if plan.has_charger[i]:
+            rate = plan.charge_rate_kw[i]
+            ceiling = min(CHARGE_TARGET_SOC, remaining_soc[i] + MIN_BUFFER_SOC)
+            table = charge_table(charge_curve, rate) if charge_curve is not None else None
+            if table is None:
+                n_minutes = math.ceil(max(0.0, ceiling - socs.min()) * effective_capacity / rate * 60)
+            else:
+                n_minutes = math.ceil(max(0.0, effective_capacity * (table.at(ceiling) - table.at(float(socs.min())))))
+            if n_minutes > 0:
+                minutes = np.arange(1, n_minutes + 1)
+                if table is None:
+                    levels = np.minimum(socs[:, None] + minutes * (rate / 60 / effective_capacity), ceiling)
+                else:
+                    levels = np.minimum(table.soc_after(socs[:, None], minutes / effective_capacity), ceiling)
+                deficit = levels - socs[:, None]
+                # The same arithmetic simulate_route uses once it is handed these targets, and the
+                # minutes to the ceiling: past that every option is the same, so only keep up to it
+                if table is None:
+                    charge_mins = np.ceil(deficit * effective_capacity / rate * 60)
+                    needed = np.ceil((ceiling - socs) * effective_capacity / rate * 60)
+                else:
+                    charge_mins = np.ceil(effective_capacity * (table.at_array(socs[:, None] + deficit)
+                                                                - table.at_array(socs[:, None])))
+                    needed = np.ceil(effective_capacity * (table.at(ceiling) - table.at_array(socs)))
+                usable = (deficit > 0.001) & (minutes <= needed[:, None])
+                rows, cols = np.nonzero(usable)
+                parent = np.concatenate([parent, rows])
+                target = np.concatenate([target, levels[rows, cols]])
+                depart_socs = np.concatenate([depart_socs, socs[rows] + deficit[rows, cols]])
+                depart_dwell = np.concatenate([
+                    depart_dwell, dwell[rows] + np.maximum(unload_time[i], charge_mins[rows, cols]),
+                ])
+
+        arrive_socs = depart_socs - leg_soc[i]
+        feasible = ~(arrive_socs < MIN_BUFFER_SOC - 1e-9)
+        if not feasible.any():
+            return None
+        front = np.flatnonzero(feasible)[_pareto(arrive_socs[feasible], depart_dwell[feasible])]
+        steps.append((parent[front], target[front]))
+        socs, dwell = arrive_socs[front], depart_dwell[front]
+
+    # Shortest dwell at the destination (the front is ordered by dwell), then walk back
+    state = int(np.argmin(dwell))
+    targets: list[float | None] = [None] * (n_legs + 1)
+    for i in reversed(range(n_legs)):
+        parent, target = steps[i]
+        if not np.isnan(target[state]):
+            targets[i] = float(target[state])
+        state = int(parent[state])
+    return targets
+
+
+def can_improve(greedy: FeasibilityRecord) -> bool:
+    # Only trucks that can go as they stand and charge on the way have anything to gain
+    return not (greedy.status == "red" or greedy.feasible_after_precharge or greedy.no_charge_needed)
+
+
+def optimal_plan(route: Route, plan: CompiledRoute, truck: Truck, greedy_trip_mins: int,
+                 detail: str = "full") -> FeasibilityRecord | None:
+    # The optimal plan's result when its trip is shorter than greedy_trip_mins, otherwise None
+    effective_capacity = truck.capacity_kwh * (truck.soh / 100)
+    targets = optimal_charge_targets(route, plan, truck.load_lbs, truck.soc / 100, effective_capacity, truck.charge_curve)
+    if targets is None:
+        return None
+    sim = simulate_route(route, plan, truck.load_lbs, truck.soc / 100, effective_capacity, charge_targets=targets,
+                         charge_curve=truck.charge_curve)
+    if not sim['feasible'] or sim['estimated_trip_time_mins'] >= greedy_trip_mins:
+        return None
+
+    return FeasibilityRecord(
+        truck_id=truck.id,
+        status=feasibility_status(sim['feasible'], False, sim['no_charge_needed']),
+        arrival_soc=sim['arrival_soc'],
+        energy_required_kwh=round(sim['total_energy_kwh'], 2),
+        charge_time_mins=sim['total_charge_time_mins'],
+        total_stop_time_mins=sim['total_stop_time_mins'],
+        estimated_trip_time_mins=sim['estimated_trip_time_mins'],
+        energy_cost_estimate=round(sim['total_energy_kwh'] * ENERGY_COST_PER_KWH, 2),
+        stops_required=sim['stops_required'],
+        no_charge_needed=sim['no_charge_needed'],
+        charge_overlap_mins=charge_overlap_mins(sim['leg_details']),
+        leg_details=[leg.model_dump() for leg in sim['leg_details']] if detail == "full" else []
+    )
+
+
+def optimal_result(route: Route, plan: CompiledRoute, truck: Truck, greedy: FeasibilityRecord,
+                   detail: str = "full") -> FeasibilityRecord:
+    # The optimal plan's result when it beats the greedy one, otherwise the greedy result
+    if not can_improve(greedy):
+        return greedy
+    return optimal_plan(route, plan, truck, greedy.estimated_trip_time_mins, detail) or greedy
+
+
+def optimal_chunk(route: Route, plan: CompiledRoute, trucks: list[Truck], greedy_trip_mins: list[int],
+                  detail: str) -> list[FeasibilityRecord | None]:
+    # Pool task: optimal_plan for a chunk of trucks
+    return [optimal_plan(route, plan, truck, mins, detail) for truck, mins in zip(trucks, greedy_trip_mins)]
+
+
+def optimal_results(route: Route, plan: CompiledRoute, trucks: list[Truck], greedy: list[FeasibilityRecord],
+                    detail: str = "full") -> list[FeasibilityRecord]:
+    # optimal_result for every truck. Past OPTIMAL_CHUNK_TRUCKS trucks with something to gain,
+    # the DPs run in chunks on the matrix process pool; this blocks the calling thread while
+    # they do, so the API calls it through asyncio.to_thread.
+    rows = [k for k, result in enumerate(greedy) if can_improve(result)]
+    trip_mins = [greedy[k].estimated_trip_time_mins for k in rows]
+    if len(rows) <= OPTIMAL_CHUNK_TRUCKS:
+        plans = optimal_chunk(route, plan, [trucks[k] for k in rows], trip_mins, detail)
+    else:
+        starts = range(0, len(rows), OPTIMAL_CHUNK_TRUCKS)
+        n_chunks = len(starts)
+        parts = get_pool().map(
+            optimal_chunk, [route] * n_chunks, [plan] * n_chunks,
+            [[trucks[k] for k in rows[start:start + OPTIMAL_CHUNK_TRUCKS]] for start in starts],
+            [trip_mins[start:start + OPTIMAL_CHUNK_TRUCKS] for start in starts], [detail] * n_chunks,
+        )
+        plans = [record for part in parts for record in part]
+
+    results = list(greedy)
+    for k, record in zip(rows, plans):
+        if record is not None:
+            results[k] = record
+    return results
@@ -0,0 +1,145 @@
+import heapq
+import math
+import numpy as np
+from models import Route, Truck, DepotConfig, DepotJob, ChargeSlot, DepotSchedule
+from simulation import CompiledRoute
+from batch_simulation import solve_fleet, fleet_columns, STATUS_RED
+from charge_curves import charge_table
+
+# Depot pre-charge under plug contention. precharge_mins assumes every truck has a 150 kW
+# charger to itself; here the depot has a fixed number of plugs, and optionally a site limit
+# that the active plugs share equally (each draws min(charger_kw, site_limit_kw / active)).
+#
+# Trucks already charging hold a plug from t=0. The jobs (trucks about to leave on a route)
+# wait in a priority queue, urgent routes first, then earliest departure, and take plugs as
+# they free up. Each truck charges to the minimum departure SoC for its route.
+#
+# The scheduler is event driven. Every active plug draws the same power, so all sessions
+# advance by the same energy; a session that starts when the per-plug energy counter reads E
+# and needs e kWh finishes when it reads E + e. Active sessions sit in a heap on that value,
+# so each start and finish is O(log n) whatever the power sharing does.
+#
+# A truck with a charge curve draws less than the plug's rate near the top of its battery.
+# Its session is sized as the energy the plug would deliver at full rate in the time the curve
+# takes (the curve's minutes at charger_kw), so on an unlimited site it is ready exactly when
+# the curve says and the plug is held for that long. Under a site limit the shared power
+# scales that time, which overstates it somewhat for a curve-limited session (the curve and
+# the limit don't both bind at once).
+
+
+def schedule_sessions(needs: list[float], keys: list[tuple], depot: DepotConfig):
+    # needs: kWh per session; keys: queue order per session (lowest first). Sessions that need
+    # nothing are ready at once without a plug. Returns start and ready minutes per session
+    # (None if not reached within the horizon), the plug of each session, the peak site power
+    # and when the last plug frees up (None if past the horizon).
+    n = len(needs)
+    start: list[float | None] = [None] * n
+    ready: list[float | None] = [None] * n
+    plug_of: list[int | None] = [None] * n
+
+    waiting = []
+    for session in range(n):
+        if needs[session] <= 0:
+            start[session] = ready[session] = 0.0
+        else:
+            waiting.append((keys[session], session))
+    heapq.heapify(waiting)
+    free = list(range(depot.chargers))
+    active: list[tuple[float, int]] = []   # (energy counter value when done, session)
+    energy = 0.0    # kWh delivered per active plug so far
+    now = 0.0       # minutes
+    peak_kw = 0.0
+
+    def fill_plugs():
+        while free and waiting:
+            _, session = heapq.heappop(waiting)
+            plug_of[session] = heapq.heappop(free)
+            start[session] = now
+            heapq.heappush(active, (energy + needs[session], session))
+
+    fill_plugs()
+    while active:
+        kw = depot.charger_kw
+        if depot.site_limit_kw is not None:
+            kw = min(kw, depot.site_limit_kw / len(active))
+        peak_kw = max(peak_kw, kw * len(active))
+
+        done_at = active[0][0]
+        next_now = now + (done_at - energy) / kw * 60
+        if next_now > depot.horizon_mins:
+            break
+        now, energy = next_now, done_at
+        while active and active[0][0] <= energy + 1e-9:
+            _, session = heapq.heappop(active)
+            ready[session] = now
+            heapq.heappush(free, plug_of[session])
+        fill_plugs()
+
+    makespan = None if active or waiting else now
+    return start, ready, plug_of, peak_kw, makespan
+
+
+def plan_depot(jobs: list[DepotJob], trucks: dict[str, Truck], routes: dict[str, Route],
+               plans: dict[str, CompiledRoute], charging: list[Truck], depot: DepotConfig) -> DepotSchedule:
+    # trucks/routes/plans: by id, covering every job. charging: every truck currently on a plug.
+    # Each job's energy comes from the minimum departure SoC solve_fleet finds for its route.
+    plugged_ids = {truck.id for truck in charging}
+    sessions = []   # (truck id, job or None, kWh, kWh at the plug's full rate, queue key)
+    infeasible = []
+
+    by_route: dict[str, list[DepotJob]] = {}
+    for job in jobs:
+        by_route.setdefault(job.route_id, []).append(job)
+    for route_id, route_jobs in by_route.items():
+        route = routes[route_id]
+        fleet = fleet_columns([trucks[job.truck_id] for job in route_jobs])
+        sim = solve_fleet(route, plans[route_id], fleet)
+        need_kwh = np.maximum(sim['departure_soc'] - fleet['socs'], 0.0) * fleet['caps']
+        rank = 0 if route.priority == "urgent" else 1
+        for r, job in enumerate(route_jobs):
+            truck = trucks[job.truck_id]
+            if sim['status'][r] == STATUS_RED or truck.status not in ("ready", "charging"):
+                infeasible.append(job.truck_id)
+                continue
+            need = plug_kwh = float(need_kwh[r])
+            if truck.charge_curve is not None and need > 0:
+                table = charge_table(truck.charge_curve, depot.charger_kw)
+                minutes = fleet['caps'][r] * (table.at(sim['departure_soc'][r]) - table.at(fleet['socs'][r]))
+                plug_kwh = float(minutes) / 60 * depot.charger_kw
+            # A truck already on a plug keeps it: it goes ahead of the queue
+            key = (0, 0, 0, job.truck_id) if job.truck_id in plugged_ids else (1, rank, job.departure_mins, job.truck_id)
+            sessions.append((job.truck_id, job, need, plug_kwh, key))
+
+    # Trucks on a plug without a session of their own (not leaving, or their job is
+    # infeasible) just finish the charge they're on. charge_eta_mins already follows their
+    # curve, so it is plug time at the full rate.
+    scheduled = {session[0] for session in sessions}
+    for truck in charging:
+        if truck.id not in scheduled:
+            plug_kwh = (truck.charge_eta_mins or 0) / 60 * depot.charger_kw
+            sessions.append((truck.id, None, plug_kwh, plug_kwh, (0, 0, 0, truck.id)))
+
+    start, ready, plug_of, peak_kw, makespan = schedule_sessions(
+        [s[3] for s in sessions], [s[4] for s in sessions], depot
+    )
+
+    slots = []
+    for s, (truck_id, job, need, plug_kwh, _) in enumerate(sessions):
+        ready_mins = None if ready[s] is None else math.ceil(ready[s] - 1e-9)
+        slots.append(ChargeSlot(
+            truck_id=truck_id,
+            route_id=job.route_id if job else None,
+            plug=plug_of[s],
+            energy_kwh=round(need, 2),
+            start_mins=None if start[s] is None else math.floor(start[s] + 1e-9),
+            ready_mins=ready_mins,
+            late_mins=max(0, ready_mins - job.departure_mins) if job and ready_mins is not None else None,
+            isolated_ready_mins=math.ceil(plug_kwh / depot.charger_kw * 60 - 1e-9),
+        ))
+    slots.sort(key=lambda slot: (slot.ready_mins is None, slot.ready_mins or 0, slot.truck_id))
+    return DepotSchedule(
+        slots=slots,
+        infeasible_truck_ids=infeasible,
+        peak_kw=round(peak_kw, 2),
+        makespan_mins=None if makespan is None else math.ceil(makespan - 1e-9),
+    )
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.sparse import csr_array
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+from models import Route, Truck, DispatchAssignment, DispatchPlan
+from simulation import WEIGHT_FACTOR, ENERGY_COST_PER_KWH, MIN_BUFFER_SOC, TRUCK_TARE_LBS, CompiledRoute
+from batch_simulation import solve_fleet, STATUS_RED, STATUS_NAMES
+
+# Fleet-to-route assignment. Each route is simulated against the fleet (one pool task per
+# route, like the feasibility matrix); red pairs never become edges, so the assignment runs
+# on a sparse bipartite graph of the pairs that can actually be dispatched.
+#
+# Cost of a pair, in dollars: (trip time + wait before departure) * time_cost_per_min plus
+# the energy cost. Urgent routes weigh urgent_weight times as much as standard ones, both in
+# coverage (an urgent route counts as urgent_weight routes) and in cost. The plan covers as
+# much weighted route as possible, then has the lowest weighted cost among such plans.
+
+
+def longest_unpowered_miles(plan: CompiledRoute) -> float:
+    # Longest stretch between a charger (or the depot) and the next charger or the destination
+    longest = run = 0.0
+    for i, distance in enumerate(plan.leg_distance):
+        if plan.has_charger[i]:
+            run = 0.0
+        run += distance
+        longest = max(longest, run)
+    return longest
+
+
+def min_stretch_kwh(route: Route, plan: CompiledRoute) -> float:
+    # The least energy any truck needs for the longest unpowered stretch. With an elevation
+    # profile a leg takes at least its empty-truck energy, unless heavier loads recover more
+    # on its descent than they cost on the flat, in which case it can take nothing.
+    if plan.leg_grade is None:
+        return longest_unpowered_miles(plan) * route.base_consumption * route.terrain_multiplier
+    longest = run = 0.0
+    for i, distance in enumerate(plan.leg_distance):
+        if plan.has_charger[i]:
+            run = 0.0
+        grade = plan.leg_grade[i]
+        if WEIGHT_FACTOR * distance + grade >= 0:
+            run += max(0.0, route.base_consumption * distance + TRUCK_TARE_LBS * grade)
+        longest = max(longest, run)
+    return longest
+
+
+def dispatch_candidates(route: Route, plan: CompiledRoute, fleet: dict) -> dict:
+    # Pool task: the non-red trucks for one route and what each would cost.
+    # Trucks that can't cover the longest unpowered stretch even from 100% and empty are red
+    # whatever else happens, so they are pruned before simulating.
+    usable_kwh = fleet['caps'] * (1 - MIN_BUFFER_SOC)
+    rows = np.flatnonzero(usable_kwh * (1 + 1e-6) >= min_stretch_kwh(route, plan))
+
+    sim = solve_fleet(route, plan, {name: column[rows] for name, column in fleet.items()})
+    keep = sim['status'] != STATUS_RED
+    return {
+        "rows": rows[keep],
+        "status": sim['status'][keep].astype(np.int8),
+        "trip_mins": sim['estimated_trip_time_mins'][keep],
+        "precharge_mins": np.nan_to_num(sim['precharge_mins'][keep]),
+        "energy_kwh": sim['total_energy_kwh'][keep],
+        "pruned": len(fleet['caps']) - len(rows),
+    }
+
+
+def assign(
+    trucks: list[Truck],
+    routes: list[Route],
+    candidates: list[dict],
+    fleet: dict,
+    urgent_weight: float = 2.0,
+    time_cost_per_min: float = 1.0,
+) -> DispatchPlan:
+    # trucks and fleet are the same trucks in the same order; candidates has one entry per route
+    n_trucks, n_routes = len(trucks), len(routes)
+    pruned = sum(c['pruned'] for c in candidates)
+    candidates = [{**c, "col": np.full(len(c['rows']), r)} for r, c in enumerate(candidates) if len(c['rows'])]
+    if not candidates:
+        return DispatchPlan(
+            assignments=[], unassigned_truck_ids=[t.id for t in trucks], unassigned_route_ids=[r.id for r in routes],
+            total_cost=0.0, candidate_pairs=0, pruned_pairs=pruned,
+        )
+
+    def edges(name: str) -> np.ndarray:
+        return np.concatenate([c[name] for c in candidates])
+
+    rows = edges('rows')
+    cols = edges('col')
+    trip_mins = edges('trip_mins')
+    wait_mins = edges('precharge_mins') + fleet['charge_eta_mins'][rows]
+    energy_cost = edges('energy_kwh') * ENERGY_COST_PER_KWH
+    cost = (trip_mins + wait_mins) * time_cost_per_min + energy_cost
+
+    # Dispatching a pair is worth weight * (cost - bonus) against 0 for keeping the truck home.
+    # The bonus outweighs any plan's total cost, which puts coverage ahead of cost. Every truck
+    # has its own stay-home column, so a full matching always exists.
+    weight = np.array([urgent_weight if r.priority == "urgent" else 1.0 for r in routes])[cols]
+    bonus = (cost.max() + 1.0) * max(urgent_weight, 1.0) * min(n_trucks, n_routes)
+    value = weight * (cost - bonus)
+    # The matching wants positive weights; every truck is matched exactly once, so shifting
+    # all edges (stay-home ones included) by the same offset doesn't change the optimum
+    offset = 1.0 - value.min()
+    graph = csr_array(
+        (np.concatenate([value + offset, np.full(n_trucks, offset)]),
+         (np.concatenate([rows, np.arange(n_trucks)]), np.concatenate([cols, n_routes + np.arange(n_trucks)]))),
+        shape=(n_trucks, n_routes + n_trucks),
+    )
+    truck_rows, graph_cols = min_weight_full_bipartite_matching(graph)
+    dispatched = graph_cols < n_routes
+    matched_rows, matched_cols = truck_rows[dispatched], graph_cols[dispatched]
+
+    # Find each matched pair's edge to read back its numbers
+    edge_key = rows * n_routes + cols
+    order = np.argsort(edge_key)
+    matched = order[np.searchsorted(edge_key[order], matched_rows * n_routes + matched_cols)]
+    status = edges('status')
+    assignments = [
+        DispatchAssignment(
+            truck_id=trucks[r].id,
+            route_id=routes[c].id,
+            status=STATUS_NAMES[status[k]],
+            cost=round(float(cost[k]), 2),
+            estimated_trip_time_mins=int(trip_mins[k]),
+            wait_mins=int(wait_mins[k]),
+            energy_cost_estimate=round(float(energy_cost[k]), 2),
+        )
+        for r, c, k in zip(matched_rows.tolist(), matched_cols.tolist(), matched.tolist())
+    ]
+
+    assigned_trucks = set(matched_rows.tolist())
+    assigned_routes = set(matched_cols.tolist())
+    return DispatchPlan(
+        assignments=sorted(assignments, key=lambda a: a.route_id),
+        unassigned_truck_ids=[t.id for r, t in enumerate(trucks) if r not in assigned_trucks],
+        unassigned_route_ids=[route.id for c, route in enumerate(routes) if c not in assigned_routes],
+        total_cost=round(sum(a.cost for a in assignments), 2),
+        candidate_pairs=len(rows),
+        pruned_pairs=pruned,
+    )
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from models import Truck
+from records import FeasibilityRecord
+
+
+def truck_state(truck: Truck) -> tuple:
+    # Everything about a truck that feeds into its feasibility result
+    return (truck.id, truck.soc, truck.soh, truck.capacity_kwh, truck.load_lbs, truck.status, truck.charge_eta_mins,
+            truck.charge_curve)
+
+
+def feasibility_etag(route_id: str, route_version: int, fleet_version: int, variant: tuple = ()) -> str:
+    # fleet_version is the snapshot's (snapshot.py), which moves whenever any truck changes and
+    # is the same in every worker. variant covers the query options that change the
+    # representation (detail level, format).
+    digest = hashlib.blake2b(repr((route_id, route_version, fleet_version, variant)).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match compares weakly (RFC 9110, 13.1.2): a W/ prefix on either side is ignored,
+    # and * matches whatever the current representation is
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+class FeasibilityCache:
+    # Bounded LRU of per-truck results keyed on (route id, route version, truck state).
+    # A route change bumps its version and a truck change alters its state tuple, so stale
+    # entries are never hit; they just age out of the LRU.
+    # Streamed responses read it from a worker thread, optimal and sampled requests and the
+    # fleet feed fill it from others, and plain requests use it on the event loop, so every
+    # access holds the lock.
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, FeasibilityRecord] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> FeasibilityRecord | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: FeasibilityRecord):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,350 @@
+import asyncio
+import json
+import time
+from typing import Callable
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from models import Route
+from records import FeasibilityRecord, TruckRecord, encode_json
+from route_registry import RouteRegistry
+from simulation import CompiledRoute, sort_results
+from snapshot import FleetSnapshot, FleetSnapshots
+from store import TRUCK_COLUMNS
+
+# Live fleet updates over a WebSocket (/ws/fleet), so dashboards stop re-fetching the fleet.
+#
+# Server -> client, one JSON object per message:
+#   {"type": "snapshot", "version", "time", "trucks": [...], "routes": [...]}    on connect
+#   {"type": "feasibility", "version", "route_id", "results": [...]}            on subscribe,
+#       summary results in dispatch order
+#   {"type": "diff", "version", "time", "trucks": {id: {changed fields}}, "routes": [changed routes],
+#    "feasibility": {route_id: {truck_id: result}}}                              after that
+#   {"type": "error", "detail"}
+# Client -> server: {"subscribe": [route ids]} and {"unsubscribe": [route ids]}. New trucks
+# arrive with every field; "feasibility" only carries the subscribed routes' rows that changed.
+#
+# One FleetFeed per worker follows the fleet snapshots on a short tick (WS_TICK_MS). It works
+# out each new version's diff once, for all clients: changed truck fields from the snapshot
+# arrays, and feasibility only for the trucks that changed, on routes somebody subscribed to.
+# Each part is encoded once and a client's message is put together from the parts it needs.
+# The simulation behind a diff, or behind the first subscription to a route, runs on a worker
+# thread so the event loop keeps serving HTTP and the other sockets meanwhile; an asyncio lock
+# keeps those updates to the feed's state one at a time.
+#
+# Backpressure: every client has its own sender task, and diffs wait in its queue while a
+# send is in flight. A client that falls behind gets its backlog merged into one diff, so its
+# queue never holds more than about one fleet's worth of changes. A send that doesn't go out
+# within WS_SEND_TIMEOUT_S closes the connection; the client reconnects and gets a snapshot.
+
+MAX_QUEUED_DIFFS = 8
+
+
+def _key(text: str) -> str:
+    return encode_json(text).decode()
+
+
+class FleetDiff:
+    # The changes from one fleet version to a later one. Shared by every client that is up to
+    # date, so it is never modified after it's queued; merge() builds a new one.
+    __slots__ = ('version', 'time', 'trucks', 'routes', 'feasibility', '_parts', '_messages')
+
+    def __init__(self, version: int, time_: float, trucks: dict[str, dict], routes: dict[str, Route],
+                 feasibility: dict[str, dict[str, FeasibilityRecord]]):
+        self.version = version
+        self.time = time_
+        self.trucks = trucks
+        self.routes = routes
+        self.feasibility = feasibility
+        self._parts: dict[str, str] = {}
+        self._messages: dict[frozenset, str | None] = {}
+
+    @classmethod
+    def merge(cls, diffs: list["FleetDiff"]) -> "FleetDiff":
+        trucks: dict[str, dict] = {}
+        routes: dict[str, Route] = {}
+        feasibility: dict[str, dict[str, FeasibilityRecord]] = {}
+        for diff in diffs:
+            for truck_id, fields in diff.trucks.items():
+                trucks[truck_id] = {**trucks[truck_id], **fields} if truck_id in trucks else fields
+            routes.update(diff.routes)
+            for route_id, rows in diff.feasibility.items():
+                feasibility[route_id] = {**feasibility[route_id], **rows} if route_id in feasibility else rows
+        return cls(diffs[-1].version, diffs[-1].time, trucks, routes, feasibility)
+
+    def _part(self, name: str, value) -> str:
+        part = self._parts.get(name)
+        if part is None:
+            part = self._parts[name] = encode_json(value).decode()
+        return part
+
+    def message(self, route_ids: set[str]) -> str | None:
+        # This diff as one client sees it, or None if nothing in it concerns the client. Built
+        # once per distinct set of subscriptions.
+        key = frozenset(route_ids)
+        if key not in self._messages:
+            self._messages[key] = self._message(key)
+        return self._messages[key]
+
+    def _message(self, route_ids: frozenset) -> str | None:
+        feasibility = [route_id for route_id in sorted(route_ids) if self.feasibility.get(route_id)]
+        if not self.trucks and not self.routes and not feasibility:
+            return None
+        parts = ",".join(f"{_key(route_id)}:{self._part(route_id, self.feasibility[route_id])}" for route_id in feasibility)
+        return (
+            f'{{"type":"diff","version":{self.version},"time":{self.time},'
+            f'"trucks":{self._part("trucks", self.trucks)},"routes":{self._part("routes", list(self.routes.values()))},'
+            f'"feasibility":{{{parts}}}}}'
+        )
+
+
+def truck_changes(before: FleetSnapshot, after: FleetSnapshot) -> dict[str, dict]:
+    # Changed fields per truck id between two snapshots, every field for a new truck
+    old, new = before.truck_array, after.truck_array
+    if len(old):
+        pos = np.minimum(np.searchsorted(old["id"], new["id"]), len(old) - 1)
+        known = old["id"][pos] == new["id"]
+    else:
+        pos, known = np.zeros(len(new), dtype=np.intp), np.zeros(len(new), dtype=bool)
+    changed = {}
+    for name in TRUCK_COLUMNS[1:]:
+        now = new[name]
+        was = old[name][pos] if len(old) else now
+        differs = now != was
+        if now.dtype.kind == "f":
+            differs &= ~(np.isnan(now) & np.isnan(was))
+        changed[name] = known & differs
+
+    records = after.trucks()
+    changes = {}
+    for row in np.flatnonzero(~known | np.logical_or.reduce(list(changed.values()))).tolist():
+        record = records[row]
+        if not known[row]:
+            changes[record.id] = vars(record).copy()
+        else:
+            changes[record.id] = {name: getattr(record, name) for name, mask in changed.items() if mask[row]}
+    return changes
+
+
+class FeedClient:
+    __slots__ = ('websocket', 'route_ids', 'queue', 'wake', 'merged')
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.route_ids: set[str] = set()
+        self.queue: list[str | FleetDiff] = []
+        self.wake = asyncio.Event()
+        self.merged = 0   # diffs folded into another before they were sent
+
+    def push(self, item: str | FleetDiff):
+        self.queue.append(item)
+        # Falling behind: merge the trailing run of diffs into one
+        diffs = 0
+        for queued in reversed(self.queue):
+            if not isinstance(queued, FleetDiff):
+                break
+            diffs += 1
+        if diffs > MAX_QUEUED_DIFFS:
+            self.merged += diffs - 1
+            self.queue[-diffs:] = [FleetDiff.merge(self.queue[-diffs:])]
+        self.wake.set()
+
+    def take(self) -> list[str]:
+        # Everything queued as messages, consecutive diffs merged into one
+        messages, diffs = [], []
+        for item in self.queue + [None]:
+            if isinstance(item, FleetDiff):
+                diffs.append(item)
+                continue
+            if diffs:
+                self.merged += len(diffs) - 1
+                message = (diffs[0] if len(diffs) == 1 else FleetDiff.merge(diffs)).message(self.route_ids)
+                if message is not None:
+                    messages.append(message)
+                diffs = []
+            if item is not None:
+                messages.append(item)
+        self.queue = []
+        return messages
+
+
+class FleetFeed:
+    def __init__(self, fleet: FleetSnapshots, routes: RouteRegistry,
+                 evaluate: Callable[[Route, CompiledRoute, list[TruckRecord]], list[FeasibilityRecord]],
+                 tick: float = 0.25, send_timeout: float = 10.0):
+        self.fleet = fleet
+        self.routes = routes
+        self.evaluate = evaluate
+        self.tick = tick
+        self.send_timeout = send_timeout
+        self.snapshot: FleetSnapshot | None = None
+        self._clients: set[FeedClient] = set()
+        # Per subscribed route: its version and latest result per truck, at self.snapshot
+        self._results: dict[str, tuple[int, dict[str, FeasibilityRecord]]] = {}
+        self._messages: dict[str, str] = {}   # encoded snapshot / feasibility messages at self.snapshot
+        self._closed = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.diffs = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.merged = 0   # of clients that have disconnected
+        self.timed_out = 0
+
+    async def run(self):
+        # Until close(): catch up with the fleet snapshots every tick while anyone is connected
+        while not self._closed.is_set():
+            if self._clients:
+                await self.advance()
+            try:
+                await asyncio.wait_for(self._closed.wait(), self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        self._closed.set()
+
+    async def advance(self):
+        # Moves to the current snapshot and queues the diff for every client
+        async with self._lock:
+            snapshot = self.fleet.current()
+            previous = self.snapshot
+            if previous is not None and snapshot.version == previous.version:
+                return
+            self.snapshot = snapshot
+            self._messages = {}
+            subscribed = set().union(*(client.route_ids for client in self._clients))
+            for route_id in list(self._results):
+                if route_id not in subscribed:
+                    del self._results[route_id]
+            if previous is None:
+                self._results = {}
+                return
+
+            diff = await asyncio.to_thread(self._diff, previous, snapshot)
+            self.diffs += 1
+            for client in self._clients:
+                client.push(diff)
+
+    def _diff(self, previous: FleetSnapshot, snapshot: FleetSnapshot) -> FleetDiff:
+        # On a worker thread, under the feed's lock
+        trucks = truck_changes(previous, snapshot)
+        routes = {}
+        for route in snapshot.routes():
+            if previous.route_version(route.id) != snapshot.route_version(route.id):
+                routes[route.id] = route
+        feasibility = {}
+        for route_id in list(self._results):
+            rows = self._update_results(route_id, trucks, route_id in routes)
+            if rows:
+                feasibility[route_id] = rows
+        return FleetDiff(snapshot.version, time.time(), trucks, routes, feasibility)
+
+    def _update_results(self, route_id: str, trucks: dict[str, dict], route_changed: bool) -> dict[str, FeasibilityRecord]:
+        # Re-evaluates the route for the trucks that changed (all of them if the route did) and
+        # returns the rows that differ from what clients have
+        route = self.snapshot.get_route(route_id)
+        if route is None:
+            del self._results[route_id]
+            return {}
+        _, results = self._results[route_id]
+        stale = self.snapshot.trucks() if route_changed else self.snapshot.get_trucks(trucks)
+        rows = {}
+        for result in self.evaluate(route, self.routes.plan(route_id, self.snapshot), stale) if stale else []:
+            if results.get(result.truck_id) != result:
+                rows[result.truck_id] = result
+        results.update(rows)
+        self._results[route_id] = (self.snapshot.route_version(route_id), results)
+        return rows
+
+    def _snapshot_message(self) -> str:
+        message = self._messages.get("")
+        if message is None:
+            message = self._messages[""] = (
+                f'{{"type":"snapshot","version":{self.snapshot.version},"time":{time.time()},'
+                f'"trucks":{encode_json(self.snapshot.trucks()).decode()},'
+                f'"routes":{encode_json(self.snapshot.routes()).decode()}}}'
+            )
+        return message
+
+    async def _feasibility_message(self, route_id: str) -> str:
+        # Every result for the route, in dispatch order. The first subscriber evaluates it (on a
+        # worker thread); it is then kept up to date by advance() for as long as anyone is
+        # subscribed. Called under the feed's lock.
+        message = self._messages.get(route_id)
+        if message is not None:
+            return message
+        if route_id not in self._results:
+            route = self.snapshot.get_route(route_id)
+            if route is None:
+                return encode_json({"type": "error", "detail": f"Route not found: {route_id}"}).decode()
+            results = await asyncio.to_thread(
+                self.evaluate, route, self.routes.plan(route_id, self.snapshot), self.snapshot.trucks(),
+            )
+            self._results[route_id] = (self.snapshot.route_version(route_id), {r.truck_id: r for r in results})
+        results = sort_results(list(self._results[route_id][1].values()))
+        message = self._messages[route_id] = encode_json({
+            "type": "feasibility", "version": self.snapshot.version, "route_id": route_id, "results": results,
+        }).decode()
+        return message
+
+    async def serve(self, websocket: WebSocket):
+        await websocket.accept()
+        # Bring everyone up to date first, so this client starts from the version the diffs
+        # it will receive are based on. Nothing is awaited between catching up and joining, so
+        # no diff can come in between.
+        await self.advance()
+        client = FeedClient(websocket)
+        self._clients.add(client)
+        client.push(self._snapshot_message())
+        sender = asyncio.create_task(self._send(client))
+        try:
+            while True:
+                try:
+                    request = json.loads(await websocket.receive_text())
+                    subscribe = [str(route_id) for route_id in request.get("subscribe", [])]
+                    unsubscribe = [str(route_id) for route_id in request.get("unsubscribe", [])]
+                except (ValueError, AttributeError, TypeError):
+                    client.push(encode_json({"type": "error", "detail": "Expected {\"subscribe\"|\"unsubscribe\": [route ids]}"}).decode())
+                    continue
+                # Under the lock, so the results come from the snapshot the client's diffs follow
+                async with self._lock:
+                    client.route_ids.difference_update(unsubscribe)
+                    for route_id in subscribe:
+                        if route_id not in client.route_ids:
+                            message = await self._feasibility_message(route_id)
+                            if route_id in self._results:
+                                client.route_ids.add(route_id)
+                            client.push(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._clients.discard(client)
+            self.merged += client.merged
+            sender.cancel()
+
+    async def _send(self, client: FeedClient):
+        # Sends are awaited one at a time, so a slow reader holds back only its own queue
+        try:
+            while True:
+                await client.wake.wait()
+                client.wake.clear()
+                for message in client.take():
+                    await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+                    self.messages_sent += 1
+                    self.bytes_sent += len(message)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            await client.websocket.close(code=1013)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "version": self.snapshot.version if self.snapshot is not None else None,
+            "subscribed_routes": len(self._results),
+            "diffs": self.diffs,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "merged_diffs": self.merged + sum(client.merged for client in self._clients),
+            "timed_out": self.timed_out,
+        }
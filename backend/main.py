@@ -1,10 +1,49 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List, Literal
+import asyncio
 import math
-from models import Truck, Route, FeasibilityResult, ChargingStation, Stop, LegDetail
+import os
+from models import (
+    Truck, Route, FeasibilityResult, FeasibilityColumns, FeasibilityMatrix, LegDetail,
+    ChargingStation, Stop, TruckTelemetry, TelemetryAck, DispatchPlan, DepotConfig, DepotScheduleRequest, DepotSchedule,
+    ReachabilityResult,
+)
+from simulation import CompiledRoute, sort_results, truck_range_miles
+from batch_simulation import evaluate_fleet, fleet_columns, STATUS_NAMES
+from matrix import get_pool, shutdown_pool, feasibility_column
+from dispatch import dispatch_candidates, assign
+from depot import plan_depot
+from reachability import ReachabilityIndex
+from charging_plan import optimal_results
+from uncertainty import arrival_distributions
+from records import FeasibilityRecord, leg_columns, encode_json
+from streaming import stream_results, STREAM_MEDIA_TYPES
+from route_registry import RouteRegistry
+from store import SQLiteFleetStore
+from snapshot import FleetSnapshots
+from telemetry import TelemetryBuffer
+from fleet_feed import FleetFeed
+from feasibility_cache import FeasibilityCache, truck_state, feasibility_etag, etag_matches
+from metrics import MetricsRegistry, MetricsMiddleware, instrumented, stage, timed
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    telemetry_task = asyncio.create_task(TELEMETRY.run())
+    snapshot_task = asyncio.create_task(FLEET.run())
+    feed_task = asyncio.create_task(FEED.run())
+    yield
+    FEED.close()
+    await feed_task
+    TELEMETRY.close()
+    await telemetry_task
+    FLEET.close()
+    await snapshot_task
+    shutdown_pool()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware configuration
 app.add_middleware(
@@ -15,13 +54,13 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Constants
-WEIGHT_FACTOR = 0.00004  # kWh per lb per mile (realistic: ~0.3 kWh/mile at 80k lbs)
-ENERGY_COST_PER_KWH = 0.15  # Fixed rate for cost estimate
-MIN_BUFFER_SOC = 0.15
-CHARGE_TARGET_SOC = 0.90  # Charge to 90% when stopping at a charger
+# Per-stage timings (Server-Timing header) and /metrics; METRICS_ENABLED=0 leaves the
+# middleware out altogether
+METRICS = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
+if METRICS.enabled:
+    app.add_middleware(MetricsMiddleware, registry=METRICS)
 
-# Mock Data
+# Mock Data, seeded into an empty store on first start
 MOCK_TRUCKS = [
     Truck(id="T-01", name="Tesla Semi", soc=92.0, soh=98.0, capacity_kwh=500.0, load_lbs=0.0, status="ready"),
     Truck(id="T-02", name="Freightliner eCascadia", soc=61.0, soh=91.0, capacity_kwh=550.0, load_lbs=24000.0, status="ready"),
@@ -154,319 +193,338 @@ MOCK_ROUTES = [
     ),
 ]
 
+FLEET_DB_PATH = os.environ.get("FLEET_DB_PATH", "fleet.db")
+STORE = SQLiteFleetStore(FLEET_DB_PATH)
+if STORE.is_empty():
+    STORE.put_trucks([truck.model_copy(update={"range_miles": truck_range_miles(truck)}) for truck in MOCK_TRUCKS])
+    STORE.put_routes(MOCK_ROUTES)
+
+# Requests read the fleet from shared memory-mapped snapshots of the store (one writer
+# publishes them, every uvicorn worker maps them), writes go to the store. An in-memory store
+# can't be shared between processes, so its snapshots stay private to this one.
+FLEET = FleetSnapshots(
+    STORE,
+    os.environ.get("SNAPSHOT_DIR") or (None if FLEET_DB_PATH == ":memory:" else FLEET_DB_PATH + ".snapshots"),
+    interval=float(os.environ.get("SNAPSHOT_INTERVAL_MS", 100)) / 1000,
+)
+ROUTES = RouteRegistry(FLEET)
+TELEMETRY = TelemetryBuffer(STORE, flush_interval=float(os.environ.get("TELEMETRY_FLUSH_MS", 250)) / 1000)
+FEASIBILITY_CACHE = FeasibilityCache(int(os.environ.get("FEASIBILITY_CACHE_SIZE", 50_000)))
+REACHABILITY = ReachabilityIndex()
+DEPOT = DepotConfig(
+    chargers=int(os.environ.get("DEPOT_CHARGERS", 4)),
+    charger_kw=float(os.environ.get("DEPOT_CHARGER_KW", 150.0)),
+    site_limit_kw=float(os.environ["DEPOT_SITE_LIMIT_KW"]) if os.environ.get("DEPOT_SITE_LIMIT_KW") else None,
+)
+# strategy=optimal is budgeted in available trucks x route nodes per request. A plan costs at
+# most about 0.7 ms per truck and node (benchmarks/charging_strategy.py), so the default is
+# under 20 s of CPU, a few seconds once spread over the process pool.
+OPTIMAL_MAX_TRUCK_NODES = int(os.environ.get("OPTIMAL_MAX_TRUCK_NODES", 25_000))
+# /ws/fleet: snapshot on connect, then truck and summary feasibility diffs every WS_TICK_MS
+FEED = FleetFeed(
+    FLEET, ROUTES, lambda route, plan, trucks: cached_feasibility(route, plan, trucks, "summary"),
+    tick=float(os.environ.get("WS_TICK_MS", 250)) / 1000,
+    send_timeout=float(os.environ.get("WS_SEND_TIMEOUT_S", 10)),
+)
+
+def json_response(content, headers: dict | None = None) -> Response:
+    # Records (records.py) encoded with orjson; returning a Response skips the endpoint's
+    # response_model validation and serialization
+    with stage("serialize"):
+        body = encode_json(content)
+    return Response(body, media_type="application/json", headers=headers)
+
 @app.get("/")
 async def root():
     return {"message": "eSemiTruckDashboard API handles are up and running!"}
 
 @app.get("/trucks", response_model=List[Truck])
 async def get_trucks():
-    base_consumption = 1.8
-    
-    for truck in MOCK_TRUCKS:
-        effective_capacity = truck.capacity_kwh * (truck.soh / 100)
-        usable_kwh = max(0, effective_capacity * ((truck.soc / 100) - 0.15))
-        consumption_per_mile = base_consumption + WEIGHT_FACTOR * truck.load_lbs
-        
-        if consumption_per_mile > 0:
-            truck.range_miles = round(usable_kwh / consumption_per_mile, 1)
-        else:
-            truck.range_miles = 0.0
-            
-    return MOCK_TRUCKS
+    # Range is stored with each truck and recomputed when its telemetry changes; trucks written
+    # without one (e.g. bulk imports) get it when the snapshot is published
+    return json_response(FLEET.trucks())
+
+@app.post("/telemetry", response_model=TelemetryAck, status_code=202)
+async def post_telemetry(updates: List[TruckTelemetry]):
+    # Buffered: the reports are written on the next flush (TELEMETRY_FLUSH_MS), not before this returns
+    accepted = TELEMETRY.submit(updates)
+    return TelemetryAck(accepted=accepted, pending=TELEMETRY.pending)
+
+@app.get("/telemetry/stats")
+async def get_telemetry_stats():
+    return TELEMETRY.stats()
 
 @app.get("/routes", response_model=List[Route])
 async def get_routes():
-    return MOCK_ROUTES
+    return FLEET.routes()
+
+@timed("cache")
+def cached_feasibility(route: Route, plan: CompiledRoute, trucks: list[Truck], detail: str = "full",
+                       strategy: str = "greedy", samples: int | None = None,
+                       fill_cache: bool = True) -> list[FeasibilityRecord]:
+    # Only trucks whose state changed since the last request are re-simulated. Streams pass
+    # fill_cache=False: they use what is cached but don't add to it, so what a stream holds
+    # doesn't grow with the fleet.
+    keys = [(route.id, plan.version, truck_state(truck), detail, strategy, samples) for truck in trucks]
+    results = [FEASIBILITY_CACHE.get(key) for key in keys]
+    stale = [i for i, result in enumerate(results) if result is None]
+    if stale:
+        stale_trucks = [trucks[i] for i in stale]
+        fresh = evaluate_fleet(route, plan, stale_trucks, detail)
+        if strategy == "optimal":
+            fresh = optimal_results(route, plan, stale_trucks, fresh, detail)
+        if samples:
+            for result, distribution in zip(fresh, arrival_distributions(route, plan, stale_trucks, samples)):
+                result.uncertainty = distribution
+        for i, result in zip(stale, fresh):
+            if fill_cache:
+                FEASIBILITY_CACHE.put(keys[i], result)
+            results[i] = result
+    return results
+
+def feasibility_columns(results: list[FeasibilityRecord], detail: str, samples: int | None = None) -> dict:
+    # FeasibilityColumns: parallel arrays instead of one object per truck (and per leg), in the
+    # same order as results
+    columns = {
+        name: [getattr(result, name) for result in results]
+        for name in FeasibilityColumns.model_fields if name not in ("leg_details", "uncertainty")
+    }
+    columns["uncertainty"] = [result.uncertainty for result in results] if samples else None
+    columns["leg_details"] = [leg_columns(result.leg_details) for result in results] if detail == "full" else None
+    return columns
+
+@app.get("/routes/{route_id}/feasibility", response_model=List[FeasibilityResult] | FeasibilityColumns)
+@instrumented
+async def get_route_feasibility(
+    route_id: str,
+    request: Request,
+    stream: Literal["ndjson", "sse"] | None = None,
+    detail: Literal["summary", "full"] = "full",
+    strategy: Literal["greedy", "optimal"] = "greedy",
+    samples: int | None = Query(None, ge=100, le=100_000),
+    layout: Literal["rows", "columnar"] = Query("rows", alias="format"),
+):
+    # One snapshot for the whole request: the route, the trucks and the ETag all come from the
+    # same version
+    with stage("load"):
+        fleet = FLEET.current()
+        route = fleet.get_route(route_id)
+    if not route:
+        raise HTTPException(status_code=404, detail="Route not found")
+    if stream and layout == "columnar":
+        raise HTTPException(status_code=400, detail="Columnar format cannot be streamed")
+    if samples and strategy == "optimal":
+        raise HTTPException(status_code=400, detail="samples is only available with the greedy strategy")
+
+    with stage("plan"):
+        plan = ROUTES.plan(route_id, fleet)
+    with stage("load"):
+        trucks = fleet.trucks()
+    if strategy == "optimal":
+        work = sum(truck.status in ("ready", "charging") for truck in trucks) * len(plan.nodes)
+        if work > OPTIMAL_MAX_TRUCK_NODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"strategy=optimal is limited to {OPTIMAL_MAX_TRUCK_NODES} available trucks x route nodes "
+                       f"per request, this one is {work}",
+            )
+    with stage("etag"):
+        etag = feasibility_etag(route_id, plan.version, fleet.version, (detail, layout, stream, strategy, samples))
+
+    # Nothing changed since the client's copy: skip the simulation and the body
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if stream:
+        return StreamingResponse(
+            stream_results(
+                trucks, lambda chunk: cached_feasibility(route, plan, chunk, detail, strategy, samples, fill_cache=False),
+                stream,
+            ),
+            media_type=STREAM_MEDIA_TYPES[stream],
+            headers={"ETag": etag},
+        )
+
+    if strategy == "optimal" or samples:
+        # Plans and samples run on the process pool; wait for them off the event loop
+        results = await asyncio.to_thread(cached_feasibility, route, plan, trucks, detail, strategy, samples)
+    else:
+        results = cached_feasibility(route, plan, trucks, detail, strategy, samples)
+    results = sort_results(results)
+    if layout == "columnar":
+        return json_response(feasibility_columns(results, detail, samples), {"ETag": etag})
+    return json_response(results, {"ETag": etag})
 
-@app.get("/routes/{route_id}/feasibility", response_model=List[FeasibilityResult])
-async def get_route_feasibility(route_id: str):
-    # Find the route
-    route = next((r for r in MOCK_ROUTES if r.id == route_id), None)
+@app.get("/routes/{route_id}/feasibility/{truck_id}/legs", response_model=List[LegDetail])
+async def get_truck_legs(route_id: str, truck_id: str, strategy: Literal["greedy", "optimal"] = "greedy"):
+    # Leg details for one truck, loaded when its card is expanded
+    fleet = FLEET.current()
+    route = fleet.get_route(route_id)
     if not route:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Route not found")
-    
-    results = []
-    
-    # Build waypoints
-    waypoints = []
-    charger_idx = 1
-    for cs in route.charging_stations:
-        waypoints.append({
-            'mile_marker': cs.mile_marker, 
-            'type': 'charger', 
-            'charge_rate_kw': cs.charge_rate_kw,
-            'name': f"Charger {charger_idx}"
-        })
-        charger_idx += 1
-        
-    stop_idx = 1
-    for s in route.stops:
-        waypoints.append({
-            'mile_marker': s.mile_marker, 
-            'type': 'stop', 
-            'unload_lbs': s.unload_lbs, 
-            'pickup_lbs': s.pickup_lbs,
-            'has_charger': s.has_charger, 
-            'charge_rate_kw': s.charge_rate_kw,
-            'name': f"Stop {stop_idx}"
-        })
-        stop_idx += 1
-        
-    waypoints.sort(key=lambda x: x['mile_marker'])
-    waypoints.append({'mile_marker': route.distance_miles, 'type': 'destination', 'name': 'Destination'})
-
-    # Build the full list of nodes the truck visits, starting with the depot (mile 0).
-    # Nodes: depot (origin), then each waypoint in order.
-    # Depot now has a charger as requested.
-    nodes = [{'mile_marker': 0.0, 'type': 'depot', 'has_charger': True, 'charge_rate_kw': 150.0, 'name': 'Depot'}]
-    for wp in waypoints:
-        has_charger = (wp['type'] == 'charger') or (wp['type'] == 'stop' and wp.get('has_charger'))
-        nodes.append({
-            'mile_marker': wp['mile_marker'],
-            'type': wp['type'],
-            'has_charger': has_charger,
-            'charge_rate_kw': wp.get('charge_rate_kw'),
-            'unload_lbs': wp.get('unload_lbs', 0),
-            'pickup_lbs': wp.get('pickup_lbs', 0),
-            'name': wp.get('name', 'Waypoint')
-        })
-
-    def simulate_route(truck_initial_load, truck_initial_soc, effective_capacity):
-        # Input Validation: If the truck has 0 capacity or 0 SOC, handle gracefully
-        if effective_capacity <= 0:
-            return {
-                "feasible": False,
-                "arrival_soc": 0.0,
-                "total_energy_kwh": 0.0,
-                "total_charge_time_mins": 0,
-                "total_stop_time_mins": 0,
-                "estimated_trip_time_mins": 0,
-                "stops_required": 0,
-                "no_charge_needed": False,
-                "leg_details": []
-            }
-
-        # Determine the minimum payload required at the depot to fulfill all unloads
-        sim_load = 0
-        min_sim_load = 0
-        for wp in waypoints:
-            if wp['type'] == 'stop':
-                sim_load += wp.get('pickup_lbs', 0) - wp.get('unload_lbs', 0)
-                if sim_load < min_sim_load:
-                    min_sim_load = sim_load
-        
-        required_depot_payload = max(0.0, -min_sim_load)
-        
-        curr_soc = truck_initial_soc
-        curr_load = max(truck_initial_load, required_depot_payload)
-        
-        tot_charge_time_mins = 0
-        tot_stops_required = 0
-        
-        node_unload_times = [0] * len(nodes)
-        node_charge_times = [0] * len(nodes)
-        
-        # If the route requires a load (unload before sufficient pickups), we must have loaded it at the depot.
-        # Add 30 minutes for loading at the depot before dispatch.
-        if required_depot_payload > 0:
-            node_unload_times[0] = 30
-
-        no_charge_req = True
-        legs = []
-        is_feasible = True
-        tot_energy_kwh = 0
-        
-        for i in range(len(nodes) - 1):
-            from_node = nodes[i]
-            to_node = nodes[i + 1]
-            
-            leg_distance = to_node['mile_marker'] - from_node['mile_marker']
-            energy_needed_kwh = (route.base_consumption + WEIGHT_FACTOR * curr_load) * leg_distance * route.terrain_multiplier
-            tot_energy_kwh += energy_needed_kwh
-            energy_needed_soc = energy_needed_kwh / effective_capacity
-
-            charge_added_kwh = 0
-            charge_time_mins = 0
-            used_charger = False
-
-            # --- STEP 1: Charge at the DEPARTURE node (from_node) ---
-            if from_node['has_charger']:
-                # Forward-scan to next charger/destination
-                forward_load = curr_load
-                energy_to_next_charger_soc = 0.0
-                for j in range(i, len(nodes) - 1):
-                    fn = nodes[j]
-                    tn = nodes[j + 1]
-                    leg_dist = tn['mile_marker'] - fn['mile_marker']
-                    leg_kwh = (route.base_consumption + WEIGHT_FACTOR * forward_load) * leg_dist * route.terrain_multiplier
-                    energy_to_next_charger_soc += leg_kwh / effective_capacity
-                    if tn['type'] == 'stop':
-                        forward_load = max(0, forward_load - tn.get('unload_lbs', 0) + tn.get('pickup_lbs', 0))
-                    if j > i and tn.get('has_charger'):
-                        break
-
-                min_needed_soc = energy_to_next_charger_soc + MIN_BUFFER_SOC
-                target_soc = min(min_needed_soc, CHARGE_TARGET_SOC)
-
-                deficit_soc = max(0, target_soc - curr_soc)
-                if deficit_soc > 0.001:
-                    charge_added_kwh = deficit_soc * effective_capacity
-                    charge_rate = from_node.get('charge_rate_kw') or 150.0
-                    charge_time_mins = math.ceil(charge_added_kwh / charge_rate * 60)
-                    curr_soc += deficit_soc
-                    tot_charge_time_mins += charge_time_mins
-                    node_charge_times[i] = charge_time_mins
-                    no_charge_req = False
-                    used_charger = True
-
-            # --- STEP 2: Drive ---
-            start_soc = curr_soc
-            will_arrive_soc = curr_soc - energy_needed_soc
-            if will_arrive_soc < MIN_BUFFER_SOC - 1e-9:
-                is_feasible = False
-
-            curr_soc -= energy_needed_soc
-            curr_soc = max(curr_soc, 0.0)
-
-            # --- STEP 3: At the ARRIVAL node ---
-            unload_lbs = 0
-            pickup_lbs = 0
-            end_load = curr_load
-            
-            if to_node['type'] == 'stop':
-                unload_lbs = to_node.get('unload_lbs', 0)
-                pickup_lbs = to_node.get('pickup_lbs', 0)
-                end_load = max(0, curr_load - unload_lbs + pickup_lbs)
-                node_unload_times[i + 1] = 30
-                tot_stops_required += 1
-
-            legs.append(LegDetail(
-                leg_number=i + 1,
-                distance_miles=round(leg_distance, 2),
-                start_soc=round(start_soc * 100, 2),
-                end_soc=round(curr_soc * 100, 2),
-                start_load_lbs=round(curr_load, 2),
-                end_load_lbs=round(end_load, 2),
-                pickup_lbs=pickup_lbs,
-                charge_added_kwh=round(charge_added_kwh, 2),
-                charge_time_mins=charge_time_mins,
-                unload_lbs=unload_lbs,
-                used_charger=used_charger,
-                end_location_name=to_node.get('name', 'Waypoint'),
-                end_has_charger=to_node.get('has_charger', False)
-            ))
-            curr_load = end_load
-
-        tot_stop_time_mins = sum(max(u, c) for u, c in zip(node_unload_times, node_charge_times))
-        drive_time_mins = math.ceil((route.distance_miles / 55.0) * 60.0)
-        estimated_trip_time_mins = drive_time_mins + tot_stop_time_mins
-
-        return {
-            "feasible": is_feasible,
-            "arrival_soc": round(curr_soc * 100, 2),
-            "total_energy_kwh": tot_energy_kwh,
-            "total_charge_time_mins": tot_charge_time_mins,
-            "total_stop_time_mins": tot_stop_time_mins,
-            "estimated_trip_time_mins": estimated_trip_time_mins,
-            "stops_required": tot_stops_required,
-            "no_charge_needed": no_charge_req,
-            "leg_details": legs
-        }
-
-    for truck in MOCK_TRUCKS:
-        if truck.status not in ("ready", "charging"):
-            results.append(FeasibilityResult(
-                truck_id=truck.id,
-                status="red",
-                arrival_soc=0.0,
-                energy_required_kwh=0.0,
-                charge_time_mins=None,
-                total_stop_time_mins=None,
-                estimated_trip_time_mins=None,
-                energy_cost_estimate=None,
-                stops_required=0,
-                no_charge_needed=False,
-                not_available=True,
-                leg_details=[]
-            ))
+    truck = fleet.get_truck(truck_id)
+    if not truck:
+        raise HTTPException(status_code=404, detail="Truck not found")
+
+    plan = ROUTES.plan(route_id, fleet)
+    if strategy == "optimal":
+        [result] = await asyncio.to_thread(cached_feasibility, route, plan, [truck], strategy=strategy)
+    else:
+        [result] = cached_feasibility(route, plan, [truck], strategy=strategy)
+    return json_response(result.leg_details)
+
+@app.get("/routes/{route_id}/reachable", response_model=ReachabilityResult)
+async def get_reachable_trucks(
+    route_id: str,
+    min_arrival_soc: float | None = None,
+    status: list[Literal["green", "yellow", "red"]] | None = Query(None),
+    truck_status: Literal["ready", "charging"] | None = None,
+    limit: int | None = Query(None, ge=1),
+    include_infeasible: bool = False,
+):
+    # Available trucks that can run the route, highest arrival SoC first, answered from the
+    # reachability index instead of a feasibility sweep. The index builds or refreshes the
+    # route's entry on the first query of each snapshot, so it runs on a thread.
+    fleet = FLEET.current()
+    route = fleet.get_route(route_id)
+    if not route:
+        raise HTTPException(status_code=404, detail="Route not found")
+    total, results = await asyncio.to_thread(
+        REACHABILITY.trucks_for_route, route, ROUTES.plan(route_id, fleet), fleet,
+        min_arrival_soc, status, truck_status, limit, include_infeasible,
+    )
+    return ReachabilityResult(fleet_version=fleet.version, total=total, results=results)
+
+@app.get("/trucks/{truck_id}/reachable", response_model=ReachabilityResult)
+async def get_reachable_routes(
+    truck_id: str,
+    min_arrival_soc: float | None = None,
+    status: list[Literal["green", "yellow", "red"]] | None = Query(None),
+    priority: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    include_infeasible: bool = False,
+):
+    # The routes a truck can run, highest arrival SoC first (status=green: without charging).
+    # On a thread like the route query: a new snapshot refreshes every route's entry.
+    fleet = FLEET.current()
+    routes = [(route, ROUTES.plan(route.id, fleet)) for route in fleet.routes(priority=priority)]
+    answer = await asyncio.to_thread(
+        REACHABILITY.routes_for_truck, truck_id, routes, fleet, min_arrival_soc, status, limit, include_infeasible,
+    )
+    if answer is None:
+        raise HTTPException(status_code=404, detail="Truck not found")
+    total, results = answer
+    return ReachabilityResult(fleet_version=fleet.version, total=total, results=results)
+
+@app.get("/reachability/stats")
+async def get_reachability_stats():
+    return REACHABILITY.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format
+    if not METRICS.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/fleet/snapshot")
+async def get_fleet_snapshot():
+    # The version this worker currently serves, and whether it is the one publishing
+    return FLEET.stats()
+
+@app.websocket("/ws/fleet")
+async def fleet_socket(websocket: WebSocket):
+    await FEED.serve(websocket)
+
+@app.get("/fleet/feed")
+async def get_fleet_feed_stats():
+    return FEED.stats()
+
+@app.get("/feasibility/cache")
+async def get_feasibility_cache_stats():
+    return FEASIBILITY_CACHE.stats()
+
+@app.get("/feasibility/matrix", response_model=FeasibilityMatrix)
+async def get_feasibility_matrix(priority: str | None = None, status: str | None = None):
+    # Every (filtered) truck against every (filtered) route. One pool task per route keeps the
+    # simulation off the event loop, so the rest of the API stays responsive meanwhile.
+    fleet = FLEET.current()
+    routes = fleet.routes(priority=priority)
+    trucks = fleet.trucks(status=status)
+    available = [t for t in trucks if t.status in ("ready", "charging")]
+    arrays = fleet_columns(available)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    columns = await asyncio.gather(*(
+        loop.run_in_executor(pool, feasibility_column, route, ROUTES.plan(route.id, fleet), arrays)
+        for route in routes
+    ))
+
+    row_of = {id(t): r for r, t in enumerate(available)}
+    status_rows, soc_rows, precharge_rows = [], [], []
+    for truck in trucks:
+        r = row_of.get(id(truck))
+        if r is None:
+            status_rows.append(["red"] * len(routes))
+            soc_rows.append([0.0] * len(routes))
+            precharge_rows.append([None] * len(routes))
             continue
+        status_rows.append([STATUS_NAMES[col['status'][r]] for col in columns])
+        soc_rows.append([round(float(col['arrival_soc'][r]), 2) for col in columns])
+        precharge_rows.append([
+            None if math.isnan(col['precharge_mins'][r]) else int(col['precharge_mins'][r])
+            for col in columns
+        ])
 
-        effective_capacity = truck.capacity_kwh * (truck.soh / 100)
-        
-        # Initial Pass
-        sim = simulate_route(truck.load_lbs, truck.soc / 100, effective_capacity)
-        
-        feasible_after_precharge = False
-        precharge_mins = None
-        precharge_kwh = None
-
-        if not sim['feasible'] and truck.status in ('ready', 'charging'):
-            # Check feasibility at 100% SoC
-            sim_100 = simulate_route(truck.load_lbs, 1.0, effective_capacity)
-            if sim_100['feasible']:
-                # Binary search for min_required_soc
-                low = truck.soc / 100
-                high = 1.0
-                min_required_soc = 1.0
-                while high - low > 0.001:
-                    mid = (low + high) / 2
-                    if simulate_route(truck.load_lbs, mid, effective_capacity)['feasible']:
-                        min_required_soc = mid
-                        high = mid
-                    else:
-                        low = mid
-                
-                feasible_after_precharge = True
-                # precharge_kwh = (min_required_soc - (truck.soc / 100)) * effective_capacity
-                # precharge_mins = math.ceil(precharge_kwh / 150 * 60) # Depot charger 150 kW
-
-                # For charging trucks, credit the charge already in progress
-                soc_after_current_charge = min(1.0, (truck.soc / 100) + (truck.charge_eta_mins or 0) / 60 * 150 / effective_capacity)
-                if soc_after_current_charge >= min_required_soc:
-                    precharge_kwh = 0
-                    precharge_mins = 0
-                    feasible_after_precharge = False  # No extra pre-charge needed
-                else:
-                    precharge_kwh = (min_required_soc - soc_after_current_charge) * effective_capacity
-                    precharge_mins = math.ceil(precharge_kwh / 150 * 60)
-                
-                # Final pass to get accurate details
-                sim = simulate_route(truck.load_lbs, min_required_soc, effective_capacity)
-
-        # Status logic
-        if not sim['feasible'] and not feasible_after_precharge:
-            status = "red"
-        elif feasible_after_precharge:
-            status = "yellow"
-        elif not sim['no_charge_needed']:
-            status = "yellow"  # needs en-route charging
-        else:
-            status = "green"
-            
-        results.append(FeasibilityResult(
-            truck_id=truck.id,
-            status=status,
-            arrival_soc=sim['arrival_soc'],
-            energy_required_kwh=round(sim['total_energy_kwh'], 2),
-            charge_time_mins=sim['total_charge_time_mins'],
-            total_stop_time_mins=sim['total_stop_time_mins'],
-            estimated_trip_time_mins=sim['estimated_trip_time_mins'],
-            energy_cost_estimate=round(sim['total_energy_kwh'] * ENERGY_COST_PER_KWH, 2),
-            stops_required=sim['stops_required'],
-            no_charge_needed=sim['no_charge_needed'],
-            feasible_after_precharge=feasible_after_precharge,
-            precharge_mins=precharge_mins,
-            precharge_kwh=round(precharge_kwh, 2) if precharge_kwh is not None else None,
-            leg_details=sim['leg_details']
-        ))
-    
-    # Sort results
-    results.sort(key=lambda x: (
-        x.not_available,
-        not (x.status == "green" and x.no_charge_needed),
-        x.charge_time_mins if x.charge_time_mins is not None else 0,
-        -x.arrival_soc
+    return FeasibilityMatrix(
+        truck_ids=[t.id for t in trucks],
+        route_ids=[r.id for r in routes],
+        status=status_rows,
+        arrival_soc=soc_rows,
+        precharge_mins=precharge_rows,
+    )
+
+@app.get("/dispatch/optimize", response_model=DispatchPlan)
+async def optimize_dispatch(
+    priority: str | None = None,
+    urgent_weight: float = Query(2.0, ge=1.0),
+    time_cost_per_min: float = Query(1.0, ge=0.0),
+):
+    # One truck per route across the available fleet. Candidate pairs are simulated per route
+    # on the matrix pool; the assignment itself runs on a thread so the loop stays free.
+    fleet = FLEET.current()
+    routes = fleet.routes(priority=priority)
+    trucks = [t for t in fleet.trucks() if t.status in ("ready", "charging")]
+    arrays = fleet_columns(trucks)
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    candidates = await asyncio.gather(*(
+        loop.run_in_executor(pool, dispatch_candidates, route, ROUTES.plan(route.id, fleet), arrays)
+        for route in routes
     ))
-    
-    return results
+    return await asyncio.to_thread(assign, trucks, routes, candidates, arrays, urgent_weight, time_cost_per_min)
+
+@app.post("/depot/schedule", response_model=DepotSchedule)
+async def schedule_depot(request: DepotScheduleRequest):
+    # Plug slots and ready times for trucks about to leave, sharing the depot's chargers with
+    # each other and with the trucks already charging
+    truck_ids = [job.truck_id for job in request.jobs]
+    if len(set(truck_ids)) != len(truck_ids):
+        raise HTTPException(status_code=400, detail="Each truck can only have one job")
+    fleet = FLEET.current()
+    trucks = {truck.id: truck for truck in fleet.get_trucks(truck_ids)}
+    missing = [truck_id for truck_id in truck_ids if truck_id not in trucks]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Truck not found: {missing[0]}")
+    routes = {}
+    for route_id in {job.route_id for job in request.jobs}:
+        route = fleet.get_route(route_id)
+        if not route:
+            raise HTTPException(status_code=404, detail=f"Route not found: {route_id}")
+        routes[route_id] = route
+    plans = {route_id: ROUTES.plan(route_id, fleet) for route_id in routes}
+
+    charging = fleet.trucks(status="charging")
+    return await asyncio.to_thread(plan_depot, request.jobs, trucks, routes, plans, charging, request.depot or DEPOT)
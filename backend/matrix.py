@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models import Route
+from simulation import CompiledRoute
+from batch_simulation import solve_fleet
+
+# Fleet x route feasibility runs one task per route on a process pool, so the CPU work
+# happens off the event loop and across cores. Each task carries the route's CompiledRoute
+# (workers never rebuild plans) and the fleet as plain column arrays, which pickle cheaply.
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def pool_workers() -> int:
+    return int(os.environ.get("MATRIX_WORKERS", 0)) or os.cpu_count()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_workers(), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def feasibility_column(route: Route, plan: CompiledRoute, fleet: dict) -> dict:
+    # One route against every available truck: status code, arrival SoC and pre-charge minutes
+    sim = solve_fleet(route, plan, fleet)
+    return {
+        "status": sim['status'].astype(np.int8),
+        "arrival_soc": sim['arrival_soc'],
+        "precharge_mins": sim['precharge_mins'],
+    }
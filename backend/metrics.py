@@ -0,0 +1,196 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+# Hot-path instrumentation. MetricsMiddleware gives every request a RequestTimings in a context
+# variable; code along the way wraps its stages in stage("name") and bumps counters with
+# count("name"). Stages nest exclusively (a simulate pass inside the pre-charge search is
+# charged to "simulate", not both), so the stage times add up to the handler time.
+#
+# The stage times go out as a Server-Timing header on the response, plus "serialize" (response
+# validation and JSON encoding: inside the handler for responses it encodes itself, then
+# between the handler returning and the response starting) and "total". Every request also feeds the histograms served by /metrics in Prometheus text format.
+#
+# With METRICS_ENABLED=0 the middleware isn't installed, no request ever has a RequestTimings,
+# and stage() / count() come down to one context variable lookup.
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+_current: ContextVar["RequestTimings | None"] = ContextVar("request_timings", default=None)
+_NO_STAGE = nullcontext()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.handler_done: float | None = None
+        self._stack: list[list] = []   # [name, time it was (re)entered]
+
+    @contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self.stages[outer[0]] = self.stages.get(outer[0], 0.0) + now - outer[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, entered = self._stack.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + now - entered
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1e3:.2f}" for name, seconds in self.stages.items()]
+        parts += [f'{name};desc="{n}"' for name, n in self.counts.items()]
+        parts.append(f"total;dur={total * 1e3:.2f}")
+        return ", ".join(parts)
+
+
+def stage(name: str):
+    timings = _current.get()
+    return timings.stage(name) if timings is not None else _NO_STAGE
+
+
+def timed(name: str):
+    # Decorator form of stage() for functions that are a stage as a whole
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return fn(*args, **kwargs)
+            with timings.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name: str, n: int = 1):
+    timings = _current.get()
+    if timings is not None:
+        timings.counts[name] = timings.counts.get(name, 0) + n
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self._series: dict[tuple, list] = {}   # label values -> [bucket counts..., sum, count]
+
+    def observe(self, label_values: tuple, value: float):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram(
+            "fleet_request_duration_seconds", "Request time until the response starts, by route.",
+            DURATION_BUCKETS, ("path", "method", "status"),
+        )
+        self.stage_seconds = Histogram(
+            "fleet_stage_duration_seconds", "Time per request spent in each instrumented stage.",
+            DURATION_BUCKETS, ("path", "stage"),
+        )
+        self.counts = Histogram(
+            "fleet_request_operations", "Operations per request, e.g. simulate_route invocations.",
+            COUNT_BUCKETS, ("path", "operation"),
+        )
+
+    def record(self, path: str, method: str, status: int, total: float, timings: RequestTimings):
+        with self._lock:
+            self.request_seconds.observe((path, method, str(status)), total)
+            for name, seconds in timings.stages.items():
+                self.stage_seconds.observe((path, name), seconds)
+            for name, n in timings.counts.items():
+                self.counts.observe((path, name), n)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = self.request_seconds.render() + self.stage_seconds.render() + self.counts.render()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware, so the Server-Timing header can be added to the response start
+    # message and streamed responses pass through untouched
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+        total = None
+
+        async def send_with_timing(message):
+            nonlocal status, total
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                total = now - timings.start
+                if timings.handler_done is not None:
+                    timings.stages["serialize"] = timings.stages.get("serialize", 0.0) + now - timings.handler_done
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timings.server_timing(total).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            self.registry.record(path, scope["method"], status,
+                                 total if total is not None else time.perf_counter() - timings.start, timings)
+
+
+def instrumented(endpoint):
+    # Marks when the endpoint returned, so the middleware can tell serialization apart
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.handler_done = time.perf_counter()
+    return wrapper
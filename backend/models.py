@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal, Optional
 
 class ChargingStation(BaseModel):
     mile_marker: float
@@ -37,6 +37,39 @@ class Truck(BaseModel):
     status: str             # "ready" | "charging" | "maintenance"
     charge_eta_mins: Optional[int] = None  # Only set if status is "charging"
     range_miles: float | None = None
+    # Power the battery accepts by SoC, ((soc %, kW), ...) with SoC increasing; None charges
+    # at the charger's full rate throughout
+    charge_curve: tuple[tuple[float, float], ...] | None = None
+
+    @field_validator("charge_curve")
+    @classmethod
+    def _check_curve(cls, curve):
+        if curve is None:
+            return None
+        socs = [soc for soc, _ in curve]
+        if not curve or any(not 0 <= soc <= 100 for soc in socs) or any(b <= a for a, b in zip(socs, socs[1:])):
+            raise ValueError("charge_curve needs points with SoC increasing from 0 to 100")
+        if any(kw <= 0 for _, kw in curve):
+            raise ValueError("charge_curve power must be positive")
+        return curve
+
+class TruckTelemetry(BaseModel):
+    # One truck's report; fields that are left out (or null) keep their stored value,
+    # except charge_eta_mins where null means the truck is no longer charging
+    id: str
+    soc: float | None = Field(None, ge=0, le=100)
+    soh: float | None = Field(None, ge=0, le=100)
+    load_lbs: float | None = Field(None, ge=0)
+    status: Literal["ready", "charging", "maintenance"] | None = None
+    charge_eta_mins: int | None = Field(None, ge=0)
+
+class TelemetryAck(BaseModel):
+    accepted: int
+    pending: int            # trucks waiting for the next flush
+
+class ElevationPoint(BaseModel):
+    mile_marker: float
+    elevation_ft: float
 
 class Route(BaseModel):
     id: str
@@ -48,6 +81,25 @@ class Route(BaseModel):
     base_consumption: float # kWh per mile baseline
     charging_stations: list[ChargingStation] = []
     stops: list[Stop] = []
+    # Elevation along the route, mile markers increasing; when given, legs are charged for
+    # their climbs and descents instead of terrain_multiplier
+    elevation_profile: list[ElevationPoint] = []
+
+    @field_validator("elevation_profile")
+    @classmethod
+    def _check_profile(cls, profile):
+        if any(b.mile_marker <= a.mile_marker for a, b in zip(profile, profile[1:])):
+            raise ValueError("elevation_profile mile markers must increase")
+        return profile
+
+class ArrivalSocDistribution(BaseModel):
+    # Monte Carlo spread of the outcome under perturbed consumption and charger rates (?samples=N)
+    samples: int
+    arrival_soc_p5: float
+    arrival_soc_p50: float
+    arrival_soc_p95: float
+    buffer_breach_probability: float    # share of samples that dip below the 15% buffer on some leg
+    trip_time_p95_mins: int
 
 class FeasibilityResult(BaseModel):
     truck_id: str
@@ -64,4 +116,109 @@ class FeasibilityResult(BaseModel):
     feasible_after_precharge: bool = False
     precharge_mins: int | None = None
     precharge_kwh: float | None = None
+    charge_overlap_mins: int = 0      # charging done while un/loading at a stop
+    uncertainty: ArrivalSocDistribution | None = None   # only with ?samples=N
     leg_details: list[LegDetail] = []
+
+class LegColumns(BaseModel):
+    # LegDetail fields as parallel arrays, one entry per leg
+    leg_number: list[int]
+    distance_miles: list[float]
+    start_soc: list[float]
+    end_soc: list[float]
+    start_load_lbs: list[float]
+    end_load_lbs: list[float]
+    pickup_lbs: list[float]
+    charge_added_kwh: list[float]
+    charge_time_mins: list[int]
+    unload_lbs: list[float]
+    used_charger: list[bool]
+    end_location_name: list[str]
+    end_has_charger: list[bool]
+
+class FeasibilityColumns(BaseModel):
+    # FeasibilityResult fields as parallel arrays, one entry per truck in dispatch order
+    truck_id: list[str]
+    status: list[str]
+    arrival_soc: list[float]
+    energy_required_kwh: list[float]
+    charge_time_mins: list[int | None]
+    total_stop_time_mins: list[int | None]
+    estimated_trip_time_mins: list[int | None]
+    energy_cost_estimate: list[float | None]
+    stops_required: list[int]
+    no_charge_needed: list[bool]
+    not_available: list[bool]
+    feasible_after_precharge: list[bool]
+    precharge_mins: list[int | None]
+    precharge_kwh: list[float | None]
+    charge_overlap_mins: list[int]
+    uncertainty: list[ArrivalSocDistribution | None] | None = None   # only with ?samples=N
+    leg_details: list[LegColumns] | None = None   # only with detail=full
+
+class FeasibilityMatrix(BaseModel):
+    truck_ids: list[str]
+    route_ids: list[str]
+    status: list[list[str]]                 # [truck][route]: "green" | "yellow" | "red"
+    arrival_soc: list[list[float]]
+    precharge_mins: list[list[int | None]]
+
+class DispatchAssignment(BaseModel):
+    truck_id: str
+    route_id: str
+    status: str                     # "green" | "yellow"
+    cost: float                     # trip and wait time at the requested rate, plus energy
+    estimated_trip_time_mins: int
+    wait_mins: int                  # charge in progress + depot pre-charge before departure
+    energy_cost_estimate: float
+
+class DispatchPlan(BaseModel):
+    assignments: list[DispatchAssignment]
+    unassigned_truck_ids: list[str]
+    unassigned_route_ids: list[str]
+    total_cost: float
+    candidate_pairs: int            # non-red (truck, route) pairs the assignment chose from
+    pruned_pairs: int               # pairs ruled out by battery size alone, before simulating
+
+class DepotConfig(BaseModel):
+    chargers: int = Field(4, ge=1)                  # plugs at the depot
+    charger_kw: float = Field(150.0, gt=0)          # rated power per plug
+    site_limit_kw: float | None = Field(None, gt=0) # grid connection shared by the active plugs
+    horizon_mins: int = Field(1440, ge=1)
+
+class DepotJob(BaseModel):
+    truck_id: str
+    route_id: str
+    departure_mins: int = Field(0, ge=0)            # planned departure, minutes from now
+
+class DepotScheduleRequest(BaseModel):
+    jobs: list[DepotJob]
+    depot: DepotConfig | None = None                # defaults to the server's depot
+
+class ChargeSlot(BaseModel):
+    truck_id: str
+    route_id: str | None            # None for a truck finishing a charge it was already on
+    plug: int | None                # None if it needs no charge or never got a plug in the horizon
+    energy_kwh: float
+    start_mins: int | None
+    ready_mins: int | None          # None if it isn't charged within the horizon
+    late_mins: int | None           # ready after the planned departure by this much
+    isolated_ready_mins: int        # ready time with a charger to itself, no sharing
+
+class DepotSchedule(BaseModel):
+    slots: list[ChargeSlot]
+    infeasible_truck_ids: list[str]  # unavailable, or red on their route even at 100%
+    peak_kw: float
+    makespan_mins: int | None       # when the last plug frees up, None if past the horizon
+
+class ReachabilityEntry(BaseModel):
+    truck_id: str
+    route_id: str
+    arrival_soc: float
+    status: str                     # "green" | "yellow" | "red", as in the feasibility result
+    precharge_mins: int | None = None
+
+class ReachabilityResult(BaseModel):
+    fleet_version: int              # snapshot the answer was computed from
+    total: int                      # matches before the limit
+    results: list[ReachabilityEntry]  # highest arrival SoC first
@@ -0,0 +1,206 @@
+import math
+import threading
+import numpy as np
+from models import Route, ReachabilityEntry
+from simulation import CompiledRoute
+from batch_simulation import solve_fleet, STATUS_NAMES
+from records import round_array
+from snapshot import FleetSnapshot
+
+# Reachability index: for every (route, truck) pair, the arrival SoC, status and pre-charge
+# minutes the feasibility endpoint reports, kept as arrays per route so threshold questions
+# ("trucks reaching R-07 with at least 25%", "routes T-04 runs without charging") are a
+# binary search and a mask instead of a fleet-wide sweep.
+#
+# A route's entry is built the first time it's asked about, from the current fleet snapshot
+# (on a worker thread: the endpoints call in through asyncio.to_thread).
+# After that each query brings it up to date first: a new snapshot re-simulates only the
+# trucks whose state changed (or that are new), a new route version rebuilds the entry.
+# Rows are ordered by arrival SoC, highest first and then by truck id, so min_arrival_soc is
+# a searchsorted and top-k a slice. Arrival SoC is held in hundredths of a percent (the API
+# rounds it to two decimals), about 17 bytes per pair with the order.
+#
+# Trucks that aren't available for dispatch (not ready or charging) are never returned, and
+# red pairs (the truck can't complete the route) only when asked for, by include_infeasible or
+# by naming red in statuses.
+
+# The truck fields a feasibility result depends on (feasibility_cache.truck_state)
+STATE_FIELDS = ("soc", "soh", "capacity_kwh", "load_lbs", "charge_eta_mins", "status", "charge_curve")
+NO_PRECHARGE = -1
+RED = STATUS_NAMES.index("red")
+
+
+class FleetState:
+    # The snapshot's truck columns the results depend on, copied so the index doesn't keep old
+    # snapshots mapped. One per snapshot version, shared by every route entry built from it.
+    __slots__ = ('version', 'ids', 'columns', 'available')
+
+    def __init__(self, snapshot: FleetSnapshot):
+        trucks = snapshot.truck_array
+        self.version = snapshot.version
+        self.ids = np.array(trucks["id"])
+        self.columns = {name: np.array(trucks[name]) for name in STATE_FIELDS}
+        self.available = np.isin(self.columns["status"], ("ready", "charging"))
+
+    def row(self, truck_id: str) -> int | None:
+        row = int(np.searchsorted(self.ids, truck_id))
+        return row if row < len(self.ids) and self.ids[row] == truck_id else None
+
+    def unchanged(self, previous: "FleetState") -> tuple[np.ndarray, np.ndarray]:
+        # For every truck here, its row in previous (a non-empty state) and whether its state is
+        # the same there
+        pos = np.minimum(np.searchsorted(previous.ids, self.ids), len(previous.ids) - 1)
+        same = previous.ids[pos] == self.ids
+        for name in STATE_FIELDS:
+            now, before = self.columns[name], previous.columns[name][pos]
+            equal = now == before
+            if now.dtype.kind == "f":
+                equal |= np.isnan(now) & np.isnan(before)
+            same &= equal
+        return pos, same
+
+
+class RouteReach:
+    __slots__ = ('plan_version', 'fleet', 'arrival_centi', 'status', 'precharge_mins', 'order', 'sorted_neg_centi')
+
+    def __init__(self, plan_version: int, fleet: FleetState, arrival_centi, status, precharge_mins):
+        self.plan_version = plan_version
+        self.fleet = fleet
+        self.arrival_centi = arrival_centi
+        self.status = status
+        self.precharge_mins = precharge_mins
+        # Highest arrival first; the stable sort keeps ties in id order
+        self.order = np.argsort(-arrival_centi, kind="stable").astype(np.int32)
+        self.sorted_neg_centi = -arrival_centi[self.order]
+
+
+def centi_threshold(min_arrival_soc: float) -> int:
+    # The smallest c with c / 100 >= min_arrival_soc, exactly as the rounded floats compare
+    c = math.ceil(min_arrival_soc * 100)
+    while (c - 1) / 100 >= min_arrival_soc:
+        c -= 1
+    while c / 100 < min_arrival_soc:
+        c += 1
+    return c
+
+
+def simulate_rows(route: Route, plan: CompiledRoute, fleet: FleetState, rows: np.ndarray):
+    # Arrival SoC (hundredths), status code and pre-charge minutes for the given rows, the
+    # same numbers evaluate_fleet gives those trucks
+    columns = {name: values[rows] for name, values in fleet.columns.items()}
+    arrival = np.zeros(len(rows), dtype=np.int32)
+    status = np.full(len(rows), RED, dtype=np.int8)
+    precharge = np.full(len(rows), NO_PRECHARGE, dtype=np.int32)
+    available = fleet.available[rows]
+    if available.any():
+        eta = columns["charge_eta_mins"][available]
+        sim = solve_fleet(route, plan, {
+            "loads": columns["load_lbs"][available],
+            "socs": columns["soc"][available] / 100,
+            "caps": columns["capacity_kwh"][available] * (columns["soh"][available] / 100),
+            "charge_eta_mins": np.where(np.isnan(eta), 0.0, eta),
+            "curves": columns["charge_curve"][available],
+        })
+        arrival[available] = np.round(round_array(sim['arrival_soc']) * 100)
+        status[available] = sim['status']
+        precharge[available] = np.where(np.isnan(sim['precharge_mins']), NO_PRECHARGE, sim['precharge_mins'])
+    return arrival, status, precharge
+
+
+class ReachabilityIndex:
+    def __init__(self):
+        self._fleet: FleetState | None = None
+        self._routes: dict[str, RouteReach] = {}
+        self._lock = threading.Lock()
+        self.rebuilt = 0
+        self.resimulated = 0
+
+    def _fleet_state(self, snapshot: FleetSnapshot) -> FleetState:
+        fleet = self._fleet
+        if fleet is None or fleet.version != snapshot.version:
+            fleet = self._fleet = FleetState(snapshot)
+        return fleet
+
+    def _entry(self, route: Route, plan: CompiledRoute, fleet: FleetState) -> RouteReach:
+        entry = self._routes.get(route.id)
+        if entry is not None and entry.fleet is fleet and entry.plan_version == plan.version:
+            return entry
+
+        n = len(fleet.ids)
+        if entry is None or entry.plan_version != plan.version or not len(entry.fleet.ids):
+            arrival, status, precharge = simulate_rows(route, plan, fleet, np.arange(n))
+            self.rebuilt += 1
+        else:
+            # Same route, newer fleet: carry over every truck whose state didn't change
+            pos, same = fleet.unchanged(entry.fleet)
+            arrival, status, precharge = entry.arrival_centi[pos], entry.status[pos], entry.precharge_mins[pos]
+            stale = np.flatnonzero(~same)
+            if len(stale):
+                arrival[stale], status[stale], precharge[stale] = simulate_rows(route, plan, fleet, stale)
+            self.resimulated += len(stale)
+
+        entry = RouteReach(plan.version, fleet, arrival, status, precharge)
+        self._routes[route.id] = entry
+        return entry
+
+    def trucks_for_route(self, route: Route, plan: CompiledRoute, snapshot: FleetSnapshot,
+                         min_arrival_soc: float | None = None, statuses: list[str] | None = None,
+                         truck_status: str | None = None, limit: int | None = None,
+                         include_infeasible: bool = False) -> tuple[int, list[ReachabilityEntry]]:
+        with self._lock:
+            fleet = self._fleet_state(snapshot)
+            entry = self._entry(route, plan, fleet)
+
+        rows = entry.order
+        if min_arrival_soc is not None:
+            rows = rows[:np.searchsorted(entry.sorted_neg_centi, -centi_threshold(min_arrival_soc), side="right")]
+        keep = fleet.available[rows]
+        if statuses:
+            keep &= np.isin(entry.status[rows], [STATUS_NAMES.index(s) for s in statuses])
+        elif not include_infeasible:
+            keep &= entry.status[rows] != RED
+        if truck_status:
+            keep &= fleet.columns["status"][rows] == truck_status
+        rows = rows[keep]
+        return len(rows), [self._result(entry, route.id, r) for r in rows[:limit].tolist()]
+
+    def routes_for_truck(self, truck_id: str, routes: list[tuple[Route, CompiledRoute]], snapshot: FleetSnapshot,
+                         min_arrival_soc: float | None = None, statuses: list[str] | None = None,
+                         limit: int | None = None, include_infeasible: bool = False) -> tuple[int, list[ReachabilityEntry]] | None:
+        # None if the truck isn't in the snapshot
+        with self._lock:
+            fleet = self._fleet_state(snapshot)
+            row = fleet.row(truck_id)
+            if row is None:
+                return None
+            if not fleet.available[row]:
+                return 0, []
+            entries = [(route.id, self._entry(route, plan, fleet)) for route, plan in routes]
+
+        threshold = None if min_arrival_soc is None else centi_threshold(min_arrival_soc)
+        matches = [
+            (route_id, entry) for route_id, entry in entries
+            if (threshold is None or entry.arrival_centi[row] >= threshold)
+            and (STATUS_NAMES[entry.status[row]] in statuses if statuses else include_infeasible or entry.status[row] != RED)
+        ]
+        matches.sort(key=lambda match: (-match[1].arrival_centi[row], match[0]))
+        return len(matches), [self._result(entry, route_id, row) for route_id, entry in matches[:limit]]
+
+    @staticmethod
+    def _result(entry: RouteReach, route_id: str, row: int) -> ReachabilityEntry:
+        precharge = int(entry.precharge_mins[row])
+        return ReachabilityEntry(
+            truck_id=str(entry.fleet.ids[row]),
+            route_id=route_id,
+            arrival_soc=int(entry.arrival_centi[row]) / 100,
+            status=STATUS_NAMES[entry.status[row]],
+            precharge_mins=None if precharge == NO_PRECHARGE else precharge,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "routes": len(self._routes),
+            "fleet_version": self._fleet.version if self._fleet is not None else None,
+            "rebuilt": self.rebuilt,
+            "resimulated_trucks": self.resimulated,
+        }
@@ -0,0 +1,47 @@
+import copy
+
+from models import Route
+from simulation import CompiledRoute
+from store import FleetReader
+
+
+class RouteRegistry:
+    # Compiled plans for the routes in a FleetReader (the store or its snapshots), one per route,
+    # tagged with the route's version in the store. Any change to a route bumps its version; the
+    # plan is only rebuilt when something it is compiled from (stops, charging stations,
+    # distance, elevation profile) changed.
+    #
+    # Callers holding a snapshot pass it to plan(), so the plan matches the route they read
+    # from that snapshot even if a newer one is published mid-request. Only the newest version
+    # of each route is kept; plans handed out are never modified afterwards.
+
+    def __init__(self, store: FleetReader):
+        self.store = store
+        self._plans: dict[str, CompiledRoute] = {}
+        self._geometry: dict[str, tuple] = {}
+
+    def version(self, route_id: str) -> int:
+        return self.store.route_version(route_id)
+
+    def plan(self, route_id: str, reader: FleetReader | None = None) -> CompiledRoute:
+        reader = reader or self.store
+        version = reader.route_version(route_id)
+        cached = self._plans.get(route_id)
+        if cached is not None and cached.version == version:
+            return cached
+
+        route = reader.get_route(route_id)
+        geometry = self._compiled_from(route)
+        if cached is not None and self._geometry[route_id] == geometry:
+            plan = copy.copy(cached)
+            plan.version = version
+        else:
+            plan = CompiledRoute(route, version)
+        if cached is None or version > cached.version:
+            self._plans[route_id] = plan
+            self._geometry[route_id] = geometry
+        return plan
+
+    @staticmethod
+    def _compiled_from(route: Route) -> tuple:
+        return (route.distance_miles, route.stops, route.charging_stations, route.elevation_profile)
@@ -0,0 +1,421 @@
+import math
+import numpy as np
+from models import Route, Truck, FeasibilityResult, LegDetail, ElevationPoint
+from metrics import count
+from charge_curves import charge_table
+
+# Constants
+WEIGHT_FACTOR = 0.00004  # kWh per lb per mile (realistic: ~0.3 kWh/mile at 80k lbs)
+ENERGY_COST_PER_KWH = 0.15  # Fixed rate for cost estimate
+MIN_BUFFER_SOC = 0.15
+CHARGE_TARGET_SOC = 0.90  # Charge to 90% when stopping at a charger
+DEPOT_CHARGER_KW = 150.0  # Depot pre-charge
+
+# Routes with an elevation profile: a leg costs its flat-road energy plus the potential energy
+# of the whole vehicle for its climbs, less what regenerative braking recovers on descents,
+# instead of scaling everything by terrain_multiplier
+TRUCK_TARE_LBS = 35_000.0    # tractor and empty trailer, climbing along with the payload
+CLIMB_KWH_PER_LB_FT = 0.45359237 * 9.80665 * 0.3048 / 3.6e6   # lifting 1 lb by 1 ft
+DRIVETRAIN_EFFICIENCY = 0.90
+REGEN_EFFICIENCY = 0.60
+
+
+def truck_range_miles(truck: Truck, base_consumption: float = 1.8) -> float:
+    # Flat-ground range down to the 15% buffer at the fleet's baseline consumption, shown on the truck card
+    effective_capacity = truck.capacity_kwh * (truck.soh / 100)
+    usable_kwh = max(0, effective_capacity * ((truck.soc / 100) - 0.15))
+    consumption_per_mile = base_consumption + WEIGHT_FACTOR * truck.load_lbs
+
+    if consumption_per_mile > 0:
+        return round(usable_kwh / consumption_per_mile, 1)
+    return 0.0
+
+
+def build_nodes(route: Route) -> list[dict]:
+    # Build waypoints
+    waypoints = []
+    charger_idx = 1
+    for cs in route.charging_stations:
+        waypoints.append({
+            'mile_marker': cs.mile_marker,
+            'type': 'charger',
+            'charge_rate_kw': cs.charge_rate_kw,
+            'name': f"Charger {charger_idx}"
+        })
+        charger_idx += 1
+
+    stop_idx = 1
+    for s in route.stops:
+        waypoints.append({
+            'mile_marker': s.mile_marker,
+            'type': 'stop',
+            'unload_lbs': s.unload_lbs,
+            'pickup_lbs': s.pickup_lbs,
+            'has_charger': s.has_charger,
+            'charge_rate_kw': s.charge_rate_kw,
+            'name': f"Stop {stop_idx}"
+        })
+        stop_idx += 1
+
+    waypoints.sort(key=lambda x: x['mile_marker'])
+    waypoints.append({'mile_marker': route.distance_miles, 'type': 'destination', 'name': 'Destination'})
+
+    # Build the full list of nodes the truck visits, starting with the depot (mile 0).
+    # Nodes: depot (origin), then each waypoint in order.
+    # Depot now has a charger as requested.
+    nodes = [{'mile_marker': 0.0, 'type': 'depot', 'has_charger': True, 'charge_rate_kw': 150.0, 'name': 'Depot'}]
+    for wp in waypoints:
+        has_charger = (wp['type'] == 'charger') or (wp['type'] == 'stop' and wp.get('has_charger'))
+        nodes.append({
+            'mile_marker': wp['mile_marker'],
+            'type': wp['type'],
+            'has_charger': has_charger,
+            'charge_rate_kw': wp.get('charge_rate_kw'),
+            'unload_lbs': wp.get('unload_lbs', 0),
+            'pickup_lbs': wp.get('pickup_lbs', 0),
+            'name': wp.get('name', 'Waypoint')
+        })
+    return nodes
+
+
+def grade_energy_per_lb(profile: list[ElevationPoint], miles: list[float]) -> list[float]:
+    # kWh per lb of vehicle for each stretch between consecutive mile markers: prefix sums of
+    # the segment energies, interpolated within a segment (constant grade) and flat outside
+    # the profile, so every stretch is a difference of two lookups
+    points = sorted(profile, key=lambda p: p.mile_marker)
+    cumulative = [0.0]
+    for a, b in zip(points, points[1:]):
+        rise = b.elevation_ft - a.elevation_ft
+        energy = rise / DRIVETRAIN_EFFICIENCY if rise > 0 else rise * REGEN_EFFICIENCY
+        cumulative.append(cumulative[-1] + energy * CLIMB_KWH_PER_LB_FT)
+    at = np.interp(miles, [p.mile_marker for p in points], cumulative)
+    return np.diff(at).tolist()
+
+
+def required_depot_payload(nodes: list[dict]) -> float:
+    # Determine the minimum payload required at the depot to fulfill all unloads
+    sim_load = 0
+    min_sim_load = 0
+    for node in nodes:
+        if node['type'] == 'stop':
+            sim_load += node.get('pickup_lbs', 0) - node.get('unload_lbs', 0)
+            if sim_load < min_sim_load:
+                min_sim_load = sim_load
+
+    return max(0.0, -min_sim_load)
+
+
+class CompiledRoute:
+    # A route flattened into per-node lists once, so a simulation is a single O(n) pass with
+    # no dict lookups and no forward rescans at every charger. Only depends on the route's
+    # stops, charging stations and elevation profile; consumption coefficients are read from
+    # the Route itself.
+    __slots__ = (
+        'route_id', 'version', 'nodes', 'leg_distance', 'has_charger', 'charge_rate_kw', 'is_stop',
+        'unload_lbs', 'pickup_lbs', 'chargers', 'scan_end', 'depot_payload', 'stops_required', 'leg_grade',
+    )
+
+    def __init__(self, route: Route, version: int = 0):
+        nodes = build_nodes(route)
+        n_nodes = len(nodes)
+        self.route_id = route.id
+        self.version = version
+        self.nodes = nodes
+        self.leg_distance = [nodes[i + 1]['mile_marker'] - nodes[i]['mile_marker'] for i in range(n_nodes - 1)]
+        self.has_charger = [bool(node.get('has_charger')) for node in nodes]
+        self.charge_rate_kw = [node.get('charge_rate_kw') or 150.0 for node in nodes]
+        self.is_stop = [node['type'] == 'stop' for node in nodes]
+        self.unload_lbs = [node.get('unload_lbs', 0) if stop else 0 for node, stop in zip(nodes, self.is_stop)]
+        self.pickup_lbs = [node.get('pickup_lbs', 0) if stop else 0 for node, stop in zip(nodes, self.is_stop)]
+        self.chargers = [i for i in range(n_nodes - 1) if self.has_charger[i]]
+        self.depot_payload = required_depot_payload(nodes)
+        self.stops_required = sum(self.is_stop)
+        # Per leg, kWh per lb of vehicle from elevation change; None without a profile
+        self.leg_grade = (
+            grade_energy_per_lb(route.elevation_profile, [node['mile_marker'] for node in nodes])
+            if route.elevation_profile else None
+        )
+
+        # next_charger[k]: first node at or after k with a charger, or the destination
+        next_charger = [n_nodes - 1] * n_nodes
+        for k in reversed(range(n_nodes - 1)):
+            next_charger[k] = k if self.has_charger[k] else next_charger[k + 1]
+
+        # The charge target at a charger covers the energy up to the next charger *after* the
+        # following node (the look-ahead never stops on the very next node), i.e. legs
+        # i .. scan_end[i] - 1. Every leg falls in at most two of these windows.
+        self.scan_end = [next_charger[min(i + 2, n_nodes - 1)] for i in range(n_nodes - 1)]
+
+
+def simulate_route(route: Route, plan: CompiledRoute, truck_initial_load, truck_initial_soc, effective_capacity,
+                   charge_targets: list[float | None] | None = None, charge_curve: tuple | None = None):
+    # Scalar reference implementation: one truck, one pass over the compiled route.
+    # The batch engine in batch_simulation.py must reproduce these numbers exactly.
+    # charge_targets (one per node, None = don't charge) replaces the look-ahead rule with a
+    # precomputed plan, see charging_plan.py. charge_curve is the truck's (charge_curves.py).
+    count("simulate_route")
+
+    # Input Validation: If the truck has 0 capacity or 0 SOC, handle gracefully
+    if effective_capacity <= 0:
+        return {
+            "feasible": False,
+            "arrival_soc": 0.0,
+            "total_energy_kwh": 0.0,
+            "total_charge_time_mins": 0,
+            "total_stop_time_mins": 0,
+            "estimated_trip_time_mins": 0,
+            "stops_required": 0,
+            "no_charge_needed": False,
+            "leg_details": []
+        }
+
+    nodes = plan.nodes
+    n_legs = len(nodes) - 1
+    leg_distance = plan.leg_distance
+    depot_payload = plan.depot_payload
+
+    # Payload (and therefore energy) per leg doesn't depend on SoC, so resolve it in one pass first
+    loads = [max(truck_initial_load, depot_payload)]
+    leg_soc = []
+    leg_kwh = []
+    for i in range(n_legs):
+        curr_load = loads[i]
+        if plan.leg_grade is None:
+            energy_needed_kwh = (route.base_consumption + WEIGHT_FACTOR * curr_load) * leg_distance[i] * route.terrain_multiplier
+        else:
+            # A long descent can recover more than the leg uses, but never charges the battery
+            energy_needed_kwh = max(0.0, (route.base_consumption + WEIGHT_FACTOR * curr_load) * leg_distance[i]
+                                    + (TRUCK_TARE_LBS + curr_load) * plan.leg_grade[i])
+        leg_kwh.append(energy_needed_kwh)
+        leg_soc.append(energy_needed_kwh / effective_capacity)
+        if plan.is_stop[i + 1]:
+            curr_load = max(0, curr_load - plan.unload_lbs[i + 1] + plan.pickup_lbs[i + 1])
+        loads.append(curr_load)
+
+    curr_soc = truck_initial_soc
+
+    tot_charge_time_mins = 0
+    tot_stops_required = 0
+
+    node_unload_times = [0] * len(nodes)
+    node_charge_times = [0] * len(nodes)
+
+    # If the route requires a load (unload before sufficient pickups), we must have loaded it at the depot.
+    # Add 30 minutes for loading at the depot before dispatch.
+    if depot_payload > 0:
+        node_unload_times[0] = 30
+
+    no_charge_req = True
+    legs = []
+    is_feasible = True
+    tot_energy_kwh = 0
+
+    for i in range(n_legs):
+        to_node = nodes[i + 1]
+        tot_energy_kwh += leg_kwh[i]
+        energy_needed_soc = leg_soc[i]
+
+        charge_added_kwh = 0
+        charge_time_mins = 0
+        used_charger = False
+
+        # --- STEP 1: Charge at the DEPARTURE node ---
+        if plan.has_charger[i]:
+            if charge_targets is not None:
+                target_soc = charge_targets[i] if charge_targets[i] is not None else 0.0
+            else:
+                # Energy to the next charger/destination
+                energy_to_next_charger_soc = 0.0
+                for j in range(i, plan.scan_end[i]):
+                    energy_to_next_charger_soc += leg_soc[j]
+
+                min_needed_soc = energy_to_next_charger_soc + MIN_BUFFER_SOC
+                target_soc = min(min_needed_soc, CHARGE_TARGET_SOC)
+
+            deficit_soc = max(0, target_soc - curr_soc)
+            if deficit_soc > 0.001:
+                charge_added_kwh = deficit_soc * effective_capacity
+                if charge_curve is None:
+                    charge_time_mins = math.ceil(charge_added_kwh / plan.charge_rate_kw[i] * 60)
+                else:
+                    table = charge_table(charge_curve, plan.charge_rate_kw[i])
+                    charge_time_mins = math.ceil(effective_capacity * (table.at(curr_soc + deficit_soc) - table.at(curr_soc)))
+                curr_soc += deficit_soc
+                tot_charge_time_mins += charge_time_mins
+                node_charge_times[i] = charge_time_mins
+                no_charge_req = False
+                used_charger = True
+
+        # --- STEP 2: Drive ---
+        start_soc = curr_soc
+        will_arrive_soc = curr_soc - energy_needed_soc
+        if will_arrive_soc < MIN_BUFFER_SOC - 1e-9:
+            is_feasible = False
+
+        curr_soc -= energy_needed_soc
+        curr_soc = max(curr_soc, 0.0)
+
+        # --- STEP 3: At the ARRIVAL node ---
+        unload_lbs = 0
+        pickup_lbs = 0
+
+        if plan.is_stop[i + 1]:
+            unload_lbs = plan.unload_lbs[i + 1]
+            pickup_lbs = plan.pickup_lbs[i + 1]
+            node_unload_times[i + 1] = 30
+            tot_stops_required += 1
+
+        legs.append(LegDetail(
+            leg_number=i + 1,
+            distance_miles=round(leg_distance[i], 2),
+            start_soc=round(start_soc * 100, 2),
+            end_soc=round(curr_soc * 100, 2),
+            start_load_lbs=round(loads[i], 2),
+            end_load_lbs=round(loads[i + 1], 2),
+            pickup_lbs=pickup_lbs,
+            charge_added_kwh=round(charge_added_kwh, 2),
+            charge_time_mins=charge_time_mins,
+            unload_lbs=unload_lbs,
+            used_charger=used_charger,
+            end_location_name=to_node.get('name', 'Waypoint'),
+            end_has_charger=to_node.get('has_charger', False)
+        ))
+
+    tot_stop_time_mins = sum(max(u, c) for u, c in zip(node_unload_times, node_charge_times))
+    drive_time_mins = math.ceil((route.distance_miles / 55.0) * 60.0)
+    estimated_trip_time_mins = drive_time_mins + tot_stop_time_mins
+
+    return {
+        "feasible": is_feasible,
+        "arrival_soc": round(curr_soc * 100, 2),
+        "total_energy_kwh": tot_energy_kwh,
+        "total_charge_time_mins": tot_charge_time_mins,
+        "total_stop_time_mins": tot_stop_time_mins,
+        "estimated_trip_time_mins": estimated_trip_time_mins,
+        "stops_required": tot_stops_required,
+        "no_charge_needed": no_charge_req,
+        "leg_details": legs
+    }
+
+
+def unavailable_result(truck: Truck) -> FeasibilityResult:
+    return FeasibilityResult(
+        truck_id=truck.id,
+        status="red",
+        arrival_soc=0.0,
+        energy_required_kwh=0.0,
+        charge_time_mins=None,
+        total_stop_time_mins=None,
+        estimated_trip_time_mins=None,
+        energy_cost_estimate=None,
+        stops_required=0,
+        no_charge_needed=False,
+        not_available=True,
+        leg_details=[]
+    )
+
+
+def precharge_plan(truck: Truck, min_required_soc: float, effective_capacity: float):
+    # For charging trucks, credit the charge already in progress (on the depot charger too).
+    # Returns (feasible_after_precharge, precharge_kwh, precharge_mins).
+    eta = truck.charge_eta_mins or 0
+    table = charge_table(truck.charge_curve, DEPOT_CHARGER_KW) if truck.charge_curve is not None else None
+    if table is None or not eta:
+        soc_after_current_charge = min(1.0, (truck.soc / 100) + eta / 60 * DEPOT_CHARGER_KW / effective_capacity)
+    else:
+        soc_after_current_charge = float(table.soc_after(truck.soc / 100, eta / effective_capacity))
+    if soc_after_current_charge >= min_required_soc:
+        return False, 0, 0  # No extra pre-charge needed
+    precharge_kwh = (min_required_soc - soc_after_current_charge) * effective_capacity
+    if table is None:
+        return True, precharge_kwh, math.ceil(precharge_kwh / DEPOT_CHARGER_KW * 60)
+    return True, precharge_kwh, math.ceil(effective_capacity * (table.at(min_required_soc) - table.at(soc_after_current_charge)))
+
+
+def feasibility_status(feasible: bool, feasible_after_precharge: bool, no_charge_needed: bool) -> str:
+    if not feasible and not feasible_after_precharge:
+        return "red"
+    elif feasible_after_precharge:
+        return "yellow"
+    elif not no_charge_needed:
+        return "yellow"  # needs en-route charging
+    else:
+        return "green"
+
+
+def charge_overlap_mins(legs: list[LegDetail]) -> int:
+    # Charging on departure from a stop runs alongside its un/loading, for up to the 30-minute stop.
+    # The first leg departs from the depot, which never counts.
+    overlap = 0
+    for prev_leg, leg in zip(legs, legs[1:]):
+        if leg.used_charger and (prev_leg.unload_lbs > 0 or prev_leg.pickup_lbs > 0):
+            overlap += min(30, leg.charge_time_mins)
+    return overlap
+
+
+def evaluate_truck(route: Route, plan: CompiledRoute, truck: Truck) -> FeasibilityResult:
+    # Scalar reference for a single truck; see batch_simulation.evaluate_fleet for the hot path.
+    if truck.status not in ("ready", "charging"):
+        return unavailable_result(truck)
+
+    effective_capacity = truck.capacity_kwh * (truck.soh / 100)
+
+    # Initial Pass
+    sim = simulate_route(route, plan, truck.load_lbs, truck.soc / 100, effective_capacity, charge_curve=truck.charge_curve)
+
+    feasible_after_precharge = False
+    precharge_mins = None
+    precharge_kwh = None
+
+    if not sim['feasible']:
+        # Check feasibility at 100% SoC
+        sim_100 = simulate_route(route, plan, truck.load_lbs, 1.0, effective_capacity)
+        if sim_100['feasible']:
+            # Binary search for min_required_soc
+            low = truck.soc / 100
+            high = 1.0
+            min_required_soc = 1.0
+            while high - low > 0.001:
+                mid = (low + high) / 2
+                if simulate_route(route, plan, truck.load_lbs, mid, effective_capacity)['feasible']:
+                    min_required_soc = mid
+                    high = mid
+                else:
+                    low = mid
+
+            feasible_after_precharge, precharge_kwh, precharge_mins = precharge_plan(truck, min_required_soc, effective_capacity)
+
+            # Final pass to get accurate details
+            sim = simulate_route(route, plan, truck.load_lbs, min_required_soc, effective_capacity, charge_curve=truck.charge_curve)
+
+    return FeasibilityResult(
+        truck_id=truck.id,
+        status=feasibility_status(sim['feasible'], feasible_after_precharge, sim['no_charge_needed']),
+        arrival_soc=sim['arrival_soc'],
+        energy_required_kwh=round(sim['total_energy_kwh'], 2),
+        charge_time_mins=sim['total_charge_time_mins'],
+        total_stop_time_mins=sim['total_stop_time_mins'],
+        estimated_trip_time_mins=sim['estimated_trip_time_mins'],
+        energy_cost_estimate=round(sim['total_energy_kwh'] * ENERGY_COST_PER_KWH, 2),
+        stops_required=sim['stops_required'],
+        no_charge_needed=sim['no_charge_needed'],
+        feasible_after_precharge=feasible_after_precharge,
+        precharge_mins=precharge_mins,
+        precharge_kwh=round(precharge_kwh, 2) if precharge_kwh is not None else None,
+        charge_overlap_mins=charge_overlap_mins(sim['leg_details']),
+        leg_details=sim['leg_details']
+    )
+
+
+def result_sort_key(x: FeasibilityResult) -> tuple:
+    return (
+        x.not_available,
+        not (x.status == "green" and x.no_charge_needed),
+        x.charge_time_mins if x.charge_time_mins is not None else 0,
+        -x.arrival_soc
+    )
+
+
+def sort_results(results: list[FeasibilityResult]) -> list[FeasibilityResult]:
+    results.sort(key=result_sort_key)
+    return results
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import math
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+from models import Route
+from records import TruckRecord
+from charge_curves import curve_text, parse_curve
+from simulation import truck_range_miles
+from store import FleetRepository, TRUCK_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, so run a single worker there
+    fcntl = None
+
+# Fleet snapshots shared by every uvicorn worker. One process at a time is the writer: it
+# polls the store's data_version and, when trucks or routes changed, publishes a new immutable
+# snapshot directory v<version>/ holding
+#   trucks.npy   one record per truck (TRUCK_COLUMNS), ordered by id
+#   routes.npy   one record per route: id, priority, version and where its JSON is in routes.json
+#   routes.json  every route's JSON, back to back
+# then points CURRENT at it with an atomic rename. Workers map the files read-only, so the
+# page cache holds one copy for all of them, and switch versions by swapping a single
+# reference: a request that took a snapshot reads that version throughout, however many are
+# published meanwhile.
+#
+# The version is the sum of the store's truck and route versions, so it only moves when
+# something changed and every worker (and any later writer) agrees on it. Writes still go to
+# the store; readers see them with the next publish, at most SNAPSHOT_INTERVAL_MS later.
+#
+# A snapshot's trucks become TruckRecords once per worker and version, and its routes become
+# Route models once per route version. They are shared by every request reading the snapshot
+# and must not be modified.
+
+POINTER = "CURRENT"
+KEEP_VERSIONS = 3
+ROUTE_FILES = ("routes.npy", "routes.json")
+
+
+def _text(values: list[str]) -> str:
+    # Fixed-width unicode just wide enough for the longest value
+    return f"U{max(max(map(len, values), default=1), 1)}"
+
+
+def truck_array(trucks: list[TruckRecord]) -> np.ndarray:
+    # Missing charge ETAs and ranges are stored as NaN, charge curves as their text ('' for none)
+    curves = [curve_text(t.charge_curve) for t in trucks]
+    text = {name: _text([getattr(t, name) for t in trucks]) for name in ("id", "name", "status")}
+    text["charge_curve"] = _text(curves)
+    dtype = np.dtype([(name, text.get(name, np.float64)) for name in TRUCK_COLUMNS])
+    return np.array([
+        (t.id, t.name, t.soc, t.soh, t.capacity_kwh, t.load_lbs, t.status,
+         math.nan if t.charge_eta_mins is None else t.charge_eta_mins,
+         math.nan if t.range_miles is None else t.range_miles, curve)
+        for t, curve in zip(trucks, curves)
+    ], dtype=dtype)
+
+
+def truck_records(array: np.ndarray) -> list[TruckRecord]:
+    records = []
+    curves = {"": None}   # trucks of a model share one curve
+    for *fields, eta, range_miles, curve in array.tolist():
+        if curve not in curves:
+            curves[curve] = parse_curve(curve)
+        records.append(TruckRecord(
+            *fields, None if math.isnan(eta) else int(eta), None if math.isnan(range_miles) else range_miles,
+            curves[curve],
+        ))
+    return records
+
+
+def route_section(versioned: list[tuple[int, Route]]) -> tuple[np.ndarray, bytes]:
+    routes = [route for _, route in versioned]
+    blobs = [route.model_dump_json().encode() for route in routes]
+    offsets = np.cumsum([0] + [len(blob) for blob in blobs])
+    dtype = np.dtype([
+        ("id", _text([r.id for r in routes])), ("priority", _text([r.priority for r in routes])),
+        ("version", np.int64), ("offset", np.int64), ("length", np.int64),
+    ])
+    index = np.array([
+        (route.id, route.priority, version, offsets[i], len(blobs[i])) for i, (version, route) in enumerate(versioned)
+    ], dtype=dtype)
+    return index, b"".join(blobs)
+
+
+class FleetSnapshot:
+    # One published version, read-only; serves the store's read methods (FleetReader)
+
+    def __init__(self, path: Path, version: int, route_cache: dict[str, tuple[int, Route]]):
+        self.version = version
+        self.truck_array = np.load(path / "trucks.npy", mmap_mode="r")
+        self.route_index = np.load(path / "routes.npy", mmap_mode="r")
+        with open(path / "routes.json", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._route_json = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._route_rows = {route_id: row for row, route_id in enumerate(self.route_index["id"].tolist())}
+        self._route_cache = route_cache
+        self._trucks: list[TruckRecord] | None = None
+        self._by_id: dict[str, TruckRecord] | None = None
+
+    def _records(self) -> list[TruckRecord]:
+        if self._trucks is None:
+            trucks = truck_records(self.truck_array)
+            self._by_id = {truck.id: truck for truck in trucks}
+            self._trucks = trucks
+        return self._trucks
+
+    def get_truck(self, truck_id: str) -> TruckRecord | None:
+        self._records()
+        return self._by_id.get(truck_id)
+
+    def get_trucks(self, truck_ids: Iterable[str]) -> list[TruckRecord]:
+        # In id order, like the store
+        self._records()
+        return [self._by_id[i] for i in sorted(set(truck_ids)) if i in self._by_id]
+
+    def trucks(self, status: str | None = None) -> list[TruckRecord]:
+        if status is None:
+            return list(self._records())
+        return [truck for truck in self._records() if truck.status == status]
+
+    def route_version(self, route_id: str) -> int:
+        row = self._route_rows.get(route_id)
+        return 0 if row is None else int(self.route_index["version"][row])
+
+    def get_route(self, route_id: str) -> Route | None:
+        row = self._route_rows.get(route_id)
+        if row is None:
+            return None
+        _, _, version, offset, length = self.route_index[row].tolist()
+        cached = self._route_cache.get(route_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        route = Route.model_validate_json(self._route_json[offset:offset + length])
+        self._route_cache[route_id] = (version, route)
+        return route
+
+    def routes(self, priority: str | None = None) -> list[Route]:
+        return [
+            self.get_route(route_id)
+            for route_id, route_priority in zip(self.route_index["id"].tolist(), self.route_index["priority"].tolist())
+            if priority is None or route_priority == priority
+        ]
+
+
+class FleetSnapshots:
+    # Publishes snapshots of a store into a directory and serves the current one. Every worker
+    # runs run(); whichever holds the writer lock publishes, the others keep trying for it, so
+    # when the writer exits another worker takes over. The read methods delegate to current().
+
+    def __init__(self, store: FleetRepository, directory: str | Path | None = None, interval: float = 0.1):
+        self.store = store
+        self.interval = interval
+        if directory is None:
+            # Private to this process, e.g. for an in-memory store
+            self._tmp = tempfile.TemporaryDirectory(prefix="fleet-snapshots-")
+            directory = self._tmp.name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._state: tuple[bytes, FleetSnapshot] | None = None
+        self._route_cache: dict[str, tuple[int, Route]] = {}
+        self._load_lock = threading.Lock()
+        self._publish_thread_lock = threading.Lock()
+        self._writer_file = None
+        self._closed = asyncio.Event()
+        self.published = 0
+
+    @property
+    def is_writer(self) -> bool:
+        return self._writer_file is not None
+
+    def current(self) -> FleetSnapshot:
+        # The latest published snapshot. Checking costs one read of the small CURRENT file;
+        # a new version is mapped once, by whichever request sees it first.
+        while True:
+            try:
+                pointer = (self.directory / POINTER).read_bytes()
+            except FileNotFoundError:
+                # Nothing published yet
+                self.publish()
+                continue
+            state = self._state
+            if state is not None and state[0] == pointer:
+                return state[1]
+            with self._load_lock:
+                state = self._state
+                if state is not None and state[0] == pointer:
+                    return state[1]
+                info = json.loads(pointer)
+                try:
+                    snapshot = FleetSnapshot(self.directory / info["path"], info["version"], self._route_cache)
+                except FileNotFoundError:
+                    # Superseded and pruned while we were reading the pointer: read it again
+                    continue
+                self._state = (pointer, snapshot)
+                return snapshot
+
+    def publish(self) -> bool:
+        # Writes a new snapshot if the store changed since the current one. Publishes are
+        # serialized across processes, so this is safe anywhere, though after the first one
+        # only the writer calls it. The store's version is read before its data: a snapshot may
+        # hold slightly newer data than its version says, never older, and the next poll
+        # publishes again.
+        with self._publish_lock():
+            try:
+                current = json.loads((self.directory / POINTER).read_bytes())
+            except FileNotFoundError:
+                current = None
+            trucks_version, routes_version = self.store.data_version()
+            if current is not None and (current["trucks"], current["routes"]) == (trucks_version, routes_version):
+                return False
+
+            version = trucks_version + routes_version
+            name = f"v{version:012d}"
+            staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.directory))
+            trucks = self.store.trucks()
+            for truck in trucks:
+                if truck.range_miles is None:
+                    truck.range_miles = truck_range_miles(truck)
+            np.save(staging / "trucks.npy", truck_array(trucks))
+            if current is not None and current["routes"] == routes_version:
+                # Routes unchanged: share the previous version's files
+                for file in ROUTE_FILES:
+                    try:
+                        os.link(self.directory / current["path"] / file, staging / file)
+                    except OSError:
+                        shutil.copyfile(self.directory / current["path"] / file, staging / file)
+            else:
+                index, blob = route_section(self.store.versioned_routes())
+                np.save(staging / "routes.npy", index)
+                (staging / "routes.json").write_bytes(blob)
+
+            # Left behind by a publish that died before moving CURRENT
+            shutil.rmtree(self.directory / name, ignore_errors=True)
+            os.rename(staging, self.directory / name)
+            pointer = self.directory / f".{POINTER}.tmp"
+            pointer.write_text(json.dumps({"path": name, "version": version, "trucks": trucks_version, "routes": routes_version}))
+            os.replace(pointer, self.directory / POINTER)
+            self.published += 1
+            self._prune(name)
+        return True
+
+    def _prune(self, latest: str):
+        # Old versions go once KEEP_VERSIONS newer ones exist. Workers still reading one keep
+        # their mapping (an unlinked file stays valid while it is mapped).
+        versions = sorted(p.name for p in self.directory.glob("v*") if p.name <= latest)
+        for name in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(self.directory / name, ignore_errors=True)
+        for staging in self.directory.glob(".staging-*"):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @contextmanager
+    def _publish_lock(self):
+        with self._publish_thread_lock, open(self.directory / "publish.lock", "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _try_become_writer(self) -> bool:
+        f = open(self.directory / "writer.lock", "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                return False
+        self._writer_file = f
+        return True
+
+    async def run(self):
+        # Until close(): publish every interval while this process is the writer
+        while not self._closed.is_set():
+            if self.is_writer or self._try_become_writer():
+                await asyncio.to_thread(self.publish)
+            try:
+                await asyncio.wait_for(self._closed.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        if self._writer_file is not None:
+            self._writer_file.close()
+            self._writer_file = None
+
+    def close(self):
+        self._closed.set()
+
+    def stats(self) -> dict:
+        snapshot = self.current()
+        return {
+            "version": snapshot.version,
+            "trucks": len(snapshot.truck_array),
+            "routes": len(snapshot.route_index),
+            "writer": self.is_writer,
+            "published": self.published,
+        }
+
+    # FleetReader, on the current snapshot
+
+    def get_truck(self, truck_id: str) -> TruckRecord | None:
+        return self.current().get_truck(truck_id)
+
+    def get_trucks(self, truck_ids: Iterable[str]) -> list[TruckRecord]:
+        return self.current().get_trucks(truck_ids)
+
+    def trucks(self, status: str | None = None) -> list[TruckRecord]:
+        return self.current().trucks(status)
+
+    def route_version(self, route_id: str) -> int:
+        return self.current().route_version(route_id)
+
+    def get_route(self, route_id: str) -> Route | None:
+        return self.current().get_route(route_id)
+
+    def routes(self, priority: str | None = None) -> list[Route]:
+        return self.current().routes(priority)
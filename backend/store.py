@@ -0,0 +1,403 @@
+import csv
+import json
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Protocol
+from models import Truck, Route, Stop, ChargingStation, ElevationPoint
+from records import TruckRecord
+from charge_curves import curve_text, parse_curve
+
+# Fleet and route storage. The API depends on FleetRepository; SQLiteFleetStore implements it
+# on a single SQLite file, so state survives restarts and every uvicorn worker writes to the
+# same data. Each truck and route has a monotonic version that only moves when a write
+# actually changes it, so caches can key on (id, version). Requests read through the
+# memory-mapped snapshots published from the store (snapshot.py) rather than querying it.
+#
+# Trucks are read back as TruckRecords (records.py) rather than validated Truck models; writes
+# take either. A truck's charge curve is stored as JSON text (charge_curves.curve_text).
+
+# In TruckRecord field order, so a row is its positional arguments
+TRUCK_COLUMNS = (
+    "id", "name", "soc", "soh", "capacity_kwh", "load_lbs", "status", "charge_eta_mins", "range_miles", "charge_curve",
+)
+ROUTE_COLUMNS = ("id", "name", "distance_miles", "elevation_gain_ft", "priority", "terrain_multiplier", "base_consumption")
+STOP_COLUMNS = ("mile_marker", "unload_lbs", "pickup_lbs", "has_charger", "charge_rate_kw")
+STATION_COLUMNS = ("mile_marker", "charge_rate_kw")
+ELEVATION_COLUMNS = ("mile_marker", "elevation_ft")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trucks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    soc REAL NOT NULL,
+    soh REAL NOT NULL,
+    capacity_kwh REAL NOT NULL,
+    load_lbs REAL NOT NULL,
+    status TEXT NOT NULL,
+    charge_eta_mins INTEGER,
+    range_miles REAL,
+    charge_curve TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS trucks_status ON trucks (status);
+
+CREATE TABLE IF NOT EXISTS routes (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    distance_miles REAL NOT NULL,
+    elevation_gain_ft REAL NOT NULL,
+    priority TEXT NOT NULL,
+    terrain_multiplier REAL NOT NULL,
+    base_consumption REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS routes_priority ON routes (priority);
+
+CREATE TABLE IF NOT EXISTS stops (
+    route_id TEXT NOT NULL REFERENCES routes (id),
+    seq INTEGER NOT NULL,
+    mile_marker REAL NOT NULL,
+    unload_lbs REAL NOT NULL,
+    pickup_lbs REAL NOT NULL,
+    has_charger INTEGER NOT NULL,
+    charge_rate_kw REAL,
+    PRIMARY KEY (route_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS charging_stations (
+    route_id TEXT NOT NULL REFERENCES routes (id),
+    seq INTEGER NOT NULL,
+    mile_marker REAL NOT NULL,
+    charge_rate_kw REAL NOT NULL,
+    PRIMARY KEY (route_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS elevation_points (
+    route_id TEXT NOT NULL REFERENCES routes (id),
+    seq INTEGER NOT NULL,
+    mile_marker REAL NOT NULL,
+    elevation_ft REAL NOT NULL,
+    PRIMARY KEY (route_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class FleetReader(Protocol):
+    # The read side, also served by fleet snapshots (snapshot.py)
+    def get_truck(self, truck_id: str) -> TruckRecord | None: ...
+    def get_trucks(self, truck_ids: Iterable[str]) -> list[TruckRecord]: ...
+    def trucks(self, status: str | None = None) -> list[TruckRecord]: ...
+    def get_route(self, route_id: str) -> Route | None: ...
+    def routes(self, priority: str | None = None) -> list[Route]: ...
+    def route_version(self, route_id: str) -> int: ...
+
+
+class FleetRepository(FleetReader, Protocol):
+    def truck_version(self, truck_id: str) -> int: ...
+    def put_trucks(self, trucks: Iterable[Truck | TruckRecord]): ...
+    def update_trucks(self, changes: dict[str, dict],
+                      derive: Callable[[TruckRecord], dict] | None = None) -> tuple[int, list[TruckRecord]]: ...
+    def put_routes(self, routes: Iterable[Route]): ...
+    def data_version(self) -> tuple[int, int]: ...
+    def versioned_routes(self) -> list[tuple[int, Route]]: ...
+
+
+def _upsert(table: str, columns: tuple) -> str:
+    # Insert, or update in place; the version is only bumped when some column really changed
+    changed = " OR ".join(f"{c} IS NOT excluded.{c}" for c in columns[1:])
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns[1:])}, "
+        f"version = version + 1 WHERE {changed}"
+    )
+
+
+def read_records(path: str | Path) -> list[dict]:
+    # Rows from a .csv file (header row, empty cells treated as missing) or a JSON array of objects
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="") as f:
+            return [{k: v for k, v in row.items() if v != ""} for row in csv.DictReader(f)]
+    with path.open() as f:
+        return json.load(f)
+
+
+class SQLiteFleetStore:
+    def __init__(self, path: str = ":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock, self._db:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+            self._db.executescript(SCHEMA)
+            # Stores created before range_miles and charge curves were persisted
+            truck_columns = [row[1] for row in self._db.execute("PRAGMA table_info(trucks)")]
+            if "range_miles" not in truck_columns:
+                self._db.execute("ALTER TABLE trucks ADD COLUMN range_miles REAL")
+            if "charge_curve" not in truck_columns:
+                self._db.execute("ALTER TABLE trucks ADD COLUMN charge_curve TEXT")
+
+    def data_version(self) -> tuple[int, int]:
+        # (trucks, routes): the sum of the row versions in each table. Versions only go up and
+        # a new row adds its own, so either number moves exactly when something was written.
+        with self._lock:
+            row = self._db.execute(
+                "SELECT (SELECT coalesce(sum(version), 0) FROM trucks), (SELECT coalesce(sum(version), 0) FROM routes)"
+            ).fetchone()
+        return row[0], row[1]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM trucks) AND NOT EXISTS (SELECT 1 FROM routes)"
+            ).fetchone()
+        return bool(row[0])
+
+    # Trucks
+
+    def get_truck(self, truck_id: str) -> TruckRecord | None:
+        trucks = self._trucks_where("id = ?", (truck_id,))
+        return trucks[0] if trucks else None
+
+    def get_trucks(self, truck_ids: Iterable[str]) -> list[TruckRecord]:
+        # Any number of ids in one query, bound as a single JSON array
+        return self._trucks_where("id IN (SELECT value FROM json_each(?))", (json.dumps(list(truck_ids)),))
+
+    def trucks(self, status: str | None = None) -> list[TruckRecord]:
+        if status is None:
+            return self._trucks_where("1", ())
+        return self._trucks_where("status = ?", (status,))
+
+    def truck_version(self, truck_id: str) -> int:
+        return self._version("trucks", truck_id)
+
+    def put_trucks(self, trucks: Iterable[Truck | TruckRecord]):
+        rows = [
+            (*(getattr(truck, c) for c in TRUCK_COLUMNS[:-1]), curve_text(truck.charge_curve) or None)
+            for truck in trucks
+        ]
+        with self._lock, self._db:
+            self._db.executemany(_upsert("trucks", TRUCK_COLUMNS), rows)
+
+    def update_trucks(self, changes: dict[str, dict],
+                      derive: Callable[[TruckRecord], dict] | None = None) -> tuple[int, list[TruckRecord]]:
+        # Sets only the given columns of each truck, {id: {column: value}}, plus whatever derive
+        # returns for the merged truck (e.g. its range). The trucks are read and written in one
+        # BEGIN IMMEDIATE transaction, so a concurrent writer (another worker, an API edit) can
+        # neither interleave nor have its other columns overwritten. Trucks whose given columns
+        # already hold those values are left alone. Returns how many of the trucks exist and the
+        # ones that changed, as updated.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                trucks = self.get_trucks(changes)
+                changed = []
+                for truck in trucks:
+                    fields = changes[truck.id]
+                    unknown = fields.keys() - set(TRUCK_COLUMNS[1:])
+                    if unknown:
+                        raise ValueError(f"Unknown truck columns: {sorted(unknown)}")
+                    if all(getattr(truck, name) == value for name, value in fields.items()):
+                        continue
+                    for name, value in fields.items():
+                        setattr(truck, name, value)
+                    if derive is not None:
+                        derived = derive(truck)
+                        for name, value in derived.items():
+                            setattr(truck, name, value)
+                        fields = {**fields, **derived}
+                    values = [curve_text(v) or None if name == "charge_curve" else v for name, v in fields.items()]
+                    self._db.execute(
+                        f"UPDATE trucks SET {', '.join(f'{name} = ?' for name in fields)}, version = version + 1 WHERE id = ?",
+                        (*values, truck.id),
+                    )
+                    changed.append(truck)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return len(trucks), changed
+
+    def _trucks_where(self, clause: str, params: tuple) -> list[TruckRecord]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(TRUCK_COLUMNS)} FROM trucks WHERE {clause} ORDER BY id", params
+            ).fetchall()
+        return [TruckRecord(*row[:-1], parse_curve(row[-1])) for row in rows]
+
+    # Routes
+
+    def get_route(self, route_id: str) -> Route | None:
+        routes = self._routes_where("id = ?", (route_id,))
+        return routes[0] if routes else None
+
+    def routes(self, priority: str | None = None) -> list[Route]:
+        if priority is None:
+            return self._routes_where("1", ())
+        return self._routes_where("priority = ?", (priority,))
+
+    def route_version(self, route_id: str) -> int:
+        return self._version("routes", route_id)
+
+    def versioned_routes(self) -> list[tuple[int, Route]]:
+        # Every route with its version, read by the same SELECT as the route's columns, so a
+        # version always tags the data it was read with
+        return self._routes_where("1", (), with_versions=True)
+
+    def put_routes(self, routes: Iterable[Route]):
+        with self._lock, self._db:
+            for route in routes:
+                # Stops, stations and elevation points are rewritten wholesale, so compare first to keep the version
+                if self.get_route(route.id) == route:
+                    continue
+                self._db.execute(
+                    f"INSERT INTO routes ({', '.join(ROUTE_COLUMNS)}) VALUES ({', '.join('?' * len(ROUTE_COLUMNS))}) "
+                    f"ON CONFLICT (id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in ROUTE_COLUMNS[1:])}, "
+                    f"version = version + 1",
+                    tuple(getattr(route, c) for c in ROUTE_COLUMNS),
+                )
+                self._db.execute("DELETE FROM stops WHERE route_id = ?", (route.id,))
+                self._db.execute("DELETE FROM charging_stations WHERE route_id = ?", (route.id,))
+                self._db.execute("DELETE FROM elevation_points WHERE route_id = ?", (route.id,))
+                self._db.executemany(
+                    f"INSERT INTO stops VALUES (?, ?, {', '.join('?' * len(STOP_COLUMNS))})",
+                    [(route.id, seq, *(getattr(s, c) for c in STOP_COLUMNS)) for seq, s in enumerate(route.stops)],
+                )
+                self._db.executemany(
+                    f"INSERT INTO charging_stations VALUES (?, ?, {', '.join('?' * len(STATION_COLUMNS))})",
+                    [(route.id, seq, *(getattr(cs, c) for c in STATION_COLUMNS))
+                     for seq, cs in enumerate(route.charging_stations)],
+                )
+                self._db.executemany(
+                    f"INSERT INTO elevation_points VALUES (?, ?, {', '.join('?' * len(ELEVATION_COLUMNS))})",
+                    [(route.id, seq, *(getattr(p, c) for c in ELEVATION_COLUMNS))
+                     for seq, p in enumerate(route.elevation_profile)],
+                )
+
+    def _routes_where(self, clause: str, params: tuple, with_versions: bool = False) -> list:
+        # Four queries however many routes match: the route rows, then all their stops, stations and
+        # elevation points. They share one read transaction, so another process's write can't land
+        # between them.
+        select_children = "SELECT route_id, {} FROM {} WHERE route_id IN (SELECT id FROM routes WHERE {}) ORDER BY route_id, seq"
+        with self._lock, self._read_transaction():
+            rows = self._db.execute(
+                f"SELECT version, {', '.join(ROUTE_COLUMNS)} FROM routes WHERE {clause} ORDER BY id", params
+            ).fetchall()
+            stop_rows = self._db.execute(select_children.format(', '.join(STOP_COLUMNS), "stops", clause), params).fetchall()
+            station_rows = self._db.execute(
+                select_children.format(', '.join(STATION_COLUMNS), "charging_stations", clause), params
+            ).fetchall()
+            elevation_rows = self._db.execute(
+                select_children.format(', '.join(ELEVATION_COLUMNS), "elevation_points", clause), params
+            ).fetchall()
+
+        stops = defaultdict(list)
+        for route_id, *values in stop_rows:
+            stops[route_id].append(Stop(**dict(zip(STOP_COLUMNS, values))))
+        stations = defaultdict(list)
+        for route_id, *values in station_rows:
+            stations[route_id].append(ChargingStation(**dict(zip(STATION_COLUMNS, values))))
+        profiles = defaultdict(list)
+        for route_id, *values in elevation_rows:
+            profiles[route_id].append(ElevationPoint(**dict(zip(ELEVATION_COLUMNS, values))))
+        routes = [
+            Route(**dict(zip(ROUTE_COLUMNS, row)), stops=stops[row[0]], charging_stations=stations[row[0]],
+                  elevation_profile=profiles[row[0]])
+            for _, *row in rows
+        ]
+        return list(zip((row[0] for row in rows), routes)) if with_versions else routes
+
+    @contextmanager
+    def _read_transaction(self):
+        # Inside a write (put_routes reads as it goes) the write's transaction already isolates us
+        if self._db.in_transaction:
+            yield
+            return
+        self._db.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self._db.commit()
+
+    def _version(self, table: str, entity_id: str) -> int:
+        with self._lock:
+            row = self._db.execute(f"SELECT version FROM {table} WHERE id = ?", (entity_id,)).fetchone()
+        return row[0] if row else 0
+
+    # Bulk import from CSV/JSON files
+
+    def import_trucks(self, path: str | Path) -> int:
+        # A CSV charge_curve cell holds the curve as JSON, e.g. [[0,350],[80,350],[100,60]]
+        records = read_records(path)
+        for record in records:
+            if isinstance(record.get("charge_curve"), str):
+                record["charge_curve"] = json.loads(record["charge_curve"])
+        trucks = [Truck(**record) for record in records]
+        self.put_trucks(trucks)
+        return len(trucks)
+
+    def import_routes(self, path: str | Path) -> int:
+        # Routes given without stops/charging_stations/elevation_profile (always the case for CSV) keep the stored ones
+        routes = []
+        for record in read_records(path):
+            current = self.get_route(record["id"])
+            if current is not None:
+                record = {"stops": current.stops, "charging_stations": current.charging_stations,
+                          "elevation_profile": current.elevation_profile, **record}
+            routes.append(Route(**record))
+        self.put_routes(routes)
+        return len(routes)
+
+    def import_charging_stations(self, path: str | Path) -> int:
+        # One station per record with a route_id column; replaces the stations of every route listed
+        stations = defaultdict(list)
+        for record in read_records(path):
+            route_id = record.pop("route_id")
+            stations[route_id].append(ChargingStation(**record))
+
+        routes = []
+        for route_id, route_stations in stations.items():
+            route = self.get_route(route_id)
+            if route is None:
+                raise ValueError(f"Unknown route {route_id!r} in {path}")
+            routes.append(route.model_copy(update={"charging_stations": route_stations}))
+        self.put_routes(routes)
+        return sum(len(s) for s in stations.values())
+
+    def import_elevation_profiles(self, path: str | Path) -> int:
+        # One elevation point per record with a route_id column; replaces the profile of every route listed
+        points = defaultdict(list)
+        for record in read_records(path):
+            route_id = record.pop("route_id")
+            points[route_id].append(ElevationPoint(**record))
+
+        routes = []
+        for route_id, route_points in points.items():
+            route = self.get_route(route_id)
+            if route is None:
+                raise ValueError(f"Unknown route {route_id!r} in {path}")
+            route_points.sort(key=lambda p: p.mile_marker)
+            # Validated, so repeated mile markers are rejected here rather than at simulation time
+            routes.append(Route.model_validate({**route.model_dump(), "elevation_profile": route_points}))
+        self.put_routes(routes)
+        return len(routes)
+
+
+if __name__ == "__main__":
+    # python store.py trucks|routes|charging_stations|elevation_profiles FILE [--db fleet.db]
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Bulk import into the fleet store")
+    parser.add_argument("kind", choices=["trucks", "routes", "charging_stations", "elevation_profiles"])
+    parser.add_argument("file")
+    parser.add_argument("--db", default=os.environ.get("FLEET_DB_PATH", "fleet.db"))
+    args = parser.parse_args()
+
+    store = SQLiteFleetStore(args.db)
+    count = getattr(store, f"import_{args.kind}")(args.file)
+    print(f"Imported {count} {args.kind.replace('_', ' ')} into {args.db}")
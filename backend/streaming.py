@@ -0,0 +1,40 @@
+import json
+from typing import Callable, Iterator
+from models import Truck
+from records import FeasibilityRecord, encode_json
+from simulation import result_sort_key
+
+# Streaming feasibility: the fleet is evaluated in chunks and every result is written out as
+# soon as its chunk is done, so the first rows arrive after one chunk rather than the whole
+# fleet. What a stream holds is one chunk of results plus a small sort key per truck, kept
+# for the closing message, which carries the dispatch order (the order sort_results would
+# have returned). Streams read the feasibility cache but don't fill it, so they don't grow
+# it either.
+#
+# NDJSON: one object per line, {"result": {...}} per truck, then {"order": [truck ids]}.
+# SSE:    "event: result" / "event: order" with the same payloads as data.
+
+STREAM_CHUNK_SIZE = 256
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _encode(kind: str, payload: str, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {kind}\ndata: {payload}\n\n"
+    return f'{{"{kind}": {payload}}}\n'
+
+
+def stream_results(
+    trucks: list[Truck],
+    evaluate: Callable[[list[Truck]], list[FeasibilityRecord]],
+    fmt: str,
+) -> Iterator[str]:
+    # A plain generator: Starlette iterates it on a worker thread, off the event loop
+    sort_keys = []
+    for start in range(0, len(trucks), STREAM_CHUNK_SIZE):
+        for result in evaluate(trucks[start:start + STREAM_CHUNK_SIZE]):
+            sort_keys.append((result_sort_key(result), len(sort_keys), result.truck_id))
+            yield _encode("result", encode_json(result).decode(), fmt)
+
+    sort_keys.sort()
+    yield _encode("order", json.dumps([truck_id for _, _, truck_id in sort_keys]), fmt)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from models import TruckTelemetry
+from simulation import truck_range_miles
+from store import FleetRepository
+
+# Telemetry ingestion. Reports are coalesced per truck in memory (the latest value of each
+# field wins) and written to the store in one transaction per flush, so the write rate is
+# bounded by the flush interval rather than by how often trucks report.
+#
+# A flush only touches the trucks that actually changed: their range is recomputed and they
+# are the only ones whose feasibility cache keys (truck state) move, so the next feasibility
+# request re-simulates just those trucks.
+
+NULLABLE_FIELDS = {"charge_eta_mins"}
+
+
+class TelemetryBuffer:
+    def __init__(self, store: FleetRepository, flush_interval: float = 0.25, max_pending: int = 50_000):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[str, dict] = {}
+        self._full = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.unchanged = 0
+        self.unknown = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, updates: list[TruckTelemetry]) -> int:
+        for update in updates:
+            fields = {}
+            for name in update.model_fields_set:
+                value = getattr(update, name)
+                if name != "id" and (value is not None or name in NULLABLE_FIELDS):
+                    fields[name] = value
+            pending = self._pending.get(update.id)
+            if pending is None:
+                self._pending[update.id] = fields
+            else:
+                pending.update(fields)
+                self.coalesced += 1
+        self.received += len(updates)
+        if len(self._pending) >= self.max_pending:
+            self._full.set()
+        return len(updates)
+
+    async def run(self):
+        # Flushes every flush_interval, or straight away once max_pending trucks are waiting,
+        # until close(); the last flush writes whatever was still buffered
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+        await self.flush()
+
+    def close(self):
+        self._closed = True
+        self._full.set()
+
+    async def flush(self) -> set[str]:
+        self._full.clear()
+        if not self._pending:
+            return set()
+        # Swap the buffer on the event loop so submissions keep landing in a fresh one while
+        # the write runs on a worker thread
+        pending, self._pending = self._pending, {}
+        return await asyncio.to_thread(self._write, pending)
+
+    def _write(self, pending: dict[str, dict]) -> set[str]:
+        # Only the reported columns and the range are written, read and updated in one store
+        # transaction, so a concurrent edit to other fields of the truck isn't reverted
+        start = time.perf_counter()
+        found, changed = self.store.update_trucks(pending, lambda truck: {"range_miles": truck_range_miles(truck)})
+
+        self.flushes += 1
+        self.written += len(changed)
+        self.unchanged += found - len(changed)
+        self.unknown += len(pending) - found
+        self.last_flush_ms = (time.perf_counter() - start) * 1e3
+        return {truck.id for truck in changed}
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "written": self.written,
+            "unchanged": self.unchanged,
+            "unknown": self.unknown,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
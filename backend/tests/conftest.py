@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend modules are imported flat (as uvicorn main:app does), and importing main must
+# not touch fleet.db
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("FLEET_DB_PATH", ":memory:")
+os.environ.setdefault("METRICS_ENABLED", "0")
+
+
+@pytest.fixture
+def client():
+    # The app on its in-memory store, seeded with the mock fleet. Tests that write to the store
+    # put back what they changed.
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
@@ -0,0 +1,62 @@
+# The batch engine must give exactly what the scalar reference gives, for every field of every
+# truck's result, leg details included
+from pathlib import Path
+
+import orjson
+import pytest
+from batch_simulation import evaluate_fleet
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes, synthetic_route, synthetic_delivery_route
+from main import MOCK_TRUCKS, MOCK_ROUTES
+from records import encode_json
+from simulation import CompiledRoute, evaluate_truck
+from store import SQLiteFleetStore
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+SYNTHETIC_TRUCKS = synthetic_trucks(300, seed=7)
+SYNTHETIC_ROUTES = synthetic_routes(12, seed=7) + [synthetic_route(40, seed=7), synthetic_delivery_route(60, seed=7)]
+
+
+def as_json(result) -> dict:
+    return orjson.loads(encode_json(result))
+
+
+def assert_parity(route, trucks):
+    plan = CompiledRoute(route)
+    batch = evaluate_fleet(route, plan, trucks)
+    assert [result.truck_id for result in batch] == [truck.id for truck in trucks]
+    for truck, result in zip(trucks, batch):
+        expected = as_json(evaluate_truck(route, plan, truck))
+        actual = as_json(result)
+        for name, value in expected.items():
+            assert actual[name] == value, (route.id, truck.id, name)
+
+
+@pytest.mark.parametrize("route", MOCK_ROUTES, ids=lambda route: route.id)
+def test_mock_fleet(route):
+    assert_parity(route, MOCK_TRUCKS)
+
+
+@pytest.mark.parametrize("route", SYNTHETIC_ROUTES, ids=lambda route: route.id)
+def test_synthetic_fleet(route):
+    assert_parity(route, SYNTHETIC_TRUCKS)
+
+
+def test_summary_detail_matches_full():
+    route = SYNTHETIC_ROUTES[0]
+    plan = CompiledRoute(route)
+    full = [as_json(result) for result in evaluate_fleet(route, plan, SYNTHETIC_TRUCKS)]
+    summary = [as_json(result) for result in evaluate_fleet(route, plan, SYNTHETIC_TRUCKS, detail="summary")]
+    for f, s in zip(full, summary):
+        assert s["leg_details"] == []
+        assert {k: v for k, v in f.items() if k != "leg_details"} == {k: v for k, v in s.items() if k != "leg_details"}
+
+
+def test_imported_elevation_profile():
+    # The sample import file, loaded the way `python store.py elevation_profiles FILE` does
+    store = SQLiteFleetStore()
+    store.put_routes(MOCK_ROUTES)
+    assert store.import_elevation_profiles(EXAMPLES / "elevation_profiles.csv") == 1
+    route = store.get_route("R-08")
+    assert route.elevation_profile
+    assert_parity(route, MOCK_TRUCKS + SYNTHETIC_TRUCKS)
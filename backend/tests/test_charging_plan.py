@@ -0,0 +1,80 @@
+# strategy=optimal: never worse than greedy, never below the reserve, and a bounded front
+import numpy as np
+import pytest
+from batch_simulation import evaluate_fleet
+from benchmarks.charging_strategy import loaded_trucks, sample_trucks
+from benchmarks.synthetic import synthetic_route, synthetic_delivery_route
+from charging_plan import OPTIMAL_MAX_STATES, SOC_GRID, _pareto, can_improve, optimal_charge_targets, optimal_result
+from simulation import MIN_BUFFER_SOC, CompiledRoute, simulate_route
+
+CURVE = ((0.0, 350.0), (60.0, 200.0), (85.0, 90.0), (100.0, 25.0))
+TRUCKS = sample_trucks(12, seed=5) + loaded_trucks(12, seed=5)
+TRUCKS += [truck.model_copy(update={"id": truck.id + "-C", "charge_curve": CURVE}) for truck in TRUCKS[::3]]
+ROUTES = [synthetic_route(10, seed=5), synthetic_route(40, seed=6), synthetic_delivery_route(40, seed=5)]
+
+
+def dominated(soc, dwell, socs, dwells):
+    return bool(np.any((socs >= soc) & (dwells <= dwell) & ((socs > soc) | (dwells < dwell))))
+
+
+@pytest.mark.parametrize("route", ROUTES, ids=lambda route: route.id)
+def test_optimal_is_feasible_and_never_worse(route):
+    plan = CompiledRoute(route)
+    greedy = evaluate_fleet(route, plan, TRUCKS, "summary")
+    improved = 0
+    for truck, before in zip(TRUCKS, greedy):
+        after = optimal_result(route, plan, truck, before, "full")
+        assert after.estimated_trip_time_mins <= before.estimated_trip_time_mins
+        if after is before:
+            continue
+        improved += 1
+        assert can_improve(before) and after.status != "red"
+        # Replayed, the plan never takes the battery under the reserve
+        capacity = truck.capacity_kwh * (truck.soh / 100)
+        targets = optimal_charge_targets(route, plan, truck.load_lbs, truck.soc / 100, capacity, truck.charge_curve)
+        sim = simulate_route(route, plan, truck.load_lbs, truck.soc / 100, capacity, charge_targets=targets,
+                             charge_curve=truck.charge_curve)
+        assert sim['feasible']
+        assert min(leg.end_soc for leg in sim['leg_details']) >= MIN_BUFFER_SOC * 100 - 0.01
+        assert [leg["end_soc"] for leg in after.leg_details] == [leg.end_soc for leg in sim['leg_details']]
+    assert improved
+
+
+def test_pareto_front_below_the_cap_is_exact():
+    rng = np.random.default_rng(1)
+    socs = rng.uniform(0.15, 0.9, 40)
+    dwell = rng.integers(0, 30, 40).astype(float)
+    front = _pareto(socs, dwell)
+    expected = {k for k in range(40) if not dominated(socs[k], dwell[k], socs, dwell)}
+    # Exact duplicates keep one copy
+    assert {(socs[k], dwell[k]) for k in front} == {(socs[k], dwell[k]) for k in expected}
+    assert len(front) == len({(socs[k], dwell[k]) for k in front})
+
+
+def test_pareto_front_is_capped_by_soc_cell():
+    # A front far wider than the cap: SoC rises with dwell, every state is on it
+    dwell = np.arange(1000, dtype=float)
+    socs = 0.15 + dwell / 1000 * 0.75
+    front = _pareto(socs, dwell)
+    assert len(front) <= OPTIMAL_MAX_STATES
+    cells = np.floor(socs / SOC_GRID)
+    assert len(set(cells[front])) == len(front)
+    # The quickest state of every cell survives, and the quickest state overall with it
+    for cell in set(cells.tolist()):
+        assert np.flatnonzero(cells == cell)[0] in front
+    assert 0 in front
+
+
+def test_optimal_budget(client, monkeypatch):
+    import main
+    nodes = len(main.ROUTES.plan("R-01").nodes)
+    available = sum(truck.status in ("ready", "charging") for truck in main.FLEET.trucks())
+    monkeypatch.setattr(main, "OPTIMAL_MAX_TRUCK_NODES", available * nodes - 1)
+    response = client.get("/routes/R-01/feasibility", params={"strategy": "optimal"})
+    assert response.status_code == 400
+    assert str(available * nodes) in response.json()["detail"]
+    # Greedy is not budgeted
+    assert client.get("/routes/R-01/feasibility").status_code == 200
+
+    monkeypatch.setattr(main, "OPTIMAL_MAX_TRUCK_NODES", available * nodes)
+    assert client.get("/routes/R-01/feasibility", params={"strategy": "optimal"}).status_code == 200
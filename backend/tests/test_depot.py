@@ -0,0 +1,40 @@
+import pytest
+from depot import plan_depot
+from main import MOCK_TRUCKS, MOCK_ROUTES
+from models import DepotConfig, DepotJob
+from simulation import CompiledRoute, evaluate_truck, DEPOT_CHARGER_KW
+
+ROUTES = {route.id: route for route in MOCK_ROUTES}
+PLANS = {route.id: CompiledRoute(route) for route in MOCK_ROUTES}
+TRUCKS = {truck.id: truck for truck in MOCK_TRUCKS}
+CURVE = ((0.0, 350.0), (60.0, 200.0), (85.0, 90.0), (100.0, 25.0))
+
+
+def schedule(jobs, trucks=TRUCKS, depot=DepotConfig(chargers=1)):
+    charging = [truck for truck in trucks.values() if truck.status == "charging"]
+    return plan_depot(jobs, trucks, ROUTES, PLANS, charging, depot)
+
+
+def test_charging_truck_with_infeasible_job_keeps_its_plug():
+    # T-03 is on the only plug for 47 more minutes and can't run R-10
+    assert evaluate_truck(ROUTES["R-10"], PLANS["R-10"], TRUCKS["T-03"]).status == "red"
+    trucks = {truck_id: TRUCKS[truck_id] for truck_id in ("T-03", "T-02")}
+    result = schedule([DepotJob(truck_id="T-03", route_id="R-10"), DepotJob(truck_id="T-02", route_id="R-03")], trucks)
+
+    assert result.infeasible_truck_ids == ["T-03"]
+    slots = {slot.truck_id: slot for slot in result.slots}
+    assert (slots["T-03"].route_id, slots["T-03"].ready_mins) == (None, 47)
+    assert slots["T-02"].energy_kwh > 0 and slots["T-02"].start_mins == 47
+
+
+@pytest.mark.parametrize("route_id", ["R-03", "R-04", "R-07"])
+def test_curve_session_takes_the_curve_time(route_id):
+    # With a plug to itself, a ready truck is charged exactly when its feasibility result says
+    truck = TRUCKS["T-02"].model_copy(update={"charge_curve": CURVE})
+    expected = evaluate_truck(ROUTES[route_id], PLANS[route_id], truck)
+    assert expected.precharge_mins
+    result = schedule([DepotJob(truck_id="T-02", route_id=route_id)], {"T-02": truck},
+                      DepotConfig(chargers=1, charger_kw=DEPOT_CHARGER_KW))
+    [slot] = result.slots
+    assert slot.energy_kwh == expected.precharge_kwh
+    assert slot.ready_mins == slot.isolated_ready_mins == expected.precharge_mins
@@ -0,0 +1,77 @@
+# The sparse assignment against a brute-force optimum over every pair, pruned ones included
+import numpy as np
+import pytest
+from batch_simulation import fleet_columns, solve_fleet, STATUS_RED
+from dispatch import assign, dispatch_candidates
+from main import MOCK_TRUCKS, MOCK_ROUTES
+from simulation import ENERGY_COST_PER_KWH, CompiledRoute
+
+ROUTES = [route for route in MOCK_ROUTES if route.id in ("R-01", "R-03", "R-05", "R-07", "R-08", "R-10")]
+SMALL = [truck.model_copy(update={"id": f"S-{k}", "capacity_kwh": kwh}) for k, (truck, kwh) in
+         enumerate(zip(MOCK_TRUCKS[:2], (60.0, 90.0)))]
+TRUCKS = [truck for truck in MOCK_TRUCKS if truck.status in ("ready", "charging")][:6] + SMALL
+
+
+def pair_costs(trucks, routes, fleet, time_cost_per_min):
+    # cost[(truck row, route col)] for every non-red pair, simulated over the whole fleet
+    costs = {}
+    for c, route in enumerate(routes):
+        sim = solve_fleet(route, CompiledRoute(route), fleet)
+        for r in range(len(trucks)):
+            if sim['status'][r] == STATUS_RED:
+                continue
+            wait = np.nan_to_num(sim['precharge_mins'][r]) + fleet['charge_eta_mins'][r]
+            costs[r, c] = (sim['estimated_trip_time_mins'][r] + wait) * time_cost_per_min \
+                + sim['total_energy_kwh'][r] * ENERGY_COST_PER_KWH
+    return costs
+
+
+def brute_force(n_trucks, weights, costs):
+    # Best (weighted coverage, -weighted cost) over every matching
+    best = (0.0, 0.0)
+
+    def extend(c, used, coverage, cost):
+        nonlocal best
+        if c == len(weights):
+            best = max(best, (round(coverage, 9), -cost))
+            return
+        extend(c + 1, used, coverage, cost)
+        for r in range(n_trucks):
+            if r not in used and (r, c) in costs:
+                extend(c + 1, used | {r}, coverage + weights[c], cost + weights[c] * costs[r, c])
+
+    extend(0, frozenset(), 0.0, 0.0)
+    return best
+
+
+@pytest.mark.parametrize("urgent_weight, time_cost_per_min", [(2.0, 1.0), (1.0, 0.0), (3.0, 5.0)])
+def test_assignment_is_optimal(urgent_weight, time_cost_per_min):
+    fleet = fleet_columns(TRUCKS)
+    candidates = [dispatch_candidates(route, CompiledRoute(route), fleet) for route in ROUTES]
+    result = assign(TRUCKS, ROUTES, candidates, fleet, urgent_weight, time_cost_per_min)
+
+    costs = pair_costs(TRUCKS, ROUTES, fleet, time_cost_per_min)
+    weights = [urgent_weight if route.priority == "urgent" else 1.0 for route in ROUTES]
+    row = {truck.id: r for r, truck in enumerate(TRUCKS)}
+    col = {route.id: c for c, route in enumerate(ROUTES)}
+    pairs = [(row[a.truck_id], col[a.route_id]) for a in result.assignments]
+    assert all(pair in costs for pair in pairs)
+    coverage = sum(weights[c] for _, c in pairs)
+    cost = sum(weights[c] * costs[r, c] for r, c in pairs)
+    best_coverage, best_cost = brute_force(len(TRUCKS), weights, costs)
+    assert coverage == pytest.approx(best_coverage)
+    assert cost == pytest.approx(-best_cost)
+
+
+def test_pruned_pairs_are_red():
+    fleet = fleet_columns(TRUCKS)
+    pruned = 0
+    for route in ROUTES:
+        plan = CompiledRoute(route)
+        kept = set(dispatch_candidates(route, plan, fleet)["rows"].tolist())
+        sim = solve_fleet(route, plan, fleet)
+        # Every truck left out is red on its own simulation, so no optimum can use it
+        left_out = [r for r in range(len(TRUCKS)) if r not in kept]
+        assert all(sim['status'][r] == STATUS_RED for r in left_out)
+        pruned += dispatch_candidates(route, plan, fleet)["pruned"]
+    assert pruned
@@ -0,0 +1,51 @@
+from dataclasses import replace
+import pytest
+import main
+
+URL = "/routes/R-02/feasibility"
+
+
+def cache_counts():
+    stats = main.FEASIBILITY_CACHE.stats()
+    return stats["hits"], stats["misses"]
+
+
+def test_etag_is_stable_and_per_representation(client):
+    first, second = client.get(URL), client.get(URL)
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.content == second.content
+    assert client.get(URL, params={"detail": "summary"}).headers["etag"] != first.headers["etag"]
+
+
+@pytest.mark.parametrize("header", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_if_none_match_gets_304(client, header):
+    etag = client.get(URL).headers["etag"]
+    response = client.get(URL, headers={"If-None-Match": header.format(etag=etag)})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_stale_etag_gets_the_body(client):
+    assert client.get(URL, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_one_truck_update_resimulates_one_truck(client):
+    before = client.get(URL)
+    hits, misses = cache_counts()
+    assert client.get(URL).status_code == 200
+    n = len(before.json())
+    assert cache_counts() == (hits + n, misses)
+
+    truck = main.STORE.get_truck("T-01")
+    main.STORE.put_trucks([replace(truck, soc=truck.soc - 10)])
+    main.FLEET.publish()
+    try:
+        hits, misses = cache_counts()
+        after = client.get(URL, headers={"If-None-Match": before.headers["etag"]})
+        assert after.status_code == 200 and after.headers["etag"] != before.headers["etag"]
+        assert cache_counts() == (hits + n - 1, misses + 1)
+        assert next(r for r in after.json() if r["truck_id"] == "T-01") != \
+            next(r for r in before.json() if r["truck_id"] == "T-01")
+    finally:
+        main.STORE.put_trucks([truck])
+        main.FLEET.publish()
@@ -0,0 +1,17 @@
+import json
+from main import FEED
+
+
+def test_subscribe_gets_the_route_in_dispatch_order(client):
+    with client.websocket_connect("/ws/fleet") as socket:
+        snapshot = json.loads(socket.receive_text())
+        assert snapshot["type"] == "snapshot" and snapshot["routes"]
+        socket.send_text(json.dumps({"subscribe": ["R-01", "R-404"]}))
+        feasibility = json.loads(socket.receive_text())
+        error = json.loads(socket.receive_text())
+
+    assert (feasibility["type"], feasibility["route_id"], feasibility["version"]) == ("feasibility", "R-01", snapshot["version"])
+    expected = client.get("/routes/R-01/feasibility", params={"detail": "summary"}).json()
+    assert feasibility["results"] == expected
+    assert error == {"type": "error", "detail": "Route not found: R-404"}
+    assert FEED.stats()["clients"] == 0
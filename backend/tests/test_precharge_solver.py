@@ -0,0 +1,81 @@
+# The direct minimum departure SoC solver must land exactly where the bisection search does,
+# so pre-charge energy and minutes are the same whichever one resolved a truck
+import numpy as np
+import pytest
+from batch_simulation import (
+    simulate_fleet, fleet_columns, departure_profile, min_departure_soc, bisect_min_soc, evaluate_fleet,
+)
+from benchmarks.synthetic import synthetic_trucks, synthetic_routes
+from main import MOCK_ROUTES
+from simulation import CompiledRoute, evaluate_truck
+
+# Routes where part of the seeded fleet needs a depot pre-charge; on most synthetic routes the
+# trucks either make it as they are or not at all
+SEEDED_ROUTES = synthetic_routes(30, seed=3)
+ROUTES = (
+    [route for route in MOCK_ROUTES if route.id in ("R-01", "R-02", "R-03", "R-04", "R-07")]
+    + [SEEDED_ROUTES[k] for k in (5, 8, 20, 21)]
+)
+
+
+def available(trucks):
+    return [t for t in trucks if t.status in ("ready", "charging")]
+
+
+def with_boundaries(route, plan, fleet) -> dict:
+    # The fleet plus, for every truck that needs a pre-charge, copies of it departing right at,
+    # just below and just above its minimum departure SoC
+    sim = simulate_fleet(route, plan, fleet['loads'], fleet['socs'], fleet['caps'])
+    retry = np.flatnonzero(~sim['feasible'] & sim['valid'])
+    fixable, best = min_departure_soc(departure_profile(plan, sim, retry), fleet['socs'][retry])
+    rows, best = retry[fixable], best[fixable]
+    boundary = [best, np.nextafter(best, 0.0), np.nextafter(best, 1.0), best - 0.0005, np.minimum(best + 0.0005, 1.0)]
+    take = np.tile(rows, len(boundary))
+    return {
+        "loads": np.concatenate([fleet['loads'], fleet['loads'][take]]),
+        "socs": np.concatenate([fleet['socs'], *boundary]),
+        "caps": np.concatenate([fleet['caps'], fleet['caps'][take]]),
+    }
+
+
+@pytest.mark.parametrize("route", ROUTES, ids=lambda route: route.id)
+def test_direct_solver_matches_bisection(route):
+    plan = CompiledRoute(route)
+    fleet = with_boundaries(route, plan, fleet_columns(available(synthetic_trucks(400, seed=11))))
+    loads, socs, caps = fleet['loads'], fleet['socs'], fleet['caps']
+    sim = simulate_fleet(route, plan, loads, socs, caps)
+    retry = np.flatnonzero(~sim['feasible'] & sim['valid'])
+
+    fixable, best = min_departure_soc(departure_profile(plan, sim, retry), socs[retry])
+    found, bisected = bisect_min_soc(route, plan, loads[retry], socs[retry], caps[retry])
+    np.testing.assert_array_equal(np.flatnonzero(fixable), found)
+    np.testing.assert_array_equal(best[fixable], bisected)
+    # Departing at the solved SoC really is feasible
+    assert simulate_fleet(route, plan, loads[retry[found]], bisected, caps[retry[found]])['feasible'].all()
+
+
+@pytest.mark.parametrize("route", ROUTES, ids=lambda route: route.id)
+def test_precharge_matches_scalar(route):
+    # evaluate_truck still bisects, so its pre-charge numbers are the reference. Trucks whose
+    # charge in progress already covers the trip need no pre-charge on either side.
+    plan = CompiledRoute(route)
+    trucks = available(synthetic_trucks(400, seed=11))
+    charging = [t.model_copy(update={"id": t.id + "-c", "status": "charging", "charge_eta_mins": eta})
+                for t, eta in zip(trucks, [0, 5, 30, 120, 600] * len(trucks))]
+    fleet = fleet_columns(trucks)
+    sim = simulate_fleet(route, plan, fleet['loads'], fleet['socs'], fleet['caps'])
+    retry = np.flatnonzero(~sim['feasible'] & sim['valid'])
+    fixable, best = min_departure_soc(departure_profile(plan, sim, retry), fleet['socs'][retry])
+    # Trucks reporting their exact minimum departure SoC (give or take the % conversion)
+    boundary = [trucks[r].model_copy(update={"id": trucks[r].id + "-b", "soc": soc * 100})
+                for r, soc in zip(retry[fixable].tolist(), best[fixable].tolist())]
+    trucks = trucks + charging + boundary
+
+    checked = 0
+    for truck, result in zip(trucks, evaluate_fleet(route, plan, trucks, detail="summary")):
+        expected = evaluate_truck(route, plan, truck)
+        assert result.feasible_after_precharge == expected.feasible_after_precharge, truck.id
+        assert result.precharge_kwh == expected.precharge_kwh, truck.id
+        assert result.precharge_mins == expected.precharge_mins, truck.id
+        checked += expected.precharge_kwh is not None
+    assert checked
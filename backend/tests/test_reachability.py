@@ -0,0 +1,18 @@
+# Reachability queries only list pairs that can run unless red is asked for
+def test_red_trucks_are_not_reachable(client):
+    # Every available mock truck is red on R-10
+    everything = client.get("/routes/R-10/reachable", params={"include_infeasible": True}).json()
+    assert everything["total"] > 0
+    assert {result["status"] for result in everything["results"]} == {"red"}
+
+    assert client.get("/routes/R-10/reachable").json()["total"] == 0
+    assert client.get("/routes/R-10/reachable", params={"min_arrival_soc": 15}).json()["total"] == 0
+    assert client.get("/routes/R-10/reachable", params={"status": "red"}).json()["total"] == everything["total"]
+
+
+def test_red_routes_are_not_reachable(client):
+    everything = client.get("/trucks/T-01/reachable", params={"include_infeasible": True}).json()
+    reachable = client.get("/trucks/T-01/reachable").json()
+    assert "R-10" in {result["route_id"] for result in everything["results"]}
+    assert reachable["results"] == [result for result in everything["results"] if result["status"] != "red"]
+    assert reachable["total"] < everything["total"]
@@ -0,0 +1,36 @@
+from main import MOCK_ROUTES
+from route_registry import RouteRegistry
+
+
+class Reader:
+    # Minimal FleetReader over one route at a fixed version
+    def __init__(self, route, version):
+        self.route = route
+        self.version = version
+
+    def route_version(self, route_id):
+        return self.version
+
+    def get_route(self, route_id):
+        return self.route
+
+
+def test_plan_follows_the_given_snapshot():
+    route = MOCK_ROUTES[0]
+    old, new = Reader(route, 1), Reader(route.model_copy(update={"priority": "urgent"}), 2)
+    routes = RouteRegistry(new)
+
+    latest = routes.plan(route.id)
+    stale = routes.plan(route.id, old)
+    assert (latest.version, stale.version) == (2, 1)
+    # The older snapshot gets its own plan; the cached one is left alone
+    assert routes.plan(route.id, new) is latest and latest.version == 2
+
+
+def test_plan_rebuilds_when_geometry_changes():
+    route = MOCK_ROUTES[0]
+    routes = RouteRegistry(Reader(route, 1))
+    plan = routes.plan(route.id)
+    longer = Reader(route.model_copy(update={"distance_miles": route.distance_miles + 10}), 2)
+    assert routes.plan(route.id, longer) is not plan
+    assert routes.plan(route.id, longer).version == 2
@@ -0,0 +1,47 @@
+# The orjson records and the columnar layout encode exactly what the Pydantic models would
+import pytest
+from pydantic import TypeAdapter
+from main import MOCK_ROUTES
+from models import FeasibilityColumns, FeasibilityResult, LegColumns, LegDetail, Route, Truck
+
+ROWS = TypeAdapter(list[FeasibilityResult])
+
+
+def as_columns(results: list[FeasibilityResult], detail: str) -> FeasibilityColumns:
+    fields = {
+        name: [getattr(result, name) for result in results]
+        for name in FeasibilityColumns.model_fields if name not in ("leg_details", "uncertainty")
+    }
+    if detail == "full":
+        fields["leg_details"] = [
+            LegColumns(**{name: [getattr(leg, name) for leg in result.leg_details] for name in LegDetail.model_fields})
+            for result in results
+        ]
+    return FeasibilityColumns(**fields)
+
+
+@pytest.mark.parametrize("detail", ["summary", "full"])
+@pytest.mark.parametrize("route_id", [route.id for route in MOCK_ROUTES])
+def test_rows_and_columns_match_the_models(client, route_id, detail):
+    body = client.get(f"/routes/{route_id}/feasibility", params={"detail": detail}).content
+    models = ROWS.validate_json(body)
+    assert body == ROWS.dump_json(models)
+    if detail == "summary":
+        assert all(not result.leg_details for result in models)
+
+    columnar = client.get(f"/routes/{route_id}/feasibility", params={"detail": detail, "format": "columnar"}).content
+    assert columnar == as_columns(models, detail).model_dump_json().encode()
+
+
+def test_trucks_and_routes_match_the_models(client):
+    trucks = client.get("/trucks").content
+    assert trucks == TypeAdapter(list[Truck]).dump_json(TypeAdapter(list[Truck]).validate_json(trucks))
+    routes = client.get("/routes").content
+    assert routes == TypeAdapter(list[Route]).dump_json(TypeAdapter(list[Route]).validate_json(routes))
+
+
+@pytest.mark.parametrize("route_id", ["R-01", "R-07"])
+def test_legs_match_the_models(client, route_id):
+    body = client.get(f"/routes/{route_id}/feasibility/T-02/legs").content
+    adapter = TypeAdapter(list[LegDetail])
+    assert body == adapter.dump_json(adapter.validate_json(body))
@@ -0,0 +1,83 @@
+import subprocess
+import sys
+from dataclasses import replace
+from pathlib import Path
+from main import MOCK_TRUCKS, MOCK_ROUTES
+from models import Stop
+from records import encode_json
+from store import SQLiteFleetStore
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def seeded() -> SQLiteFleetStore:
+    store = SQLiteFleetStore()
+    store.put_trucks(MOCK_TRUCKS)
+    store.put_routes(MOCK_ROUTES)
+    return store
+
+
+def test_truck_version_moves_only_when_a_column_changes():
+    store = seeded()
+    truck = store.get_truck("T-01")
+    assert store.truck_version("T-01") == 1
+    store.put_trucks([truck])
+    assert store.truck_version("T-01") == 1
+    for name, value in [("soc", 50.0), ("status", "charging"), ("charge_eta_mins", 12),
+                        ("charge_curve", ((0.0, 350.0), (100.0, 60.0)))]:
+        truck = replace(truck, **{name: value})
+        store.put_trucks([truck])
+        assert store.get_truck("T-01") == truck
+    assert store.truck_version("T-01") == 5
+    assert store.truck_version("T-02") == 1
+
+
+def test_put_routes_skips_unchanged_routes():
+    store = seeded()
+    route = store.get_route("R-01")
+    store.put_routes(MOCK_ROUTES)
+    assert store.route_version("R-01") == 1
+    moved = route.model_copy(update={"stops": [Stop(mile_marker=10.0, unload_lbs=0.0, pickup_lbs=0.0, has_charger=False)] + route.stops})
+    store.put_routes([moved])
+    assert store.route_version("R-01") == 2 and store.get_route("R-01") == moved
+    assert store.route_version("R-02") == 1
+    assert store.versioned_routes()[0] == (2, moved)
+
+
+def test_data_version_moves_on_every_write():
+    store = SQLiteFleetStore()
+    seen = [store.data_version()]
+    store.put_trucks(MOCK_TRUCKS)
+    seen.append(store.data_version())
+    store.put_routes(MOCK_ROUTES)
+    seen.append(store.data_version())
+    store.put_trucks([replace(store.get_truck("T-03"), soc=35.0)])
+    seen.append(store.data_version())
+    store.update_trucks({"T-04": {"load_lbs": 1.0}})
+    seen.append(store.data_version())
+    store.put_routes([MOCK_ROUTES[0].model_copy(update={"name": "Renamed"})])
+    seen.append(store.data_version())
+    assert len(set(seen)) == len(seen)
+    # No-op writes leave it alone
+    store.put_trucks(store.trucks())
+    store.put_routes(store.routes())
+    store.update_trucks({"T-04": {"load_lbs": 1.0}})
+    assert store.data_version() == seen[-1]
+
+
+def test_import_cli_round_trips_the_mock_data(tmp_path):
+    db = tmp_path / "fleet.db"
+    (tmp_path / "trucks.json").write_bytes(encode_json(MOCK_TRUCKS))
+    (tmp_path / "routes.json").write_bytes(encode_json(MOCK_ROUTES))
+    for kind in ("trucks", "routes"):
+        subprocess.run([sys.executable, "store.py", kind, str(tmp_path / f"{kind}.json"), "--db", str(db)],
+                       cwd=BACKEND, check=True, capture_output=True)
+
+    store = SQLiteFleetStore(str(db))
+    assert [vars(truck) for truck in store.trucks()] == [truck.model_dump() for truck in MOCK_TRUCKS]
+    assert store.routes() == sorted(MOCK_ROUTES, key=lambda route: route.id)
+    # Importing the same data again is a no-op
+    before = store.data_version()
+    subprocess.run([sys.executable, "store.py", "routes", str(tmp_path / "routes.json"), "--db", str(db)],
+                   cwd=BACKEND, check=True, capture_output=True)
+    assert store.data_version() == before
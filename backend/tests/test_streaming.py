@@ -0,0 +1,39 @@
+# Streamed feasibility carries the same results and order as the plain response
+import json
+import pytest
+import main
+from feasibility_cache import FeasibilityCache
+
+
+def parse(fmt: str, body: str) -> tuple[dict, list[str]]:
+    if fmt == "ndjson":
+        messages = [json.loads(line) for line in body.splitlines()]
+    else:
+        events = [event.split("\n") for event in body.strip().split("\n\n")]
+        messages = [{kind.removeprefix("event: "): json.loads(data.removeprefix("data: "))} for kind, data in events]
+    *rows, closing = messages
+    return {row["result"]["truck_id"]: row["result"] for row in rows}, closing["order"]
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "sse"])
+@pytest.mark.parametrize("detail", ["summary", "full"])
+@pytest.mark.parametrize("route_id", ["R-01", "R-03", "R-10"])
+def test_stream_matches_the_plain_response(client, route_id, detail, fmt):
+    plain = client.get(f"/routes/{route_id}/feasibility", params={"detail": detail}).json()
+    response = client.get(f"/routes/{route_id}/feasibility", params={"detail": detail, "stream": fmt})
+    assert response.headers["content-type"].startswith(main.STREAM_MEDIA_TYPES[fmt])
+    results, order = parse(fmt, response.text)
+    assert order == [result["truck_id"] for result in plain]
+    assert [results[truck_id] for truck_id in order] == plain
+
+
+def test_stream_does_not_fill_the_cache(client, monkeypatch):
+    monkeypatch.setattr(main, "FEASIBILITY_CACHE", FeasibilityCache(1000))
+    client.get("/routes/R-02/feasibility", params={"stream": "ndjson"})
+    assert main.FEASIBILITY_CACHE.stats()["size"] == 0
+    client.get("/routes/R-02/feasibility")
+    size = main.FEASIBILITY_CACHE.stats()["size"]
+    assert size > 0
+    # Cached results are still used by streams
+    client.get("/routes/R-02/feasibility", params={"stream": "ndjson"})
+    assert main.FEASIBILITY_CACHE.stats()["hits"] == size
@@ -0,0 +1,45 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+from main import MOCK_TRUCKS
+from store import SQLiteFleetStore
+from telemetry import TelemetryBuffer
+from models import TruckTelemetry
+from simulation import truck_range_miles
+
+
+def test_flush_writes_only_reported_fields(tmp_path):
+    path = str(tmp_path / "fleet.db")
+    store = SQLiteFleetStore(path)
+    store.put_trucks(MOCK_TRUCKS)
+    telemetry = TelemetryBuffer(store)
+    telemetry.submit([TruckTelemetry(id="T-01", soc=42.0), TruckTelemetry(id="T-99", soc=10.0)])
+
+    # Another worker edits a field the report doesn't carry before the flush
+    other = SQLiteFleetStore(path)
+    other.put_trucks([replace(other.get_truck("T-01"), capacity_kwh=900.0)])
+    version = store.truck_version("T-01")
+
+    assert asyncio.run(telemetry.flush()) == {"T-01"}
+    truck = store.get_truck("T-01")
+    assert (truck.soc, truck.capacity_kwh) == (42.0, 900.0)
+    assert truck.range_miles == truck_range_miles(truck)
+    assert store.truck_version("T-01") == version + 1
+    assert (telemetry.written, telemetry.unknown) == (1, 1)
+
+    # The same report again changes nothing
+    telemetry.submit([TruckTelemetry(id="T-01", soc=42.0)])
+    assert asyncio.run(telemetry.flush()) == set()
+    assert store.truck_version("T-01") == version + 1
+
+
+@pytest.mark.parametrize("report", [
+    {"id": "T-01", "soc": 101},
+    {"id": "T-01", "soc": -1},
+    {"id": "T-01", "soh": 150},
+    {"id": "T-01", "status": "flying"},
+    {"id": "T-01", "load_lbs": -5},
+])
+def test_bad_telemetry_is_rejected(client, report):
+    assert client.post("/telemetry", json=[report]).status_code == 422
@@ -0,0 +1,154 @@
+import math
+import numpy as np
+from models import Route, Truck, ArrivalSocDistribution
+from simulation import WEIGHT_FACTOR, MIN_BUFFER_SOC, TRUCK_TARE_LBS, CompiledRoute
+from batch_simulation import solve_fleet, fleet_columns
+from charge_curves import charge_table, curve_groups
+from matrix import get_pool, pool_workers
+from metrics import timed, count
+
+# Monte Carlo arrival SoC (?samples=N). Each sample is one trip scenario: base consumption,
+# the weight factor, the terrain multiplier and charger rates are scaled by factors drawn
+# around 1 (truncated at 3 sigma). The truck follows its nominal plan, i.e. it departs at the
+# SoC the deterministic run uses (pre-charge included) and charges to the same targets at
+# every charger, while the energy it actually uses comes from the scenario. That is the risk
+# of a truck planned to arrive at 16%: it charged for the nominal consumption. On routes with
+# an elevation profile the terrain factor scales the climb energy instead, and a charger's
+# rate factor scales the truck's whole charge curve.
+#
+# All trucks see the same scenarios (drawn from MONTE_CARLO_SEED), so results are
+# reproducible, cacheable and comparable across trucks. A batch is a (trucks x samples) array
+# per leg. Past MONTE_CARLO_MIN_CHUNK_ROWS rows it is split into truck chunks, one per pool
+# worker and at most MONTE_CARLO_CHUNK_ROWS rows each, that run on the matrix process pool;
+# 100 trucks x 10k samples fans out over every worker.
+
+PARAMETER_SPREAD = {            # relative standard deviation
+    "base_consumption": 0.08,   # wind, temperature, traffic
+    "weight_factor": 0.10,
+    "terrain_multiplier": 0.05,
+    "charge_rate": 0.10,        # derating, shared chargers
+}
+MONTE_CARLO_SEED = 0
+MONTE_CARLO_CHUNK_ROWS = 250_000
+MONTE_CARLO_MIN_CHUNK_ROWS = 50_000
+
+
+def draw_scenarios(samples: int, seed: int = MONTE_CARLO_SEED) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        name: 1.0 + spread * np.clip(rng.standard_normal(samples), -3.0, 3.0)
+        for name, spread in PARAMETER_SPREAD.items()
+    }
+
+
+def sample_fleet(route: Route, plan: CompiledRoute, columns: dict, samples: int) -> dict:
+    # Pool task: percentiles of arrival SoC, breach probability and P95 trip time for a chunk
+    # of trucks. columns holds each truck's nominal plan: per-node load, departure SoC,
+    # effective capacity and charge targets, plus its charge curve.
+    scenario = draw_scenarios(samples)
+    caps = columns['caps']
+    n_trucks = len(caps)
+    n_legs = len(plan.leg_distance)
+
+    base = route.base_consumption * scenario['base_consumption']
+    terrain = route.terrain_multiplier * scenario['terrain_multiplier']
+    groups = curve_groups(columns.get('curves'))
+
+    soc = np.repeat(columns['departure_soc'][:, None], samples, axis=1)
+    breach = np.zeros((n_trucks, samples), dtype=bool)
+    stop_time = np.zeros((n_trucks, samples))
+    unload_time = [30 if stop else 0 for stop in plan.is_stop]
+    if plan.depot_payload > 0:
+        unload_time[0] = 30
+
+    for i in range(n_legs):
+        if plan.has_charger[i]:
+            deficit = columns['target_soc'][:, i, None] - soc
+            deficit *= deficit > 0.001
+            start = soc.copy() if groups else None
+            soc += deficit
+            # kWh / kW * 60, in the engine's order so the minutes round the same way
+            deficit *= caps[:, None]
+            deficit /= plan.charge_rate_kw[i] * scenario['charge_rate']
+            deficit *= 60
+            for curve, rows in groups:
+                table = charge_table(curve, plan.charge_rate_kw[i])
+                deficit[rows] = caps[rows, None] * (table.at_array(soc[rows]) - table.at_array(start[rows]))
+                deficit[rows] /= scenario['charge_rate']
+            np.ceil(deficit, out=deficit)
+            np.maximum(deficit, unload_time[i], out=deficit)
+            stop_time += deficit
+        else:
+            stop_time += unload_time[i]
+
+        # simulate_route's energy formula and operation order, so unit factors give its numbers
+        leg_soc = np.multiply.outer(WEIGHT_FACTOR * columns['load'][:, i], scenario['weight_factor'])
+        leg_soc += base
+        leg_soc *= plan.leg_distance[i]
+        if plan.leg_grade is None:
+            leg_soc *= terrain
+        else:
+            leg_soc += np.multiply.outer((TRUCK_TARE_LBS + columns['load'][:, i]) * plan.leg_grade[i],
+                                         scenario['terrain_multiplier'])
+            np.maximum(leg_soc, 0.0, out=leg_soc)
+        leg_soc /= caps[:, None]
+        soc -= leg_soc
+        breach |= soc < MIN_BUFFER_SOC - 1e-9
+        np.maximum(soc, 0.0, out=soc)
+
+    stop_time += unload_time[-1]
+    drive_time_mins = math.ceil((route.distance_miles / 55.0) * 60.0)
+    p5, p50, p95 = np.percentile(soc * 100, [5, 50, 95], axis=1)
+    return {
+        "p5": p5,
+        "p50": p50,
+        "p95": p95,
+        "breach": breach.mean(axis=1),
+        "trip_p95": drive_time_mins + np.percentile(stop_time, 95, axis=1, method="higher"),
+    }
+
+
+@timed("monte_carlo")
+def arrival_distributions(route: Route, plan: CompiledRoute, trucks: list[Truck],
+                          samples: int) -> list[ArrivalSocDistribution | None]:
+    # One entry per truck; None for trucks that aren't available or have no usable capacity
+    available = [i for i, t in enumerate(trucks) if t.status in ("ready", "charging")]
+    distributions: list[ArrivalSocDistribution | None] = [None] * len(trucks)
+    if not available:
+        return distributions
+
+    fleet = fleet_columns([trucks[i] for i in available])
+    sim = solve_fleet(route, plan, fleet)
+    rows = np.flatnonzero(sim['valid'])
+    if not len(rows):
+        return distributions
+    columns = {
+        "load": sim['load'][rows],
+        "departure_soc": sim['departure_soc'][rows],
+        "caps": fleet['caps'][rows],
+        "target_soc": sim['target_soc'][rows],
+        "curves": fleet['curves'][rows],
+    }
+    count("simulate_route", len(rows) * samples)
+
+    per_worker = math.ceil(len(rows) / pool_workers())
+    chunk = max(1, min(max(per_worker, MONTE_CARLO_MIN_CHUNK_ROWS // samples), MONTE_CARLO_CHUNK_ROWS // samples))
+    chunks = [{name: column[start:start + chunk] for name, column in columns.items()}
+              for start in range(0, len(rows), chunk)]
+    if len(chunks) == 1:
+        parts = [sample_fleet(route, plan, chunks[0], samples)]
+    else:
+        parts = list(get_pool().map(sample_fleet, [route] * len(chunks), [plan] * len(chunks), chunks,
+                                    [samples] * len(chunks)))
+    stats = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    for k, r in enumerate(rows.tolist()):
+        distributions[available[r]] = ArrivalSocDistribution(
+            samples=samples,
+            arrival_soc_p5=round(float(stats['p5'][k]), 2),
+            arrival_soc_p50=round(float(stats['p50'][k]), 2),
+            arrival_soc_p95=round(float(stats['p95'][k]), 2),
+            buffer_breach_probability=round(float(stats['breach'][k]), 4),
+            trip_time_p95_mins=int(stats['trip_p95'][k]),
+        )
+    return distributions
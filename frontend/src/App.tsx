@@ -1,9 +1,24 @@
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect, useMemo, useRef } from 'react';
 import type { Truck, Route, FeasibilityResult } from './types';
-import { fetchTrucks, fetchRoutes, fetchFeasibility } from './api';
+import { fetchTrucks, fetchRoutes, fetchFeasibility, openFleetSocket } from './api';
 import TruckCard from './components/TruckCard';
 import RouteCard from './components/RouteCard';
 
+// Applies changes keyed by id: existing items are updated in place, new ones (which arrive
+// with every field) are appended
+function upsert<T>(items: T[], key: keyof T, changes: Record<string, Partial<T>>): T[] {
+  const pending = new Map(Object.entries(changes));
+  if (pending.size === 0) return items;
+  const updated = items.map(item => {
+    const change = pending.get(String(item[key]));
+    if (!change) return item;
+    pending.delete(String(item[key]));
+    return { ...item, ...change };
+  });
+  pending.forEach(change => updated.push(change as T));
+  return updated;
+}
+
 function App() {
   const [trucks, setTrucks] = useState<Truck[]>([]);
   const [routes, setRoutes] = useState<Route[]>([]);
@@ -12,6 +27,10 @@ function App() {
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
   const [lastRefreshed, setLastRefreshed] = useState<Date | null>(null);
+  // The socket opens once the HTTP load is done; from its first message on it owns the state,
+  // and anything the HTTP load still delivers is dropped rather than overwriting newer data
+  const [loaded, setLoaded] = useState<boolean>(false);
+  const live = useRef<boolean>(false);
 
   // Initial data fetch
   const initData = async () => {
@@ -22,14 +41,24 @@ function App() {
         fetchTrucks(),
         fetchRoutes()
       ]);
-      setTrucks(truckData);
-      setRoutes(routeData);
+      if (!live.current) {
+        setTrucks(truckData);
+        setRoutes(routeData);
+        setAllRouteFeasibility({});
+      }
+      setLoading(false);
 
-      // Fetch feasibility for ALL routes in parallel
+      // Fetch feasibility for ALL routes in parallel; rows render as they stream in
       const allFeas = await Promise.all(
         routeData.map(async (route) => ({
           id: route.id,
-          results: await fetchFeasibility(route.id)
+          results: await fetchFeasibility(route.id, (result) => {
+            if (live.current) return;
+            setAllRouteFeasibility(prev => ({
+              ...prev,
+              [route.id]: [...(prev[route.id] || []), result]
+            }));
+          })
         }))
       );
 
@@ -38,8 +67,11 @@ function App() {
         return acc;
       }, {} as Record<string, FeasibilityResult[]>);
 
-      setAllRouteFeasibility(allFeasMap);
-      setLastRefreshed(new Date());
+      if (!live.current) {
+        setAllRouteFeasibility(allFeasMap);
+        setLastRefreshed(new Date());
+      }
+      setLoaded(true);
     } catch (err) {
       console.error('Failed to initialize dashboard:', err);
       setError('Failed to connect to dispatch API. Please ensure the backend is running on localhost:8000.');
@@ -52,6 +84,42 @@ function App() {
     initData();
   }, []);
 
+  // Live updates: the fleet socket sends a snapshot, every route's feasibility, and from then
+  // on only the trucks and results that changed
+  useEffect(() => {
+    if (!loaded) return;
+    const socket = openFleetSocket({
+      onSnapshot: (snapshot) => {
+        live.current = true;
+        setTrucks(snapshot.trucks);
+        setRoutes(snapshot.routes);
+        setLastRefreshed(new Date(snapshot.time * 1000));
+        socket.subscribe(snapshot.routes.map(route => route.id));
+      },
+      onFeasibility: (message) => {
+        live.current = true;
+        setAllRouteFeasibility(prev => ({ ...prev, [message.route_id]: message.results }));
+      },
+      onDiff: (diff) => {
+        live.current = true;
+        setTrucks(prev => upsert(prev, 'id', diff.trucks));
+        if (diff.routes.length) {
+          setRoutes(prev => upsert(prev, 'id', Object.fromEntries(diff.routes.map(route => [route.id, route]))));
+          socket.subscribe(diff.routes.map(route => route.id));
+        }
+        setAllRouteFeasibility(prev => {
+          const next = { ...prev };
+          Object.entries(diff.feasibility).forEach(([routeId, rows]) => {
+            next[routeId] = upsert(next[routeId] || [], 'truck_id', rows);
+          });
+          return next;
+        });
+        setLastRefreshed(new Date(diff.time * 1000));
+      },
+    });
+    return socket.close;
+  }, [loaded]);
+
   const handleRouteClick = (routeId: string) => {
     setSelectedRouteId(prev => prev === routeId ? null : routeId);
   };
@@ -242,6 +310,7 @@ function App() {
               <div key={truck.id} className="transition-all duration-500 ease-in-out transform">
                 <TruckCard
                   truck={truck}
+                  routeId={selectedRouteId}
                   feasibility={feasibilityMap[truck.id] || null}
                   isBestMatch={truck.id === bestMatchTruckId}
                   baseTime={lastRefreshed || new Date()}
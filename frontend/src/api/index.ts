@@ -1,6 +1,10 @@
-import type { Truck, Route, FeasibilityResult } from '../types';
+import type {
+    Truck, Route, FeasibilityResult, FeasibilityStreamMessage, LegDetail,
+    FleetSnapshotMessage, FleetFeasibilityMessage, FleetDiffMessage, FleetSocketMessage,
+} from '../types';
 
 const BASE_URL = 'http://localhost:8000';
+const WS_URL = BASE_URL.replace(/^http/, 'ws');
 
 export async function fetchTrucks(): Promise<Truck[]> {
     try {
@@ -28,15 +32,117 @@ export async function fetchRoutes(): Promise<Route[]> {
     }
 }
 
-export async function fetchFeasibility(routeId: string): Promise<FeasibilityResult[]> {
+export async function fetchFeasibility(
+    routeId: string,
+    onResult?: (result: FeasibilityResult) => void
+): Promise<FeasibilityResult[]> {
     try {
-        const response = await fetch(`${BASE_URL}/routes/${routeId}/feasibility`);
-        if (!response.ok) {
+        // Streamed as NDJSON: each truck's result is handed to onResult as soon as it arrives,
+        // and the closing message gives the final dispatch order. Legs are loaded per truck
+        // with fetchLegs when a card is expanded.
+        const response = await fetch(`${BASE_URL}/routes/${routeId}/feasibility?stream=ndjson&detail=summary`);
+        if (!response.ok || !response.body) {
             throw new Error(`Failed to fetch feasibility: ${response.statusText}`);
         }
-        return await response.json();
+
+        const results = new Map<string, FeasibilityResult>();
+        let order: string[] = [];
+        const handleLine = (line: string) => {
+            if (!line.trim()) return;
+            const message: FeasibilityStreamMessage = JSON.parse(line);
+            if ('result' in message) {
+                results.set(message.result.truck_id, message.result);
+                onResult?.(message.result);
+            } else {
+                order = message.order;
+            }
+        };
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            const lines = buffer.split('\n');
+            buffer = lines.pop() ?? '';
+            lines.forEach(handleLine);
+        }
+        handleLine(buffer);
+
+        return order.map(truckId => results.get(truckId)).filter((r): r is FeasibilityResult => r !== undefined);
     } catch (error) {
         console.error(`Error fetching feasibility for route ${routeId}:`, error);
         throw error;
     }
 }
+
+export async function fetchLegs(routeId: string, truckId: string): Promise<LegDetail[]> {
+    try {
+        const response = await fetch(`${BASE_URL}/routes/${routeId}/feasibility/${truckId}/legs`);
+        if (!response.ok) {
+            throw new Error(`Failed to fetch leg details: ${response.statusText}`);
+        }
+        return await response.json();
+    } catch (error) {
+        console.error(`Error fetching legs for truck ${truckId} on route ${routeId}:`, error);
+        throw error;
+    }
+}
+
+export interface FleetSocketHandlers {
+    onSnapshot: (message: FleetSnapshotMessage) => void;
+    onFeasibility: (message: FleetFeasibilityMessage) => void;
+    onDiff: (message: FleetDiffMessage) => void;
+}
+
+export interface FleetSocket {
+    subscribe: (routeIds: string[]) => void;
+    close: () => void;
+}
+
+// Live fleet updates over /ws/fleet instead of polling. Every (re)connect starts with a snapshot
+// and the feasibility of the routes subscribed so far; after that only diffs arrive. A dropped
+// connection is retried with backoff.
+export function openFleetSocket(handlers: FleetSocketHandlers): FleetSocket {
+    const subscribed = new Set<string>();
+    let socket: WebSocket | null = null;
+    let closed = false;
+    let retryMs = 1000;
+
+    const connect = () => {
+        if (closed) return;
+        socket = new WebSocket(`${WS_URL}/ws/fleet`);
+        socket.onopen = () => {
+            retryMs = 1000;
+            if (subscribed.size) socket?.send(JSON.stringify({ subscribe: [...subscribed] }));
+        };
+        socket.onmessage = (event) => {
+            const message: FleetSocketMessage = JSON.parse(event.data);
+            if (message.type === 'snapshot') handlers.onSnapshot(message);
+            else if (message.type === 'feasibility') handlers.onFeasibility(message);
+            else if (message.type === 'diff') handlers.onDiff(message);
+            else console.error('Fleet socket error:', message.detail);
+        };
+        socket.onclose = () => {
+            if (closed) return;
+            setTimeout(connect, retryMs);
+            retryMs = Math.min(retryMs * 2, 30_000);
+        };
+    };
+    connect();
+
+    return {
+        subscribe: (routeIds) => {
+            const added = routeIds.filter(routeId => !subscribed.has(routeId));
+            added.forEach(routeId => subscribed.add(routeId));
+            if (added.length && socket?.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ subscribe: added }));
+            }
+        },
+        close: () => {
+            closed = true;
+            socket?.close();
+        },
+    };
+}
@@ -1,22 +1,36 @@
 import { useState, useEffect, type FC } from 'react';
-import type { Truck, FeasibilityResult } from '../types';
+import type { Truck, FeasibilityResult, LegDetail } from '../types';
+import { fetchLegs } from '../api';
 
 interface TruckCardProps {
     truck: Truck;
+    routeId: string | null;
     feasibility: FeasibilityResult | null;
     isBestMatch?: boolean;
     baseTime?: Date;
 }
 
-const TruckCard: FC<TruckCardProps> = ({ truck, feasibility, isBestMatch, baseTime = new Date() }) => {
+const TruckCard: FC<TruckCardProps> = ({ truck, routeId, feasibility, isBestMatch, baseTime = new Date() }) => {
     const [animatedSoc, setAnimatedSoc] = useState(0);
     const [showLegs, setShowLegs] = useState(false);
+    const [legs, setLegs] = useState<LegDetail[] | null>(null);
 
     // Reset showLegs when feasibility changes
     useEffect(() => {
         setShowLegs(false);
+        setLegs(null);
     }, [feasibility]);
 
+    // Leg details are not part of the list response; load them the first time the card is expanded
+    useEffect(() => {
+        if (!showLegs || legs || !routeId) return;
+        let cancelled = false;
+        fetchLegs(routeId, truck.id)
+            .then(data => { if (!cancelled) setLegs(data); })
+            .catch(() => { if (!cancelled) setShowLegs(false); });
+        return () => { cancelled = true; };
+    }, [showLegs, legs, routeId, truck.id]);
+
     // Animate SoC from 0 to value on mount
     useEffect(() => {
         const timer = setTimeout(() => {
@@ -205,21 +219,8 @@ const TruckCard: FC<TruckCardProps> = ({ truck, feasibility, isBestMatch, baseTi
                                         {!feasibility.no_charge_needed && feasibility.charge_time_mins && (
                                             <span className="px-2 py-1 rounded-sm text-[10px] font-black uppercase tracking-wider bg-yellow-50 text-yellow-700">
                                                 {(() => {
-                                                    // Charging happens at departure nodes. Overlap occurs when
-                                                    // a leg departs from a stop (prev leg's arrival had load activity).
-                                                    const overlapMins = feasibility.leg_details.reduce((acc, leg, idx, arr) => {
-                                                        if (!leg.used_charger) return acc;
-                                                        const prevLeg = arr[idx - 1];
-                                                        const departureNodeHadActivity = prevLeg
-                                                            ? (prevLeg.unload_lbs > 0 || prevLeg.pickup_lbs > 0)
-                                                            : false; // first leg departs from depot — no prior unload
-                                                        if (departureNodeHadActivity) {
-                                                            return acc + Math.min(30, leg.charge_time_mins);
-                                                        }
-                                                        return acc;
-                                                    }, 0);
-
-                                                    const netChargeMins = Math.max(0, (feasibility.charge_time_mins || 0) - overlapMins);
+                                                    // Charging on departure from a stop overlaps its un/loading (charge_overlap_mins)
+                                                    const netChargeMins = Math.max(0, (feasibility.charge_time_mins || 0) - feasibility.charge_overlap_mins);
                                                     const hrs = Math.floor(netChargeMins / 60);
                                                     const mins = netChargeMins % 60;
                                                     return `+${hrs}h ${mins}m added`;
@@ -274,7 +275,11 @@ const TruckCard: FC<TruckCardProps> = ({ truck, feasibility, isBestMatch, baseTi
                                     )}
                                 </div>
 
-                                {showLegs && (
+                                {showLegs && !legs && (
+                                    <p className="mt-2 text-[10px] text-gray-400 italic">Loading leg details…</p>
+                                )}
+
+                                {showLegs && legs && (
                                     <div className="mt-2 overflow-x-auto border rounded border-slate-100 shadow-sm">
                                         <table className="w-full text-left border-collapse">
                                             <thead>
@@ -290,7 +295,7 @@ const TruckCard: FC<TruckCardProps> = ({ truck, feasibility, isBestMatch, baseTi
                                                 </tr>
                                             </thead>
                                             <tbody className="text-[10px] font-medium text-gray-700">
-                                                {feasibility.leg_details.map((leg, idx) => (
+                                                {legs.map((leg, idx) => (
                                                     <tr key={idx} className={idx % 2 === 0 ? 'bg-slate-50' : 'bg-white'}>
                                                         <td className="px-1.5 py-1 border-b text-gray-700 font-medium whitespace-nowrap">
                                                             {leg.end_location_name}
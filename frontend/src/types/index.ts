@@ -8,6 +8,7 @@ export interface Truck {
     status: 'ready' | 'charging' | 'maintenance' | string;
     charge_eta_mins: number | null; // Only set if status is "charging"
     range_miles: number | null;
+    charge_curve: Array<[number, number]> | null; // [SoC %, kW] points; null charges at the charger's rate
 }
 
 export interface Stop {
@@ -23,6 +24,11 @@ export interface ChargingStation {
     charge_rate_kw: number;
 }
 
+export interface ElevationPoint {
+    mile_marker: number;
+    elevation_ft: number;
+}
+
 export interface Route {
     id: string;
     name: string;
@@ -33,6 +39,7 @@ export interface Route {
     base_consumption: number; // kWh per mile baseline
     stops: Stop[];             // Typed
     charging_stations: ChargingStation[]; // Typed
+    elevation_profile: ElevationPoint[]; // Empty: consumption uses terrain_multiplier
 }
 
 export interface LegDetail {
@@ -51,6 +58,15 @@ export interface LegDetail {
     end_has_charger: boolean;
 }
 
+export interface ArrivalSocDistribution {
+    samples: number;
+    arrival_soc_p5: number;
+    arrival_soc_p50: number;
+    arrival_soc_p95: number;
+    buffer_breach_probability: number; // Share of samples dipping below the 15% buffer
+    trip_time_p95_mins: number;
+}
+
 export interface FeasibilityResult {
     truck_id: string;
     status: 'green' | 'yellow' | 'red' | string;
@@ -66,5 +82,44 @@ export interface FeasibilityResult {
     feasible_after_precharge: boolean;
     precharge_mins: number | null;
     precharge_kwh: number | null;
-    leg_details: LegDetail[];
+    charge_overlap_mins: number;  // Charging done while un/loading at a stop
+    uncertainty: ArrivalSocDistribution | null; // Only with ?samples=N
+    leg_details: LegDetail[];     // Empty when fetched with detail=summary
 }
+
+// One line of the NDJSON feasibility stream: a result per truck, then the final dispatch order
+export type FeasibilityStreamMessage =
+    | { result: FeasibilityResult }
+    | { order: string[] };
+
+// Messages on the /ws/fleet socket: a snapshot on connect, every result of a route when it is
+// subscribed to (in dispatch order), then diffs holding only what changed
+export interface FleetSnapshotMessage {
+    type: 'snapshot';
+    version: number;
+    time: number;             // Server time, seconds since the epoch
+    trucks: Truck[];
+    routes: Route[];
+}
+
+export interface FleetFeasibilityMessage {
+    type: 'feasibility';
+    version: number;
+    route_id: string;
+    results: FeasibilityResult[];
+}
+
+export interface FleetDiffMessage {
+    type: 'diff';
+    version: number;
+    time: number;
+    trucks: Record<string, Partial<Truck>>;  // Changed fields by truck id; new trucks have all of them
+    routes: Route[];                         // Added or changed routes
+    feasibility: Record<string, Record<string, FeasibilityResult>>; // Route id -> truck id -> result
+}
+
+export type FleetSocketMessage =
+    | FleetSnapshotMessage
+    | FleetFeasibilityMessage
+    | FleetDiffMessage
+    | { type: 'error'; detail: string };